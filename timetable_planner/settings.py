@@ -96,6 +96,9 @@ if ENV in ('production', 'prod') or os.getenv('DJANGO_PRODUCTION', '').lower() i
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # Take the write lock at BEGIN so concurrent writers (e.g. the
+            # generation lock) wait for each other instead of failing.
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
         }
     }
 else:
@@ -104,10 +107,59 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # Take the write lock at BEGIN so concurrent writers (e.g. the
+            # generation lock) wait for each other instead of failing.
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
         }
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+#
+# Holds the timetable version counters and rendered timetable fragments
+# (see timetable_planner_app/versions.py). The web workers and the
+# run_jobs worker must share it, so the default is a file cache; locmem
+# is only right when a single process serves pages and runs generation.
+# CACHE_BACKEND: file (CACHE_LOCATION is a directory), locmem, redis
+# (CACHE_LOCATION is a redis:// URL; needs the redis package) or dummy.
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'file')
+CACHE_BACKENDS = {
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+CACHE_LOCATIONS = {
+    'file': str(BASE_DIR / 'cache'),
+    'locmem': 'timetable-planner',
+    'redis': 'redis://127.0.0.1:6379',
+    'dummy': '',
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.getenv('CACHE_LOCATION', CACHE_LOCATIONS[CACHE_BACKEND]),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '10000'))} if CACHE_BACKEND in ('file', 'locmem') else {},
+    }
+}
+
+
+# Timetable PDFs
+#
+# Generated PDFs are kept in PDF_CACHE_DIR (see
+# timetable_planner_app/pdfcache.py), least recently used first out once
+# they add up to more than PDF_CACHE_MAX_BYTES. Behind nginx, set
+# USE_X_ACCEL_REDIRECT so nginx serves the files from its internal
+# PDF_CACHE_URL location instead of the Django worker.
+
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', str(BASE_DIR / 'pdf_cache'))
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+PDF_CACHE_URL = os.getenv('PDF_CACHE_URL', '/protected/pdfs/')
+USE_X_ACCEL_REDIRECT = os.getenv('USE_X_ACCEL_REDIRECT', 'False').lower() in ('1', 'true', 'yes')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import LessonInstance, Teacher, SchoolClass, Subject, Lesson, ClassLevel, Stream, SubjectOffering, TimeSlot, School, UserProfile
+from .utils import bulk_lesson_writes, lessons_changed, lessons_changed_in
+from .models import LessonInstance, Teacher, SchoolClass, Subject, Lesson, ClassLevel, Stream, SubjectOffering, TimeSlot, School, UserProfile, TimetableGeneration, GenerationJob, TimetableScore, Room
 
 admin.site.register(Teacher)
 admin.site.register(SchoolClass)
@@ -9,7 +10,31 @@ admin.site.register(ClassLevel)
 admin.site.register(Stream)
 admin.site.register(SubjectOffering)
 admin.site.register(TimeSlot)
-admin.site.register(LessonInstance)
+admin.site.register(Room)
 admin.site.register(School)
 admin.site.register(UserProfile)
+admin.site.register(TimetableGeneration)
+admin.site.register(GenerationJob)
+admin.site.register(TimetableScore)
+
+
+@admin.register(LessonInstance)
+class LessonInstanceAdmin(admin.ModelAdmin):
+    """
+    Saves and deletes mark the lesson's timetable changed through the
+    signal (see `signals`); this adds the old term of a moved lesson, and
+    marks a bulk delete once per timetable instead of once per row.
+    """
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and form.initial.get("term") not in (None, obj.term_id):
+            lessons_changed(form.initial["term"], obj.school_class.school_id)
+
+    def delete_queryset(self, request, queryset):
+        lessons_changed_in(queryset)
+        with bulk_lesson_writes():
+            super().delete_queryset(request, queryset)
+
+
 # Register your models here.
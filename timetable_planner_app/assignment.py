@@ -0,0 +1,195 @@
+"""
+Load-balanced teacher assignment, run before any slot placement.
+
+Every (class, subject) offering is taught by one teacher for the whole
+week. Choosing those teachers is a capacity-constrained assignment: each
+offering carries its weekly periods to one of the subject's teachers,
+and no teacher may carry more than a load cap, nor more than the
+periods they are available for. The cap is binary-searched
+down to the smallest one that still fits, so placement starts from the
+most even split of work the staffing allows instead of discovering an
+overloaded teacher half-way through the search.
+
+Offerings are given out most-constrained first to the least loaded
+candidate; when none has room, an augmenting path moves already
+assigned offerings along teachers who can take them until one of the
+candidates has room (the unit-demand case of this is exactly bipartite
+b-matching).
+"""
+
+from collections import defaultdict, deque
+
+from timetable_planner_app.electives import Offerings
+from timetable_planner_app.occupancy import DAYS
+
+
+class TeacherAssignment:
+    """
+    Assigns (class, subject) pairs to teachers under a load cap.
+
+    Args:
+        demand (dict): {pair: periods a week} for the pairs to assign
+        candidates (dict): {pair: [teacher_id]} who may teach each pair
+        fixed_load (dict): {teacher_id: periods} already committed
+        available (dict): {teacher_id: most periods they can teach}, for
+            teachers with unavailable periods
+    """
+
+    def __init__(self, demand, candidates, fixed_load, available=None):
+        self.demand = demand
+        self.candidates = candidates
+        self.fixed_load = fixed_load
+        self.available = available or {}
+        self.order = sorted(
+            demand, key=lambda pair: (len(candidates[pair]), -demand[pair], pair)
+        )
+
+    def assign(self, cap):
+        """Returns {pair: teacher_id} with no teacher over `cap`, or None if that fails."""
+        self.load = defaultdict(int, self.fixed_load)
+        self.teacher_of = {}
+        self.pairs_of = defaultdict(set)
+        self.limit = {t: min(cap, periods) for t, periods in self.available.items()}
+
+        for pair in self.order:
+            periods = self.demand[pair]
+            room = [
+                t for t in self.candidates[pair]
+                if self.load[t] + periods <= self.limit.get(t, cap)
+            ]
+            if room:
+                self._give(pair, min(room, key=lambda t: (self.load[t], t)))
+            elif not self._augment(pair, cap):
+                return None
+        return dict(self.teacher_of)
+
+    def _give(self, pair, teacher_id):
+        previous = self.teacher_of.get(pair)
+        if previous is not None:
+            self.load[previous] -= self.demand[pair]
+            self.pairs_of[previous].discard(pair)
+        self.teacher_of[pair] = teacher_id
+        self.load[teacher_id] += self.demand[pair]
+        self.pairs_of[teacher_id].add(pair)
+
+    def _augment(self, pair, cap):
+        """
+        Breadth-first search for a chain of moves that makes room for `pair`.
+
+        Each step takes a teacher who is `need` periods short of room and
+        moves one of their offerings (of at least `need` periods) to another
+        of its candidates; the chain ends at a teacher who can absorb the
+        offering moved to them.
+        """
+        periods = self.demand[pair]
+        parent = {}
+        queue = deque()
+        for teacher_id in self.candidates[pair]:
+            if teacher_id not in parent:
+                parent[teacher_id] = None
+                need = self.load[teacher_id] + periods - self.limit.get(teacher_id, cap)
+                queue.append((teacher_id, need))
+
+        while queue:
+            teacher_id, need = queue.popleft()
+            for moved in sorted(self.pairs_of[teacher_id]):
+                size = self.demand[moved]
+                if size < need:
+                    continue
+                for other in self.candidates[moved]:
+                    if other in parent:
+                        continue
+                    parent[other] = (moved, teacher_id)
+                    other_need = self.load[other] + size - self.limit.get(other, cap)
+                    if other_need <= 0:
+                        self._apply(other, parent)
+                        self._give(pair, self._root(teacher_id, parent))
+                        return True
+                    queue.append((other, other_need))
+        return False
+
+    def _apply(self, end, parent):
+        """Performs the moves recorded in `parent`, from the end of the chain back."""
+        teacher_id = end
+        while parent[teacher_id] is not None:
+            moved, source = parent[teacher_id]
+            self._give(moved, teacher_id)
+            teacher_id = source
+
+    def _root(self, teacher_id, parent):
+        while parent[teacher_id] is not None:
+            teacher_id = parent[teacher_id][1]
+        return teacher_id
+
+
+def assign_teachers(snapshot):
+    """
+    Chooses one teacher for every (class, subject) offering in `snapshot`.
+
+    Offerings that already have stored lessons keep their teacher, and
+    every stored lesson counts towards its teacher's load. The rest are
+    assigned with the smallest load cap (at most a full teaching week)
+    that `TeacherAssignment` can fit, never giving a teacher more periods
+    than they are available for; if even a full week does not fit they
+    are spread as evenly as possible without a cap. A subject of an
+    elective block is one offering, taught by one teacher to every class
+    of the block (see `electives.Offerings`).
+
+    Returns:
+        dict: {(class_id, subject_id): teacher_id}
+    """
+    week = len(DAYS) * len(snapshot.slot_ids)
+    offerings = Offerings(snapshot)
+
+    stored = defaultdict(int)
+    stored_teacher = {}
+    for class_id, subject_id, teacher_id, _, _ in snapshot.existing:
+        key = offerings.key(class_id, subject_id)
+        stored[key] += 1
+        stored_teacher.setdefault(key, teacher_id)
+
+    assignment = {}
+    fixed_load = defaultdict(int)
+    demand = {}
+    candidates = {}
+    for key, periods in offerings.periods.items():
+        teachers = snapshot.subject_teachers.get(key[1])
+        if key in stored_teacher:
+            teacher_id = stored_teacher[key]
+            assignment[key] = teacher_id
+            fixed_load[teacher_id] += max(periods, stored.pop(key))
+        elif teachers:
+            demand[key] = periods
+            candidates[key] = teachers
+
+    # Stored lessons outside the current offerings still keep their teacher busy.
+    for key, count in stored.items():
+        fixed_load[stored_teacher[key]] += count
+
+    if demand:
+        available = {
+            teacher_id: week - cells.bit_count()
+            for teacher_id, cells in snapshot.teacher_unavailable.items()
+        }
+        problem = TeacherAssignment(demand, candidates, fixed_load, available)
+        low = max(max(fixed_load.values(), default=0), max(demand.values()))
+        high = max(week, low)
+
+        best = problem.assign(high)
+        if best is None:
+            best = TeacherAssignment(demand, candidates, fixed_load).assign(float("inf"))
+        else:
+            while low < high:
+                cap = (low + high) // 2
+                fitted = problem.assign(cap)
+                if fitted is None:
+                    low = cap + 1
+                else:
+                    best, high = fitted, cap
+        assignment.update(best)
+
+    return {
+        (class_id, subject_id): teacher_id
+        for (lead, subject_id), teacher_id in assignment.items()
+        for class_id in offerings.classes[(lead, subject_id)]
+    }
@@ -0,0 +1,219 @@
+"""
+Elective groups placed as parallel blocks.
+
+Subjects that share an `elective_group` (Languages, Religions,
+Vocationals) are alternatives: each student of a class level takes one of
+them. They are taught at the same time to the students of every stream of
+the level, so for placement the group is one block: a set of cells that
+every class of the level has free and each of the group's teachers
+teaches their subject in, instead of every class fitting every elective
+into its own week.
+
+While generating, a block subject is one lesson per cell, recorded
+against the block's first class, and `Offerings.classes_of` says which
+classes it keeps busy. It is stored once for every class of the level
+(`Offerings.stored_lessons`), marked with its elective group, so each
+class's timetable shows every subject of the block in that cell; the
+teacher and room of a block lesson are then repeated once per class, and
+`fold_block_lessons` turns stored rows back into one lesson per cell.
+
+`Offerings` is the view of a snapshot's demand every stage shares:
+what each class needs on its own, and what each block needs.
+"""
+
+from collections import defaultdict
+
+
+class ElectiveBlock:
+    """
+    Elective subjects taught in parallel to every class of a level.
+
+    Args:
+        class_ids (tuple): Classes of the level, in snapshot order
+        subjects (list): [(subject_id, periods)], most periods first
+    """
+
+    def __init__(self, class_ids, subjects):
+        self.class_ids = class_ids
+        self.subjects = subjects
+
+    @property
+    def periods(self):
+        """Cells the block needs: enough for its longest subject."""
+        return max(periods for _, periods in self.subjects)
+
+    def split(self, teacher_of):
+        """
+        Blocks that can each run at once: a teacher given two subjects of
+        the block (`teacher_of` is {subject_id: teacher_id}) cannot teach
+        both in one cell, so their subjects go to separate blocks.
+        """
+        parts = []
+        for subject in self.subjects:
+            teacher_id = teacher_of.get(subject[0])
+            for part, teachers in parts:
+                if teacher_id not in teachers:
+                    part.append(subject)
+                    teachers.add(teacher_id)
+                    break
+            else:
+                parts.append(([subject], {teacher_id}))
+        if len(parts) == 1:
+            return [self]
+        return [ElectiveBlock(self.class_ids, part) for part, _ in parts]
+
+    def lessons(self, cells, needed, teacher_of):
+        """
+        (class_id, subject_id, teacher_id, cell) for the block placed in
+        `cells`: each subject in the first `needed[subject_id]` of them, in
+        week order, on the block's first class.
+        """
+        lead = self.class_ids[0]
+        rows = []
+        for n, cell in enumerate(sorted(cells)):
+            for subject_id, _ in self.subjects:
+                if needed.get(subject_id, 0) > n:
+                    rows.append((lead, subject_id, teacher_of[subject_id], cell))
+        return rows
+
+
+class Offerings:
+    """
+    The periods a snapshot's classes need, with elective groups folded
+    into blocks.
+
+    Every offering has a key: (class_id, subject_id) for a subject the
+    class takes on its own, and (first class of the block, subject_id) for
+    a block subject, which is taught once for all the block's classes.
+
+    Attributes:
+        blocks (list): ElectiveBlocks, in snapshot order
+        block_of (dict): {(class_id, subject_id): ElectiveBlock} for every
+            class of a block
+        block_keys (set): keys of the block subjects
+        periods (dict): {key: periods a week}
+        classes (dict): {key: (class_id, ...)} the lessons of a key are for
+        groups (dict): {subject_id: elective group} of the elective subjects
+    """
+
+    def __init__(self, snapshot):
+        self.blocks = []
+        self.block_of = {}
+        self.block_keys = set()
+        self.periods = {}
+        self.classes = {}
+        self.groups = groups = snapshot.subject_groups
+        schools = snapshot.class_schools
+
+        levels = defaultdict(list)
+        for class_id, level_id, _ in snapshot.classes:
+            levels[(schools.get(class_id), level_id)].append(class_id)
+
+        for (_, level_id), class_ids in levels.items():
+            by_group = defaultdict(lambda: defaultdict(int))
+            for subject_id, periods in snapshot.offerings_by_level.get(level_id, []):
+                if groups.get(subject_id):
+                    by_group[groups[subject_id]][subject_id] += periods
+            for group in sorted(by_group):
+                subjects = sorted(
+                    by_group[group].items(), key=lambda subject: (-subject[1], subject[0])
+                )
+                block = ElectiveBlock(tuple(class_ids), subjects)
+                self.blocks.append(block)
+                for subject_id, _ in block.subjects:
+                    self.block_keys.add((class_ids[0], subject_id))
+                    for class_id in class_ids:
+                        self.block_of[(class_id, subject_id)] = block
+
+        # A block subject is counted once, at the block's first class.
+        for class_id, level_id, _ in snapshot.classes:
+            for subject_id, periods in snapshot.offerings_by_level.get(level_id, []):
+                key = self.key(class_id, subject_id)
+                if key[0] == class_id:
+                    self.periods[key] = self.periods.get(key, 0) + periods
+                    self.classes[key] = self.classes_of(class_id, subject_id)
+
+    def key(self, class_id, subject_id):
+        block = self.block_of.get((class_id, subject_id))
+        if block is None:
+            return (class_id, subject_id)
+        return (block.class_ids[0], subject_id)
+
+    def classes_of(self, class_id, subject_id):
+        """Classes a lesson of `subject_id` recorded against `class_id` keeps busy."""
+        block = self.block_of.get((class_id, subject_id))
+        return block.class_ids if block is not None else (class_id,)
+
+    def class_demand(self):
+        """{class_id: cells a week} its own offerings and its blocks need."""
+        demand = defaultdict(int)
+        for key, periods in self.periods.items():
+            if key not in self.block_keys:
+                demand[key[0]] += periods
+        for block in self.blocks:
+            for class_id in block.class_ids:
+                demand[class_id] += block.periods
+        return demand
+
+    def stored_lessons(self, placements):
+        """
+        The rows `placements` are stored as: (class_id, subject_id,
+        teacher_id, day, slot_id, elective_group), with each lesson of a
+        block subject repeated for every class of the block.
+        """
+        rows = []
+        for class_id, subject_id, teacher_id, day, slot_id in placements:
+            key = self.key(class_id, subject_id)
+            if key in self.block_keys:
+                group = self.groups[subject_id]
+                rows += [
+                    (member, subject_id, teacher_id, day, slot_id, group)
+                    for member in self.classes[key]
+                ]
+            else:
+                rows.append((class_id, subject_id, teacher_id, day, slot_id, None))
+        return rows
+
+
+def fold_block_lessons(rows):
+    """
+    Folds stored lessons back into one lesson per block subject and cell.
+
+    The rows of one block lesson (same level, elective group, subject,
+    teacher and cell) are folded into the row of the lowest class id,
+    which is the block's first class as long as every class still has
+    its row.
+
+    Args:
+        rows: (lesson_id, class_id, level_id, subject_id, teacher_id, day,
+            slot_id, elective_group) of stored lessons
+
+    Returns:
+        tuple: ([(lesson_id, (class_id, subject_id, teacher_id, day,
+        slot_id))] in the order of `rows`, {lesson_id: [ids of the rows
+        folded into it]})
+    """
+    order = []
+    blocks = defaultdict(list)
+    for lesson_id, class_id, level_id, subject_id, teacher_id, day, slot_id, group in rows:
+        if group:
+            key = (level_id, group, subject_id, teacher_id, day, slot_id)
+            if key not in blocks:
+                order.append(key)
+            blocks[key].append((class_id, lesson_id))
+        else:
+            order.append((lesson_id, (class_id, subject_id, teacher_id, day, slot_id)))
+
+    folded = []
+    merged = {}
+    for entry in order:
+        members = blocks.get(entry)
+        if members is None:
+            folded.append(entry)
+            continue
+        (class_id, lesson_id), *others = sorted(members)
+        _, _, subject_id, teacher_id, day, slot_id = entry
+        folded.append((lesson_id, (class_id, subject_id, teacher_id, day, slot_id)))
+        if others:
+            merged[lesson_id] = [other_id for _, other_id in others]
+    return folded, merged
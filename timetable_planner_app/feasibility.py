@@ -0,0 +1,275 @@
+"""
+Pre-flight capacity checks for timetable generation.
+
+Every check is a pass over the offerings of each class or over the
+distinct teacher sets of subjects, so a badly configured term is
+reported in milliseconds instead of surfacing as "Could not place all
+periods" lines after a full solver run.
+"""
+
+import time
+from collections import defaultdict
+
+from timetable_planner_app.electives import Offerings
+from timetable_planner_app.models import Teacher
+from timetable_planner_app.occupancy import DAYS
+
+
+class InfeasibleTimetable(ValueError):
+    """Raised instead of generating when the pre-flight check proves the term cannot be placed."""
+
+    def __init__(self, report):
+        self.report = report
+        super().__init__("Timetable is infeasible: " + "; ".join(report.errors))
+
+
+class FeasibilityReport:
+    """
+    Outcome of `analyse_snapshot`.
+
+    `errors` are provable: no assignment of teachers and slots can place
+    every period. `warnings` point at likely trouble that a good
+    assignment may still avoid.
+    """
+
+    def __init__(self):
+        self.errors = []
+        self.warnings = []
+        self.stats = {}
+
+    @property
+    def feasible(self):
+        return not self.errors
+
+    def as_dict(self):
+        return {
+            "feasible": self.feasible,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "stats": self.stats,
+        }
+
+
+def analyse_snapshot(snapshot, max_per_day, teacher_names=None):
+    """
+    Checks a TimetableSnapshot against its own capacity without solving.
+
+    - each class's weekly periods against the teaching slots in a week,
+      counting an elective block once (see `electives`);
+    - each offering against MAX_PER_DAY periods on each day;
+    - subjects some class needs but nobody teaches, as warnings: their
+      lessons are left unplaced and the rest of the term is generated;
+    - for each distinct set of subject teachers, and for each group of
+      sets linked by shared teachers, the weekly periods of the subjects
+      only they teach against what they could teach together (Hall's
+      condition; a single teacher's set covers the periods only they can
+      teach), leaving out the periods each is unavailable;
+    - each teacher's possible demand (every period they could be given)
+      against the periods they are available in a week, as a warning;
+    - lessons needing a room type against the rooms of that type (how
+      many, and whether any seats the class), as warnings: rooms are
+      allocated after placement, so a shortage leaves lessons without a
+      room rather than unplaced.
+
+    Lessons already stored are not considered; the check is about the
+    configuration, as if the term were generated from scratch.
+
+    Args:
+        snapshot (TimetableSnapshot): Inputs of the generation to check
+        max_per_day (int): Most periods of one subject a class may have a day
+        teacher_names (dict): Optional {teacher_id: name} for messages
+
+    Returns:
+        FeasibilityReport
+    """
+    started = time.perf_counter()
+    report = FeasibilityReport()
+    teacher_names = teacher_names or {}
+
+    n_days = len(DAYS)
+    week = n_days * len(snapshot.slot_ids)
+    offering_cap = max_per_day * n_days
+
+    if not week:
+        report.errors.append("No teaching time slots are defined")
+
+    possible = defaultdict(int)
+    subject_demand = defaultdict(int)
+    untaught = defaultdict(list)
+
+    def available(teacher_id):
+        return week - snapshot.teacher_unavailable.get(teacher_id, 0).bit_count()
+
+    offerings = Offerings(snapshot)
+    labels = {class_id: label for class_id, _, label in snapshot.classes}
+    class_demand = offerings.class_demand()
+    total = sum(offerings.periods.values())
+
+    for class_id, _, label in snapshot.classes:
+        demand = class_demand[class_id]
+        if week and demand > week:
+            report.errors.append(
+                f"{label} needs {demand} periods a week but there are only {week} teaching slots"
+            )
+
+    for key, periods in offerings.periods.items():
+        subject_id = key[1]
+        name = snapshot.subject_names[subject_id]
+        label = "/".join(labels[class_id] for class_id in offerings.classes[key])
+        if periods > offering_cap:
+            report.errors.append(
+                f"{name} in {label} needs {periods} periods a week but at most "
+                f"{offering_cap} fit at {max_per_day} a day"
+            )
+
+        teachers = snapshot.subject_teachers.get(subject_id, [])
+        if not teachers:
+            untaught[subject_id].append(label)
+            continue
+
+        subject_demand[subject_id] += periods
+        for teacher_id in teachers:
+            possible[teacher_id] += periods
+
+    for subject_id, labels in untaught.items():
+        report.warnings.append(
+            f"No teacher for {snapshot.subject_names[subject_id]} (needed by "
+            f"{', '.join(labels)}); its lessons are left unplaced"
+        )
+
+    # Hall's condition: every subject taught only by teachers in a set has
+    # to fit in their combined week.
+    teacher_sets = defaultdict(list)
+    for subject_id in subject_demand:
+        teacher_sets[frozenset(snapshot.subject_teachers[subject_id])].append(subject_id)
+    for teachers, subjects in hall_sets(teacher_sets):
+        demand = sum(subject_demand[subject_id] for subject_id in subjects)
+        capacity = sum(available(teacher_id) for teacher_id in teachers)
+        if demand > capacity:
+            names = sorted(teacher_names.get(t, f"Teacher #{t}") for t in teachers)
+            if len(names) == 1:
+                teach = f"only {names[0]} teaches"
+            else:
+                teach = f"only {', '.join(names)} teach"
+            report.errors.append(
+                f"{', '.join(snapshot.subject_names[s] for s in subjects)} "
+                f"{'needs' if len(subjects) == 1 else 'need'} {demand} periods a week but "
+                f"{teach} {'it' if len(subjects) == 1 else 'them'}, at most {capacity}"
+            )
+
+    for teacher_id, demand in possible.items():
+        if demand > available(teacher_id):
+            name = teacher_names.get(teacher_id, f"Teacher #{teacher_id}")
+            if teacher_id in snapshot.teacher_unavailable:
+                limit = f"{available(teacher_id)} periods they are available"
+            else:
+                limit = f"{week} teaching slots"
+            report.warnings.append(
+                f"{name} could be given up to {demand} periods a week, more than the {limit}; "
+                f"the load must be shared with other teachers"
+            )
+
+    room_demand = defaultdict(int)
+    for key, periods in offerings.periods.items():
+        room_type = snapshot.subject_rooms.get(key[1])
+        if not room_type:
+            continue
+        school_id = snapshot.class_schools.get(key[0])
+        room_demand[(school_id, room_type)] += periods
+        rooms = [room for room in snapshot.rooms.get(school_id, []) if room[1] == room_type]
+        size = snapshot.class_sizes.get(key[0])
+        if rooms and size and all(capacity < size for _, _, capacity in rooms):
+            label = "/".join(labels[class_id] for class_id in offerings.classes[key])
+            report.warnings.append(
+                f"No {room_type} seats the {size} students of {label} for "
+                f"{snapshot.subject_names[key[1]]}"
+            )
+    for (school_id, room_type), demand in room_demand.items():
+        count = sum(1 for room in snapshot.rooms.get(school_id, []) if room[1] == room_type)
+        if demand > count * week:
+            report.warnings.append(
+                f"Lessons needing a {room_type} add up to {demand} periods a week but "
+                f"{count} {room_type} room{'' if count == 1 else 's'} can take at "
+                f"most {count * week}; the rest get no room"
+            )
+
+    report.stats = {
+        "classes": len(snapshot.classes),
+        "teachers": len(possible),
+        "periods": total,
+        "teaching_slots": week,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+    return report
+
+
+def hall_sets(teacher_sets):
+    """
+    The teacher sets `analyse_snapshot` checks Hall's condition on, each
+    with the subjects taught only by teachers in it: every distinct set
+    of subject teachers, then the union of each group of sets linked by
+    a shared teacher.
+
+    Checking every union of sets is exponential, so these are the unions
+    that matter most: a subject never competes for teachers outside its
+    group. Subsets are found through a teacher -> sets index, so the cost
+    is the number of (set, set sharing a teacher) pairs rather than every
+    pair of sets.
+
+    Args:
+        teacher_sets (dict): {frozenset of teacher ids: [subject ids]}
+
+    Yields:
+        (frozenset, list) tuples of teachers and subjects
+    """
+    containing = defaultdict(list)
+    for teachers in teacher_sets:
+        for teacher_id in teachers:
+            containing[teacher_id].append(teachers)
+
+    for teachers in teacher_sets:
+        # A set shares len(other) teachers with `teachers` only when it
+        # is a subset.
+        shared = defaultdict(int)
+        for teacher_id in teachers:
+            for other in containing[teacher_id]:
+                shared[other] += 1
+        yield teachers, [
+            subject_id
+            for other, count in shared.items() if count == len(other)
+            for subject_id in teacher_sets[other]
+        ]
+
+    # Union-find over teachers groups the sets linked by shared teachers.
+    parent = {}
+
+    def find(teacher_id):
+        parent.setdefault(teacher_id, teacher_id)
+        while parent[teacher_id] != teacher_id:
+            parent[teacher_id] = parent[parent[teacher_id]]
+            teacher_id = parent[teacher_id]
+        return teacher_id
+
+    for teachers in teacher_sets:
+        first, *rest = teachers
+        for teacher_id in rest:
+            parent[find(teacher_id)] = find(first)
+
+    groups = defaultdict(list)
+    for teachers in teacher_sets:
+        groups[find(next(iter(teachers)))].append(teachers)
+    for sets in groups.values():
+        if len(sets) > 1:
+            union = frozenset().union(*sets)
+            if union not in teacher_sets:
+                yield union, [subject_id for teachers in sets for subject_id in teacher_sets[teachers]]
+
+
+def teacher_names_for(snapshot):
+    """Names of the teachers a snapshot refers to, in one query."""
+    teacher_ids = {
+        teacher_id
+        for teachers in snapshot.subject_teachers.values()
+        for teacher_id in teachers
+    }
+    return dict(Teacher.objects.filter(id__in=teacher_ids).values_list("id", "name"))
@@ -2,7 +2,9 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 
-from .models import School, UserProfile
+from .models import School, Teacher, UserProfile
+from .occupancy import DAYS, SLOTS_PER_DAY, availability_bit, iter_bits
+from .weekgrid import week_grid
 
 
 class SignUpForm(UserCreationForm):
@@ -57,3 +59,54 @@ class SignUpForm(UserCreationForm):
 
         return user
 
+
+
+class TeacherForm(forms.ModelForm):
+    """
+    Teacher name plus a period x day grid of checkboxes for the periods
+    the teacher cannot teach, saved as the `unavailable` bitmask.
+
+    Periods are the teaching TimeSlots in start_time order (at most
+    SLOTS_PER_DAY a day). Bits of periods not on the grid any more are
+    kept as they are.
+    """
+    unavailable = forms.TypedMultipleChoiceField(
+        coerce=int,
+        required=False,
+        widget=forms.CheckboxSelectMultiple,
+        label="Unavailable periods",
+    )
+
+    class Meta:
+        model = Teacher
+        fields = ["name", "unavailable"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.days = DAYS
+        self.periods = week_grid().teaching_slots[:SLOTS_PER_DAY]
+        # Period-major, so the checkboxes read as one row per period.
+        self.fields["unavailable"].choices = [
+            (availability_bit(day_index, period), f"{day} {slot.name}")
+            for period, slot in enumerate(self.periods)
+            for day_index, day in enumerate(DAYS)
+        ]
+        self.grid_mask = 0
+        for bit, _ in self.fields["unavailable"].choices:
+            self.grid_mask |= 1 << bit
+        self.initial["unavailable"] = list(iter_bits(self.instance.unavailable))
+
+    def clean_unavailable(self):
+        mask = self.instance.unavailable & ~self.grid_mask
+        for bit in self.cleaned_data["unavailable"]:
+            mask |= 1 << bit
+        return mask
+
+    def availability_rows(self):
+        """[(TimeSlot, [checkbox per day])] for the template's grid."""
+        boxes = list(self["unavailable"])
+        n_days = len(DAYS)
+        return [
+            (slot, boxes[period * n_days:(period + 1) * n_days])
+            for period, slot in enumerate(self.periods)
+        ]
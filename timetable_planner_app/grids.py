@@ -0,0 +1,89 @@
+"""
+Class timetables for display and export.
+
+Every page or file that shows timetables (the grid view, the single
+stream view, the PDF exports) needs the same thing: each class's lessons
+of one term, looked up by (time slot, day). `class_timetables` loads a
+school's whole term in one query, with the subject, teacher and room of
+every lesson joined in and its time slot taken from the compiled week
+grid, and groups it in Python, so the number of queries stays the same
+however many classes the school has.
+
+A cell holds one lesson, or one per subject of an elective block: the
+block's lessons are stored for every class of the level (see
+`electives`), so each class shows all of them in the block's cells.
+"""
+
+from timetable_planner_app.models import AcademicTerm, LessonInstance, SchoolClass
+from timetable_planner_app.weekgrid import week_grid
+
+
+class ClassTimetable:
+    """
+    The lessons of one class in one term.
+
+    Attributes:
+        school_class (SchoolClass): the class, with its level and stream loaded
+        lessons (list): its LessonInstances, by day then start time
+    """
+
+    def __init__(self, school_class):
+        self.school_class = school_class
+        self.lessons = []
+        self.cells = {}  # (time_slot_id, day): [lesson, ...]
+
+    def add(self, lesson):
+        self.lessons.append(lesson)
+        self.cells.setdefault((lesson.time_slot_id, lesson.day), []).append(lesson)
+
+    def lessons_at(self, time_slot_id, day):
+        """Returns the lessons held in the cell (several for an elective block), [] if it is free."""
+        return self.cells.get((time_slot_id, day), [])
+
+    def __str__(self):
+        return str(self.school_class)
+
+
+def class_timetables(school, term, classes=None):
+    """
+    Builds the timetable of every class of `school` for `term`.
+
+    Args:
+        school: School (or its id) whose classes to show
+        term (AcademicTerm): the term, or None for empty timetables
+        classes: SchoolClass queryset or list to limit the result to;
+            every class of the school by default
+
+    Returns:
+        list: ClassTimetable per class, by level then stream, including
+        classes without lessons
+    """
+    if classes is None:
+        classes = SchoolClass.objects.filter(school=school)
+    if hasattr(classes, "select_related"):
+        classes = classes.select_related("level", "stream").order_by("level", "stream")
+    timetables = {school_class.id: ClassTimetable(school_class) for school_class in classes}
+    if term is None or not timetables:
+        return list(timetables.values())
+
+    lessons = LessonInstance.objects.filter(
+        term=term,
+        school_class__school=school,
+        school_class_id__in=list(timetables),
+    ).select_related(
+        "subject", "teacher", "room"
+    ).order_by("day", "time_slot__start_time", "subject__name")
+
+    week = week_grid()
+    for lesson in lessons:
+        timetable = timetables[lesson.school_class_id]
+        # Share the already loaded class, term and slot so str(lesson)
+        # needs no query.
+        lesson.school_class = timetable.school_class
+        if isinstance(term, AcademicTerm):
+            lesson.term = term
+        slot = week.slot(lesson.time_slot_id)
+        if slot is not None:
+            lesson.time_slot = slot
+        timetable.add(lesson)
+    return list(timetables.values())
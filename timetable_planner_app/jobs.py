@@ -0,0 +1,288 @@
+"""
+Database-backed queue for timetable generation.
+
+The dashboard enqueues a GenerationJob and returns at once; the
+`run_jobs` management command claims queued jobs and runs them with
+`generate_timetable`, writing progress back to the job row so the
+dashboard can poll it. No broker is needed, only the database.
+
+Generation is single-flight per (school, term): a request for a school
+and term that already has a queued or running job joins that job instead
+of starting another, decided under a GenerationLock row lock. A
+whole-term run (no school, or every school with `all_schools`) writes
+every school's rows, so it conflicts with each per-school run of the
+term: a per-school request joins an active whole-term job, and a job is
+only started while no conflicting job is running.
+"""
+
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from timetable_planner_app.models import AcademicTerm, GenerationJob, GenerationLock
+from timetable_planner_app.utils import GenerationResult, generate_all_schools, generate_timetable
+
+PROGRESS_INTERVAL = 0.5  # least seconds between progress writes
+CLAIM_CANDIDATES = 10
+JOB_TIMEOUT = 3600       # seconds after which a running job is taken for dead
+WAIT_INTERVAL = 0.5      # seconds between polls while waiting on a joined job
+
+JOB_OPTIONS = (
+    "clear_existing", "incremental", "mode", "budget", "seed", "seeds", "workers", "use_cache",
+    "warm_start", "all_schools",
+)
+ACTIVE_STATUSES = (GenerationJob.QUEUED, GenerationJob.RUNNING)
+# Jobs (the dashboard, the command) use the solver and the pre-flight
+# check unless their options say otherwise; `generate_timetable` itself
+# keeps the greedy, unchecked defaults its other callers rely on.
+JOB_DEFAULTS = {"mode": "solver", "preflight": True}
+
+
+def _lock(term, school):
+    key = f"{school.pk if school else 'all'}:{term.pk}"
+    GenerationLock.objects.get_or_create(key=key, defaults={"term": term, "school": school})
+    lock = GenerationLock.objects.select_for_update().get(key=key)
+    GenerationLock.objects.filter(pk=lock.pk).update(locked_at=timezone.now())
+
+
+def _lock_scope(term, school):
+    """
+    Locks the term's GenerationLock row and, for a single school, the
+    (school, term) row too, until the surrounding transaction ends.
+
+    Every request takes the term row first, so whole-term and per-school
+    requests of the same term are decided one at a time, and always in
+    the same order.
+
+    select_for_update() takes the row lock on MySQL and PostgreSQL;
+    SQLite ignores it, so the row is also UPDATEd, which makes SQLite
+    take its database write lock instead.
+    """
+    _lock(term, None)
+    if school is not None:
+        _lock(term, school)
+
+
+def _conflicting(term, school):
+    """Jobs of `term` that write rows a run for `school` (None: every school) also writes."""
+    jobs = GenerationJob.objects.filter(term=term)
+    if school is not None:
+        jobs = jobs.filter(Q(school=school) | Q(school__isnull=True))
+    return jobs
+
+
+def enqueue_generation(term, school=None, user=None, **options):
+    """
+    Queues a generation of `term` for `school`, or joins the one already
+    queued or running for the same school and term.
+
+    `options` are passed on to `generate_timetable`, or to
+    `generate_all_schools` with `all_schools`; only the ones in
+    JOB_OPTIONS are accepted, and a `warm_start` term is stored by id. A
+    joined job keeps its own options. A school's request also joins an
+    active whole-term job, which regenerates that school too.
+
+    Returns:
+        tuple: (GenerationJob, created)
+    """
+    unknown = set(options) - set(JOB_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown generation options: {', '.join(sorted(unknown))}")
+    if isinstance(options.get("warm_start"), AcademicTerm):
+        options["warm_start"] = options["warm_start"].pk
+
+    with transaction.atomic():
+        _lock_scope(term, school)
+
+        GenerationJob.objects.filter(
+            term=term,
+            status=GenerationJob.RUNNING,
+            started_at__lt=timezone.now() - timedelta(seconds=JOB_TIMEOUT),
+        ).update(
+            status=GenerationJob.FAILED,
+            message="Timed out",
+            finished_at=timezone.now(),
+        )
+
+        active = (
+            GenerationJob.objects
+            .filter(term=term, status__in=ACTIVE_STATUSES)
+            .filter(Q(school=school) | Q(school__isnull=True))
+            .order_by("created_at")
+            .first()
+        )
+        if active is not None:
+            return active, False
+
+        job = GenerationJob.objects.create(
+            term=term,
+            school=school,
+            requested_by=user,
+            options=options,
+        )
+        return job, True
+
+
+def run_generation_now(term, school=None, user=None, stdout=None, **options):
+    """
+    Generates in the calling process, but still single-flight.
+
+    If no job is active for the school and term one is created and run
+    here, once no conflicting job is running; otherwise this waits for
+    the active job to finish. Either way the finished GenerationJob is
+    returned.
+    """
+    job, created = enqueue_generation(term, school=school, user=user, **options)
+
+    if created:
+        while job.status == GenerationJob.QUEUED:
+            if claim_job(job.id):
+                return run_job(job, stdout=stdout)
+            time.sleep(WAIT_INTERVAL)
+            job.refresh_from_db()
+    elif stdout:
+        stdout.write(f"Joining {job}, already in progress")
+    while job.is_active:
+        time.sleep(WAIT_INTERVAL)
+        job.refresh_from_db()
+    return job
+
+
+def claim_next_job():
+    """
+    Marks the oldest queued job as running and returns it, or None.
+
+    The claim is a conditional UPDATE on the job's status, so two workers
+    polling at once can never both take the same job.
+    """
+    queued = (
+        GenerationJob.objects
+        .filter(status=GenerationJob.QUEUED)
+        .order_by("created_at", "id")
+        .values_list("id", flat=True)[:CLAIM_CANDIDATES]
+    )
+    for job_id in list(queued):
+        job = claim_job(job_id)
+        if job is not None:
+            return job
+    return None
+
+
+def claim_job(job_id):
+    """
+    Marks job `job_id` as running and returns it, or returns None if it is
+    no longer queued or a conflicting job (see `_conflicting`) is running;
+    such a job stays queued and is claimed once that one finishes.
+    """
+    job = GenerationJob.objects.select_related("term", "school").filter(id=job_id).first()
+    if job is None:
+        return None
+    with transaction.atomic():
+        _lock_scope(job.term, job.school)
+        if _conflicting(job.term, job.school).filter(status=GenerationJob.RUNNING).exists():
+            return None
+        claimed = GenerationJob.objects.filter(
+            id=job_id, status=GenerationJob.QUEUED
+        ).update(status=GenerationJob.RUNNING, started_at=timezone.now())
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def combined_result(results):
+    """One GenerationResult totalling the per-school results of `generate_all_schools`."""
+    combined = GenerationResult([], 0, stats={})
+    for result in results:
+        combined.placements.extend(result.placements)
+        combined.periods_requested += result.periods_requested
+        for key, value in result.stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                combined.stats[key] = combined.stats.get(key, 0) + value
+    return combined
+
+
+def run_job(job, stdout=None):
+    """
+    Runs a claimed job to completion and records the outcome on it.
+
+    Progress is written at most every PROGRESS_INTERVAL seconds so a fast
+    solver does not turn into a stream of UPDATEs.
+    """
+    jobs = GenerationJob.objects.filter(id=job.id)
+    last_write = 0.0
+
+    def progress(classes_done, classes_total, periods_placed, periods_requested):
+        nonlocal last_write
+        now = time.monotonic()
+        if classes_done < classes_total and now - last_write < PROGRESS_INTERVAL:
+            return
+        last_write = now
+        jobs.update(
+            classes_done=classes_done,
+            classes_total=classes_total,
+            periods_placed=periods_placed,
+            periods_requested=periods_requested,
+        )
+
+    options = {**JOB_DEFAULTS, **job.options}
+    all_schools = options.pop("all_schools", False)
+    try:
+        if options.get("warm_start"):
+            options["warm_start"] = AcademicTerm.objects.get(pk=options["warm_start"])
+        if all_schools:
+            result = combined_result(
+                generate_all_schools(term=job.term, stdout=stdout, **options).values()
+            )
+        else:
+            result = generate_timetable(
+                term=job.term,
+                school=job.school,
+                stdout=stdout,
+                progress=progress,
+                **options,
+            )
+    except Exception as e:
+        jobs.update(
+            status=GenerationJob.FAILED,
+            message=str(e),
+            finished_at=timezone.now(),
+        )
+    else:
+        rooms_missing = result.stats.get("rooms_missing", 0)
+        message = (
+            f"Placed {result.periods_placed}/{result.periods_requested} periods "
+            f"({result.placement_rate:.1%})"
+        )
+        if rooms_missing:
+            message += f"; {rooms_missing} lessons got no room"
+        jobs.update(
+            status=GenerationJob.DONE,
+            periods_placed=result.periods_placed,
+            periods_requested=result.periods_requested,
+            rooms_missing=rooms_missing,
+            message=message,
+            finished_at=timezone.now(),
+        )
+
+    job.refresh_from_db()
+    return job
+
+
+def job_status(job):
+    """JSON-ready summary of a job for the dashboard to poll."""
+    return {
+        "id": job.id,
+        "status": job.status,
+        "term": str(job.term),
+        "classes_done": job.classes_done,
+        "classes_total": job.classes_total,
+        "periods_placed": job.periods_placed,
+        "periods_requested": job.periods_requested,
+        "rooms_missing": job.rooms_missing,
+        "elapsed": round(job.elapsed, 1),
+        "message": job.message,
+    }
@@ -0,0 +1,404 @@
+"""
+Time-budgeted local search over an in-memory timetable.
+
+Runs simulated annealing on the placements produced by the generator.
+The cost is a weighted count of periods still unplaced plus the
+timetable's quality score (`scoring.Scorer`: teacher gaps, subject
+spread, clustering and load imbalance). Every move is priced with the
+scorer's delta over the two or four lessons it touches, so a move costs
+the same whatever the size of the school.
+"""
+
+from collections import defaultdict
+import math
+import random
+import time
+
+from timetable_planner_app.electives import Offerings
+from timetable_planner_app.occupancy import Occupancy, nth_bit
+from timetable_planner_app.scoring import Scorer
+
+UNPLACED_WEIGHT = 10
+
+START_TEMPERATURE = 2.0
+END_TEMPERATURE = 0.05
+TIME_CHECK_EVERY = 1024
+
+FIXED = -1
+UNPLACED = -1
+
+
+class LocalSearch:
+    """
+    Simulated annealing over lesson placements.
+
+    Moves:
+      * insert: put an unplaced period in a cell its class and teacher
+        both have free;
+      * eject: put an unplaced period in a cell where only its class is
+        busy, unplacing the lesson that was there;
+      * move: shift a lesson to another cell free for its class and teacher;
+      * swap: exchange the cells of two lessons of the same class.
+
+    Lessons that were already stored before the run never move, nor do
+    the lessons of elective blocks, which hold a cell for every class of
+    their level at once.
+    """
+
+    def __init__(self, snapshot, result, max_per_day, seed=None):
+        self.rng = random.Random(seed)
+        self.max_per_day = max_per_day
+        self.occupancy = Occupancy(snapshot.slot_ids)
+        occupancy = self.occupancy
+        self.n_slots = occupancy.n_slots
+        self.score = Scorer(snapshot.slot_ids, max_per_day)
+        self.result = result
+
+        self.pair_index = {}
+        self.pair_count = []    # per pair: lessons on each day
+        self.pair_blocked = []  # per pair: mask of days already at max_per_day
+
+        self.l_class = []
+        self.l_subject = []
+        self.l_teacher = []
+        self.l_pair = []
+        self.l_cell = []
+        self.class_cell = {}
+        self.unplaced = []
+        self.unplaced_pos = {}
+        self.fixed = []  # the result's own placements that never move (elective blocks)
+
+        self._load(snapshot, result)
+
+    # -----------------------------
+    # Setup
+    # -----------------------------
+
+    def _pair(self, class_id, subject_id):
+        key = (class_id, subject_id)
+        index = self.pair_index.get(key)
+        if index is None:
+            index = self.pair_index[key] = len(self.pair_count)
+            self.pair_count.append([0] * len(self.occupancy.days))
+            self.pair_blocked.append(0)
+        return index
+
+    def _count(self, pair, day, change):
+        counts = self.pair_count[pair]
+        counts[day] += change
+        day_mask = self.occupancy.day_masks[day]
+        if counts[day] >= self.max_per_day:
+            self.pair_blocked[pair] |= day_mask
+        else:
+            self.pair_blocked[pair] &= ~day_mask
+
+    def _load(self, snapshot, result):
+        occupancy = self.occupancy
+        offerings = Offerings(snapshot)
+
+        periods = defaultdict(int)
+        teacher_of = {}
+        placed = [(row, False) for row in snapshot.existing]
+        for row in result.placements:
+            movable = (row[0], row[1]) not in offerings.block_of
+            placed.append((row, movable))
+            if not movable:
+                self.fixed.append(tuple(row))
+        for (class_id, subject_id, teacher_id, day, slot_id), movable in placed:
+            cell = occupancy.cell(day, slot_id)
+            if movable:
+                self._add_lesson(class_id, subject_id, teacher_id, cell)
+            elif cell is not None:
+                pair = self._pair(class_id, subject_id)
+                occupancy.occupy(cell, teacher_id=teacher_id)
+                for member in offerings.classes_of(class_id, subject_id):
+                    occupancy.occupy(cell, class_id=member)
+                    self.class_cell[(member, cell)] = FIXED
+                self._count(pair, occupancy.day_of(cell), 1)
+                self.score.add(class_id, subject_id, teacher_id, cell)
+            key = offerings.key(class_id, subject_id)
+            periods[key] += 1
+            teacher_of.setdefault(key, teacher_id)
+
+        # Whatever the offerings still ask for becomes unplaced periods,
+        # taught by the teacher already used (or assigned) for that class
+        # and subject.
+        load = defaultdict(int)
+        for teacher_id, mask in occupancy.teachers.items():
+            load[teacher_id] = mask.bit_count()
+
+        # From here on a teacher's unavailable periods count as busy, so no
+        # move ever puts a lesson in one.
+        occupancy.mark_unavailable(snapshot.teacher_unavailable)
+
+        # Elective blocks short of cells stay short: only the solver places
+        # a block, since it has to fit every class of the level at once.
+        for pair, wanted in offerings.periods.items():
+            if pair in offerings.block_keys:
+                continue
+            class_id, subject_id = pair
+            missing = wanted - periods[pair]
+            teachers = snapshot.subject_teachers.get(subject_id)
+            if missing <= 0 or not teachers:
+                continue
+            teacher_id = teacher_of.get(pair) or result.assignment.get(pair)
+            if teacher_id is None:
+                teacher_id = min(teachers, key=lambda t: (load[t], t))
+                teacher_of[pair] = teacher_id
+            load[teacher_id] += missing
+            for _ in range(missing):
+                self._add_lesson(class_id, subject_id, teacher_id, None)
+
+    def _add_lesson(self, class_id, subject_id, teacher_id, cell):
+        index = len(self.l_class)
+        self.l_class.append(class_id)
+        self.l_subject.append(subject_id)
+        self.l_teacher.append(teacher_id)
+        self.l_pair.append(self._pair(class_id, subject_id))
+        self.l_cell.append(UNPLACED)
+        if cell is None:
+            self._unplace_index(index)
+        else:
+            self._put(index, cell)
+
+    # -----------------------------
+    # State changes
+    # -----------------------------
+
+    def _lesson(self, i, cell):
+        return self.l_class[i], self.l_subject[i], self.l_teacher[i], cell
+
+    def _put(self, i, cell):
+        self.l_cell[i] = cell
+        self.occupancy.occupy(cell, teacher_id=self.l_teacher[i], class_id=self.l_class[i])
+        self.class_cell[(self.l_class[i], cell)] = i
+        self._count(self.l_pair[i], cell // self.n_slots, 1)
+        self.score.add(*self._lesson(i, cell))
+
+    def _take(self, i):
+        cell = self.l_cell[i]
+        self.occupancy.release(cell, teacher_id=self.l_teacher[i], class_id=self.l_class[i])
+        del self.class_cell[(self.l_class[i], cell)]
+        self._count(self.l_pair[i], cell // self.n_slots, -1)
+        self.score.remove(*self._lesson(i, cell))
+        self.l_cell[i] = UNPLACED
+
+    def _unplace_index(self, i):
+        self.unplaced_pos[i] = len(self.unplaced)
+        self.unplaced.append(i)
+
+    def _place_index(self, i):
+        pos = self.unplaced_pos.pop(i)
+        last = self.unplaced.pop()
+        if last != i:
+            self.unplaced[pos] = last
+            self.unplaced_pos[last] = pos
+
+    # -----------------------------
+    # Costs
+    # -----------------------------
+
+    def teacher_gaps(self):
+        return self.score.components["gaps"]
+
+    def cost(self):
+        return UNPLACED_WEIGHT * len(self.unplaced) + self.score.total
+
+    # -----------------------------
+    # Moves
+    # -----------------------------
+
+    def _random_bit(self, mask):
+        return nth_bit(mask, self.rng.randrange(mask.bit_count()))
+
+    def _propose_unplaced(self):
+        """Insert or eject for a random unplaced period: (delta, apply) or None."""
+        occupancy = self.occupancy
+        i = self.unplaced[self.rng.randrange(len(self.unplaced))]
+        class_id, teacher_id = self.l_class[i], self.l_teacher[i]
+        teacher_mask = occupancy.teachers.get(teacher_id, 0)
+        allowed = occupancy.full_mask & ~teacher_mask & ~self.pair_blocked[self.l_pair[i]]
+        if not allowed:
+            return None
+
+        free = allowed & ~occupancy.classes.get(class_id, 0)
+        if free:
+            cell = self._random_bit(free)
+            delta = -UNPLACED_WEIGHT + self.score.delta(adds=[self._lesson(i, cell)])
+
+            def apply():
+                self._place_index(i)
+                self._put(i, cell)
+            return delta, apply
+
+        cell = self._random_bit(allowed)
+        j = self.class_cell.get((class_id, cell))
+        if j is None or j == FIXED:
+            return None
+        delta = self.score.delta(removes=[self._lesson(j, cell)], adds=[self._lesson(i, cell)])
+
+        def apply():
+            self._take(j)
+            self._unplace_index(j)
+            self._place_index(i)
+            self._put(i, cell)
+        return delta, apply
+
+    def _propose_placed(self):
+        """Move or swap for a random placed lesson: (delta, apply) or None."""
+        occupancy = self.occupancy
+        rng = self.rng
+        i = rng.randrange(len(self.l_cell))
+        a = self.l_cell[i]
+        if a == UNPLACED:
+            return None
+        class_id, teacher_id = self.l_class[i], self.l_teacher[i]
+        teacher_mask = occupancy.teachers.get(teacher_id, 0)
+        day_a = a // self.n_slots
+        own_day = occupancy.day_masks[day_a]
+
+        if rng.random() < 0.5:
+            allowed = ~self.pair_blocked[self.l_pair[i]] | own_day
+            free = occupancy.free_mask(teacher_id, class_id) & allowed
+            if not free:
+                return None
+            b = self._random_bit(free)
+            delta = self.score.delta(removes=[self._lesson(i, a)], adds=[self._lesson(i, b)])
+
+            def apply():
+                self._take(i)
+                self._put(i, b)
+            return delta, apply
+
+        class_mask = occupancy.classes.get(class_id, 0) & ~(1 << a)
+        if not class_mask:
+            return None
+        b = self._random_bit(class_mask)
+        j = self.class_cell.get((class_id, b))
+        if j is None or j == FIXED:
+            return None
+        other = self.l_teacher[j]
+        if other == teacher_id:
+            return None
+        other_mask = occupancy.teachers.get(other, 0)
+        if teacher_mask >> b & 1 or other_mask >> a & 1:
+            return None
+
+        day_b = b // self.n_slots
+        if day_a != day_b and self.l_pair[i] != self.l_pair[j]:
+            if (self.pair_count[self.l_pair[i]][day_b] >= self.max_per_day
+                    or self.pair_count[self.l_pair[j]][day_a] >= self.max_per_day):
+                return None
+
+        delta = self.score.delta(
+            removes=[self._lesson(i, a), self._lesson(j, b)],
+            adds=[self._lesson(i, b), self._lesson(j, a)],
+        )
+
+        def apply():
+            self._take(i)
+            self._take(j)
+            self._put(i, b)
+            self._put(j, a)
+        return delta, apply
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+
+    def run(self, budget):
+        """Anneals for `budget` seconds and keeps the best timetable seen."""
+        rng = self.rng
+        started = time.perf_counter()
+        # Nothing to move when every period was already stored (a run that
+        # only keeps lessons): end at the first deadline check.
+        deadline = started + budget if self.l_cell else started
+
+        current = self.cost()
+        initial = current
+        gaps_before = self.teacher_gaps()
+        unplaced_before = len(self.unplaced)
+        best = current
+        best_cells = None  # None while the current state is the best one
+        moves = accepted = 0
+        temperature = START_TEMPERATURE
+        cooling = math.log(END_TEMPERATURE / START_TEMPERATURE)
+
+        while True:
+            if moves % TIME_CHECK_EVERY == 0:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                progress = (now - started) / budget
+                temperature = START_TEMPERATURE * math.exp(cooling * progress)
+            moves += 1
+
+            if self.unplaced and rng.random() < 0.3:
+                proposal = self._propose_unplaced()
+            else:
+                proposal = self._propose_placed()
+            if proposal is None:
+                continue
+
+            delta, apply = proposal
+            if delta > 0 and rng.random() >= math.exp(-delta / temperature):
+                continue
+
+            if delta > 0 and best_cells is None and current == best:
+                best_cells = list(self.l_cell)
+            apply()
+            current += delta
+            accepted += 1
+            if current < best:
+                best = current
+                best_cells = None
+
+        if best_cells is not None:
+            self._restore(best_cells)
+
+        elapsed = time.perf_counter() - started
+        stats = dict(self.result.stats)
+        stats.update({
+            "ls_moves": moves,
+            "ls_accepted": accepted,
+            "ls_moves_per_sec": int(moves / elapsed) if elapsed else moves,
+            "cost_before": initial,
+            "cost_after": self.cost(),
+            "gaps_before": gaps_before,
+            "gaps_after": self.teacher_gaps(),
+            "unplaced_before": unplaced_before,
+            "unplaced_after": len(self.unplaced),
+        })
+        return stats
+
+    def _restore(self, cells):
+        for i, cell in enumerate(self.l_cell):
+            if cell != UNPLACED:
+                self._take(i)
+            else:
+                self._place_index(i)
+        for i, cell in enumerate(cells):
+            if cell != UNPLACED:
+                self._put(i, cell)
+            else:
+                self._unplace_index(i)
+
+    def placements(self):
+        """The result's fixed placements plus every movable lesson in its current cell."""
+        return self.fixed + [
+            (self.l_class[i], self.l_subject[i], self.l_teacher[i]) + self.occupancy.cell_key(cell)
+            for i, cell in enumerate(self.l_cell)
+            if cell != UNPLACED
+        ]
+
+
+def improve_timetable(snapshot, result, budget, max_per_day, seed=None):
+    """
+    Runs `LocalSearch` on `result` for `budget` seconds.
+
+    Returns the improved placements and the run statistics (those of
+    `result` with the local search figures added).
+    """
+    search = LocalSearch(snapshot, result, max_per_day, seed=seed)
+    stats = search.run(budget)
+    return search.placements(), stats
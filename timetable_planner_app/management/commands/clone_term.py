@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from timetable_planner_app.management.commands.generate_timetable import parse_term
+from timetable_planner_app.utils import clone_term
+from timetable_planner_app.models import School
+
+
+class Command(BaseCommand):
+    help = "Copy a term's timetable into another term"
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", metavar="SOURCE", help="Term to copy from, as YEAR:TERM")
+        parser.add_argument("target", metavar="TARGET", help="Term to copy into, as YEAR:TERM")
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete the target term's lessons first",
+        )
+        parser.add_argument(
+            "--school",
+            help="Only copy this school's timetable (code or id)",
+        )
+
+    def handle(self, *args, **options):
+        source = parse_term(options["source"])
+        target = parse_term(options["target"])
+
+        school = None
+        if options["school"]:
+            value = options["school"]
+            school = School.objects.filter(code=value).first()
+            if school is None and value.isdigit():
+                school = School.objects.filter(id=int(value)).first()
+            if school is None:
+                raise CommandError(f"No school with code or id {value!r}")
+
+        try:
+            copied = clone_term(source, target, school=school, clear_existing=options["clear"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f"Copied {copied} lessons from {source} to {target}"))
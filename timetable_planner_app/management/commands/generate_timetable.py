@@ -1,6 +1,63 @@
-from django.core.management.base import BaseCommand
-from timetable_planner_app.utils import generate_timetable
-from timetable_planner_app.models import AcademicTerm
+import json
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from timetable_planner_app.utils import check_feasibility, dry_run_generation, GENERATION_MODES
+from timetable_planner_app.feasibility import InfeasibleTimetable
+from timetable_planner_app.jobs import run_generation_now
+from timetable_planner_app.models import AcademicTerm, ClassLevel, School, Subject
+
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+DIFF_LINES = 50  # changes listed by a --dry-run summary
+
+
+def parse_duration(value):
+    """Parses "30s", "2m", "500ms" or a bare number of seconds."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*(ms|s|m|h)?\s*", value)
+    if not match:
+        raise CommandError(f"Invalid duration: {value!r} (use e.g. 30s, 2m)")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2) or "s"]
+
+
+def parse_term(value):
+    """Looks up an AcademicTerm given as "YEAR:TERM" (e.g. 2026:1) or by id."""
+    match = re.fullmatch(r"\s*(\d{4})\s*:\s*(\d)\s*", value)
+    if match:
+        term = AcademicTerm.objects.filter(year=match.group(1), term=match.group(2)).first()
+    elif value.strip().isdigit():
+        term = AcademicTerm.objects.filter(id=int(value)).first()
+    else:
+        raise CommandError(f"Invalid term: {value!r} (use YEAR:TERM, e.g. 2026:1)")
+    if term is None:
+        raise CommandError(f"No AcademicTerm {value!r}")
+    return term
+
+
+def parse_periods(values):
+    """
+    Parses --periods overrides such as "Physics=5" or "S1:Physics=5".
+
+    Returns:
+        dict: {(level_id or None, subject_id): periods_per_week}
+    """
+    periods = {}
+    for value in values:
+        match = re.fullmatch(r"\s*(?:([^:=]+):)?([^=]+)=\s*(\d+)\s*", value)
+        if not match:
+            raise CommandError(f"Invalid --periods value: {value!r} (use e.g. Physics=5 or S1:Physics=5)")
+        level_name, subject_name, count = match.groups()
+
+        subject = Subject.objects.filter(name__iexact=subject_name.strip()).first()
+        if subject is None:
+            raise CommandError(f"No subject named {subject_name.strip()!r}")
+        level_id = None
+        if level_name:
+            level = ClassLevel.objects.filter(name__iexact=level_name.strip()).first()
+            if level is None:
+                raise CommandError(f"No class level named {level_name.strip()!r}")
+            level_id = level.id
+        periods[(level_id, subject.id)] = int(count)
+    return periods
 
 
 class Command(BaseCommand):
@@ -8,14 +65,252 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--clear", action="store_true")
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Keep lessons that still match the current offerings and teachers; "
+                 "only free and re-place what changed",
+        )
+        parser.add_argument(
+            "--mode",
+            choices=GENERATION_MODES,
+            default="solver",
+            help="Placement algorithm: deterministic constraint solver (default) or random greedy",
+        )
+        parser.add_argument(
+            "--budget",
+            help="Run a local-search improvement pass for this long after placement, e.g. 30s or 2m",
+        )
+        parser.add_argument(
+            "--seeds",
+            type=int,
+            default=1,
+            help="Run this many independently seeded generations and keep the best",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes to run seeded generations (or schools, with --all-schools) on",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed of the run (0 keeps the solver's index order); the same inputs and seed "
+                 "always give the same timetable",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Search again even if a run with the same inputs and seed is stored",
+        )
+        parser.add_argument(
+            "--warm-start",
+            metavar="YEAR:TERM",
+            help="Start from this term's timetable, keeping every lesson that is still valid "
+                 "and only solving the rest",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Generate in memory only and show what would change; nothing is written",
+        )
+        parser.add_argument(
+            "--periods",
+            action="append",
+            default=[],
+            metavar="[LEVEL:]SUBJECT=N",
+            help="With --dry-run, try N periods a week for a subject (in every level that "
+                 "offers it, or only LEVEL); repeatable",
+        )
+        parser.add_argument(
+            "--format",
+            choices=("summary", "json"),
+            default="summary",
+            help="Output of --dry-run: a readable summary (default) or the full result as JSON",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only run the pre-flight feasibility check and print its report "
+                 "(one per school with --all-schools)",
+        )
+        scope = parser.add_mutually_exclusive_group()
+        scope.add_argument(
+            "--school",
+            help="Only generate for this school (code or id)",
+        )
+        scope.add_argument(
+            "--all-schools",
+            action="store_true",
+            help="Generate every school as a separate partition, in parallel across --workers",
+        )
+
+    def get_school(self, value):
+        school = School.objects.filter(code=value).first()
+        if school is None and value.isdigit():
+            school = School.objects.filter(id=int(value)).first()
+        if school is None:
+            raise CommandError(f"No school with code or id {value!r}")
+        return school
+
+    def print_report(self, report, label=None):
+        prefix = f"{label}: " if label else ""
+        for error in report.errors:
+            self.stdout.write(self.style.ERROR(f"{prefix}Error: {error}"))
+        for warning in report.warnings:
+            self.stdout.write(self.style.WARNING(f"{prefix}Warning: {warning}"))
+        self.stdout.write(prefix + ", ".join(f"{key}={value}" for key, value in report.stats.items()))
+        if report.feasible:
+            self.stdout.write(self.style.SUCCESS(f"{prefix}Pre-flight check passed"))
+        elif not label:
+            raise CommandError("Pre-flight check failed; the timetable cannot be generated")
+        return report.feasible
+
+    def check_all_schools(self, term):
+        """Runs the pre-flight check for each school, as `--all-schools` generates them."""
+        failed = [
+            school.name
+            for school in School.objects.order_by("name")
+            if not self.print_report(check_feasibility(term, school=school), label=school.name)
+        ]
+        if failed:
+            raise CommandError(
+                f"Pre-flight check failed for {', '.join(failed)}; these schools would be skipped"
+            )
+
+    def describe(self, lesson):
+        return f"{lesson['class']} {lesson['day']} {lesson['slot']}"
+
+    def print_dry_run(self, outcome):
+        diff = outcome["diff"]
+        self.stdout.write(
+            f"Dry run for {outcome['term']}"
+            + (f" ({outcome['school']})" if outcome["school"] else "")
+            + ": nothing was written"
+        )
+        self.stdout.write(
+            f"Placed {outcome['periods_placed']}/{outcome['periods_requested']} periods "
+            f"({outcome['placement_rate']:.1%})"
+        )
+        self.stdout.write(
+            "Search: " + ", ".join(f"{key}={value}" for key, value in outcome["stats"].items())
+        )
+        self.stdout.write(
+            "Score: " + ", ".join(f"{key}={value}" for key, value in outcome["score"].items())
+        )
+        for warning in outcome["feasibility"]["warnings"]:
+            self.stdout.write(self.style.WARNING(f"Warning: {warning}"))
+        self.stdout.write(
+            f"Against the stored timetable: {len(diff['added'])} added, "
+            f"{len(diff['changed'])} changed, {len(diff['removed'])} removed, "
+            f"{diff['unchanged']} unchanged"
+        )
+
+        lines = [
+            f"  + {self.describe(lesson)}: {lesson['subject']} ({lesson['teacher']})"
+            for lesson in diff["added"]
+        ] + [
+            f"  ~ {self.describe(change['before'])}: {change['before']['subject']} "
+            f"({change['before']['teacher']}) -> {change['after']['subject']} "
+            f"({change['after']['teacher']})"
+            for change in diff["changed"]
+        ] + [
+            f"  - {self.describe(lesson)}: {lesson['subject']} ({lesson['teacher']})"
+            for lesson in diff["removed"]
+        ]
+        for line in lines[:DIFF_LINES]:
+            self.stdout.write(line)
+        if len(lines) > DIFF_LINES:
+            self.stdout.write(f"  ... and {len(lines) - DIFF_LINES} more (use --format json)")
 
     def handle(self, *args, **options):
         term = AcademicTerm.objects.order_by("-year", "-term").first()
+        if not term:
+            raise CommandError("No AcademicTerm found")
+        budget = parse_duration(options["budget"]) if options["budget"] else None
 
-        generate_timetable(
+        if options["check"] and options["all_schools"]:
+            self.check_all_schools(term)
+            return
+        if options["check"]:
+            school = self.get_school(options["school"]) if options["school"] else None
+            self.print_report(check_feasibility(term, school=school))
+            return
+
+        if options["incremental"] and options["clear"]:
+            raise CommandError("--incremental and --clear cannot be combined")
+        if options["incremental"] and options["mode"] != "solver":
+            raise CommandError("--incremental needs --mode solver")
+        warm_start = parse_term(options["warm_start"]) if options["warm_start"] else None
+        if warm_start and options["incremental"]:
+            raise CommandError("--warm-start and --incremental cannot be combined")
+        if warm_start and options["mode"] != "solver":
+            raise CommandError("--warm-start needs --mode solver")
+        if warm_start == term:
+            raise CommandError(f"Cannot warm-start {term} from itself")
+        if options["periods"] and not options["dry_run"]:
+            raise CommandError("--periods only applies to --dry-run")
+        if options["dry_run"] and options["all_schools"]:
+            raise CommandError("--dry-run works on one school or the whole term, not --all-schools")
+
+        if options["dry_run"]:
+            school = self.get_school(options["school"]) if options["school"] else None
+            try:
+                outcome = dry_run_generation(
+                    term=term,
+                    school=school,
+                    periods=parse_periods(options["periods"]),
+                    clear_existing=options["clear"],
+                    mode=options["mode"],
+                    budget=budget,
+                    seeds=options["seeds"],
+                    workers=options["workers"],
+                    incremental=options["incremental"],
+                    seed=options["seed"],
+                    warm_start=warm_start,
+                    preflight=True,
+                )
+            except InfeasibleTimetable as e:
+                self.print_report(e.report)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+            if options["format"] == "json":
+                self.stdout.write(json.dumps(outcome, indent=2))
+            else:
+                self.print_dry_run(outcome)
+            return
+
+        kwargs = dict(
             term=term,
             clear_existing=options["clear"],
-            stdout=self.stdout
+            stdout=self.stdout,
+            mode=options["mode"],
+            budget=budget,
+            seeds=options["seeds"],
+            workers=options["workers"],
+            incremental=options["incremental"],
+            seed=options["seed"],
+            use_cache=not options["no_cache"],
+            warm_start=warm_start,
         )
 
+        # Goes through the job table so it is single-flight with the
+        # dashboard and any other run for the same school and term.
+        if options["all_schools"]:
+            kwargs["all_schools"] = True
+        school = self.get_school(options["school"]) if options["school"] else None
+        job = run_generation_now(school=school, **kwargs)
+        if job.status == job.FAILED:
+            raise CommandError(f"Generation failed: {job.message}")
+
+        if job.rooms_missing:
+            self.stdout.write(self.style.WARNING(
+                f"Warning: {job.rooms_missing} lessons need a room but none was free; "
+                "add rooms or check validate_timetable"
+            ))
+            self.stdout.write(self.style.WARNING("Timetable generated without all rooms"))
+            return
         self.stdout.write(self.style.SUCCESS("Timetable generated ✅"))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from timetable_planner_app.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued timetable generation jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run every job that is queued now, then exit",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between polls when the queue is empty",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Waiting for generation jobs")
+
+        while True:
+            job = claim_next_job()
+
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+                continue
+
+            self.stdout.write(f"Running {job}")
+            job = run_job(job)
+
+            if job.status == job.DONE:
+                self.stdout.write(self.style.SUCCESS(f"{job}: {job.message}"))
+            else:
+                self.stdout.write(self.style.ERROR(f"{job}: {job.message}"))
@@ -0,0 +1,120 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from timetable_planner_app.management.commands.generate_timetable import parse_term
+from timetable_planner_app.models import LessonInstance, School, SchoolClass, Subject, Teacher
+from timetable_planner_app.tensor import load_tensor
+from timetable_planner_app.utils import MAX_PER_DAY, latest_term
+from timetable_planner_app.weekgrid import week_grid
+
+ISSUE_LINES = 20  # issues listed per check
+
+
+class Command(BaseCommand):
+    help = (
+        "Check a stored timetable for clashes, per-day subject limits, teacher availability, "
+        "rooms, gaps and load"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--term",
+            metavar="YEAR:TERM",
+            help="Term to check (default: the latest)",
+        )
+        parser.add_argument(
+            "--school",
+            help="Only check this school (code or id)",
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="Print the summary counts as JSON; still fails if any check does",
+        )
+
+    def handle(self, *args, **options):
+        if options["term"]:
+            term = parse_term(options["term"])
+        else:
+            try:
+                term = latest_term()
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        school = None
+        if options["school"]:
+            value = options["school"]
+            school = School.objects.filter(code=value).first()
+            if school is None and value.isdigit():
+                school = School.objects.filter(id=int(value)).first()
+            if school is None:
+                raise CommandError(f"No school with code or id {value!r}")
+
+        started = time.perf_counter()
+        tensor = load_tensor(term, school=school)
+        unavailable = dict(
+            Teacher.objects.filter(id__in=tensor.teacher_ids.tolist())
+            .exclude(unavailable=0).values_list("id", "unavailable")
+        )
+        # Lessons of subjects that need a special room but were given none.
+        roomless = LessonInstance.objects.filter(
+            term=term, room__isnull=True, subject__room_type__isnull=False
+        ).exclude(subject__room_type="")
+        if school is not None:
+            roomless = roomless.filter(school_class__school=school)
+        roomless = list(roomless.values_list("school_class_id", "subject_id", "day", "time_slot_id"))
+
+        summary = tensor.summary(MAX_PER_DAY, unavailable)
+        summary["rooms_missing"] = len(roomless)
+        summary["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+        classes = {c.id: str(c) for c in SchoolClass.objects.filter(id__in=tensor.class_ids.tolist())
+                   .select_related("level", "stream")}
+        teachers = dict(Teacher.objects.filter(id__in=tensor.teacher_ids.tolist()).values_list("id", "name"))
+        subjects = dict(Subject.objects.filter(id__in=tensor.subject_ids.tolist()).values_list("id", "name"))
+        slots = {slot.id: slot.name for slot in week_grid().slots}
+
+        issues = [
+            (
+                "Class double-booked",
+                [f"{classes[c]} {day} {slots[s]} ({n} lessons)" for c, day, s, n in tensor.class_clashes()],
+            ),
+            (
+                "Teacher clash",
+                [f"{teachers[t]} {day} {slots[s]} ({n} lessons)" for t, day, s, n in tensor.teacher_clashes()],
+            ),
+            (
+                f"More than {MAX_PER_DAY} periods a day",
+                [
+                    f"{subjects[sub]} in {classes[c]} on {day} ({n} periods)"
+                    for c, sub, day, n in tensor.subject_day_overflows(MAX_PER_DAY)
+                ],
+            ),
+            (
+                "Teacher unavailable",
+                [f"{teachers[t]} {day} {slots[s]}" for t, day, s in tensor.unavailable_lessons(unavailable)],
+            ),
+            (
+                "No room",
+                [f"{subjects[sub]} in {classes[c]} {day} {slots[s]}" for c, sub, day, s in roomless],
+            ),
+        ]
+        failed = any(lines for _, lines in issues)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(summary, indent=2))
+            if failed:
+                raise CommandError(f"{term} timetable has clashes, broken limits or missing rooms")
+            return
+
+        for title, lines in issues:
+            for line in lines[:ISSUE_LINES]:
+                self.stdout.write(self.style.ERROR(f"{title}: {line}"))
+            if len(lines) > ISSUE_LINES:
+                self.stdout.write(self.style.ERROR(f"{title}: ... and {len(lines) - ISSUE_LINES} more"))
+
+        self.stdout.write(", ".join(f"{key}={value}" for key, value in summary.items()))
+        if failed:
+            raise CommandError(f"{term} timetable has clashes, broken limits or missing rooms")
+        self.stdout.write(self.style.SUCCESS(f"{term} timetable is valid"))
@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 19:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable_planner_app', '0003_alter_schoolclass_school_alter_subject_color_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('seed', models.IntegerField(default=0)),
+                ('mode', models.CharField(max_length=20)),
+                ('placements', models.JSONField()),
+                ('freed_ids', models.JSONField(default=list)),
+                ('periods_requested', models.PositiveIntegerField()),
+                ('stats', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('school', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='timetable_planner_app.school')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='timetable_planner_app.academicterm')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['fingerprint', 'seed'], name='timetable_p_fingerp_26fd58_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 19:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable_planner_app', '0005_generationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('school', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='timetable_planner_app.school')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='timetable_planner_app.academicterm')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 20:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable_planner_app', '0006_generationlock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True)),
+                ('total', models.IntegerField(default=0)),
+                ('components', models.JSONField(default=dict)),
+                ('teachers', models.JSONField(default=dict)),
+                ('lessons', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('school', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='timetable_planner_app.school')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='timetable_planner_app.academicterm')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 21:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable_planner_app', '0007_timetablescore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teacher',
+            name='unavailable',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
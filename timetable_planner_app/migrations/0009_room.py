@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-18 22:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable_planner_app', '0008_teacher_unavailable'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schoolclass',
+            name='size',
+            field=models.PositiveIntegerField(blank=True, help_text='Number of students; rooms with a smaller capacity are not used', null=True),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='room_type',
+            field=models.CharField(blank=True, choices=[('Laboratory', 'Laboratory'), ('Computer lab', 'Computer lab'), ('Hall', 'Hall'), ('Workshop', 'Workshop'), ('Classroom', 'Classroom')], max_length=20, null=True),
+        ),
+        migrations.CreateModel(
+            name='Room',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('room_type', models.CharField(choices=[('Laboratory', 'Laboratory'), ('Computer lab', 'Computer lab'), ('Hall', 'Hall'), ('Workshop', 'Workshop'), ('Classroom', 'Classroom')], max_length=20)),
+                ('capacity', models.PositiveIntegerField(help_text='Number of students it seats')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='timetable_planner_app.school')),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='lessoninstance',
+            unique_together={('teacher', 'day', 'time_slot', 'term')},
+        ),
+        migrations.AddField(
+            model_name='lessoninstance',
+            name='room',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='timetable_planner_app.room'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='lessoninstance',
+            unique_together={('room', 'day', 'time_slot', 'term'), ('teacher', 'day', 'time_slot', 'term')},
+        ),
+    ]
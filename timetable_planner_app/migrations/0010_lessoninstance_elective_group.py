@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable_planner_app', '0009_room'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='lessoninstance',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='lessoninstance',
+            name='elective_group',
+            field=models.CharField(blank=True, choices=[('Languages', 'Languages'), ('Religions', 'Religions'), ('Vocationals', 'Vocationals')], max_length=20, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='lessoninstance',
+            constraint=models.UniqueConstraint(condition=models.Q(('elective_group__isnull', True)), fields=('teacher', 'day', 'time_slot', 'term'), name='lesson_teacher_unique_per_cell'),
+        ),
+        migrations.AddConstraint(
+            model_name='lessoninstance',
+            constraint=models.UniqueConstraint(condition=models.Q(('elective_group__isnull', True)), fields=('room', 'day', 'time_slot', 'term'), name='lesson_room_unique_per_cell'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable_planner_app', '0010_lessoninstance_elective_group'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='rooms_missing',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import User
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 
@@ -29,6 +30,10 @@ class UserProfile(models.Model):
 class Teacher(models.Model):
     school = models.ForeignKey(School, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
+    # Week bitmask of the periods the teacher cannot teach: bit
+    # day_index * SLOTS_PER_DAY + period, periods counted over the teaching
+    # slots in start_time order (see occupancy.unavailable_cells).
+    unavailable = models.BigIntegerField(default=0)
 
     def __str__(self):
         return self.name
@@ -51,6 +56,11 @@ class SchoolClass(models.Model):
     school = models.ForeignKey(School, on_delete=models.CASCADE)
     level = models.ForeignKey(ClassLevel, on_delete=models.CASCADE)
     stream = models.ForeignKey(Stream, on_delete=models.CASCADE)
+    size = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Number of students; rooms with a smaller capacity are not used"
+    )
 
     class Meta:
         unique_together = ("level", "stream")
@@ -66,6 +76,14 @@ ELECTIVE_GROUPS = [
     ("Vocationals", "Vocationals"),
 ]
 
+ROOM_TYPES = [
+    ("Laboratory", "Laboratory"),
+    ("Computer lab", "Computer lab"),
+    ("Hall", "Hall"),
+    ("Workshop", "Workshop"),
+    ("Classroom", "Classroom"),
+]
+
 SUBJECT_COLORS = [
     ("blue", "Blue"),
     ("green", "Green"),
@@ -82,6 +100,9 @@ class Subject(models.Model):
     levels = models.ManyToManyField(SchoolClass)  # Which classes study this subject
     teachers = models.ManyToManyField(Teacher)    # Teachers who can teach it
     elective_group = models.CharField(max_length=20, choices=ELECTIVE_GROUPS, null=True, blank=True)
+    # Kind of room every lesson of the subject needs; blank for subjects
+    # taught in the class's own room, which get no room allocated.
+    room_type = models.CharField(max_length=20, choices=ROOM_TYPES, null=True, blank=True)
     color = models.CharField(
         max_length=20,
         choices=SUBJECT_COLORS,
@@ -92,6 +113,19 @@ class Subject(models.Model):
         return self.name
 
 
+class Room(models.Model):
+    school = models.ForeignKey(School, on_delete=models.CASCADE)
+    name = models.CharField(max_length=50)
+    room_type = models.CharField(max_length=20, choices=ROOM_TYPES)
+    capacity = models.PositiveIntegerField(help_text="Number of students it seats")
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+
 DAYS = [
     ("Monday", "Monday"),
     ("Tuesday", "Tuesday"),
@@ -160,9 +194,30 @@ class LessonInstance(models.Model):
     )
     day = models.CharField(max_length=10, choices=DAYS)
     time_slot = models.ForeignKey(TimeSlot, on_delete=models.CASCADE)
+    room = models.ForeignKey(
+        Room,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    # Set on the lessons of an elective block (see electives): the block's
+    # teachers teach every class of the level at once, so each class has
+    # a row per subject of the block and a teacher (and room) one per class.
+    elective_group = models.CharField(max_length=20, choices=ELECTIVE_GROUPS, null=True, blank=True)
 
     class Meta:
-        unique_together = ("teacher", "day", "time_slot", "term")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["teacher", "day", "time_slot", "term"],
+                condition=models.Q(elective_group__isnull=True),
+                name="lesson_teacher_unique_per_cell",
+            ),
+            models.UniqueConstraint(
+                fields=["room", "day", "time_slot", "term"],
+                condition=models.Q(elective_group__isnull=True),
+                name="lesson_room_unique_per_cell",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.school_class} - {self.subject} - {self.term} - {self.day} {self.time_slot}"
@@ -216,3 +271,158 @@ class SubjectOffering(models.Model):
 
 
 
+
+
+class TimetableGeneration(models.Model):
+    """
+    A stored generator run, keyed by the fingerprint of its inputs and its
+    seed, so an identical request can reuse the result instead of searching.
+    """
+    school = models.ForeignKey(
+        School,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    term = models.ForeignKey(
+        AcademicTerm,
+        on_delete=models.CASCADE
+    )
+    fingerprint = models.CharField(max_length=64)
+    seed = models.IntegerField(default=0)
+    mode = models.CharField(max_length=20)
+
+    placements = models.JSONField()                 # [[class_id, subject_id, teacher_id, day, slot_id]]
+    freed_ids = models.JSONField(default=list)      # stored lessons an incremental run replaced
+    periods_requested = models.PositiveIntegerField()
+    stats = models.JSONField(default=dict)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["fingerprint", "seed"])]
+
+    def __str__(self):
+        return f"{self.term} {self.mode} seed {self.seed} ({self.fingerprint[:12]})"
+
+
+class GenerationJob(models.Model):
+    """
+    A queued timetable generation, run off the request path by the
+    `run_jobs` worker and polled by the dashboard for progress.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    STATUS_CHOICES = (
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    school = models.ForeignKey(
+        School,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    term = models.ForeignKey(
+        AcademicTerm,
+        on_delete=models.CASCADE
+    )
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    options = models.JSONField(default=dict)  # keyword arguments for generate_timetable
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    classes_done = models.PositiveIntegerField(default=0)
+    classes_total = models.PositiveIntegerField(default=0)
+    periods_placed = models.PositiveIntegerField(default=0)
+    periods_requested = models.PositiveIntegerField(default=0)
+    rooms_missing = models.PositiveIntegerField(default=0)  # lessons that needed a room and got none
+    message = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def __str__(self):
+        return f"Generation #{self.pk} {self.term} ({self.status})"
+
+    @property
+    def is_active(self):
+        return self.status in (self.QUEUED, self.RUNNING)
+
+    @property
+    def elapsed(self):
+        """Seconds the job has been running (or ran for)."""
+        if not self.started_at:
+            return 0.0
+        end = self.finished_at or timezone.now()
+        return (end - self.started_at).total_seconds()
+
+
+class GenerationLock(models.Model):
+    """
+    One row per (school, term). Generation requests row-lock it before
+    looking for an in-progress GenerationJob, so concurrent requests in
+    any web worker start at most one run and join it otherwise.
+    """
+    key = models.CharField(max_length=50, unique=True)  # "<school id or all>:<term id>"
+    school = models.ForeignKey(
+        School,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    term = models.ForeignKey(
+        AcademicTerm,
+        on_delete=models.CASCADE
+    )
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Generation lock {self.key}"
+
+
+class TimetableScore(models.Model):
+    """
+    Quality score (see `scoring`) of the stored timetable of one school,
+    or of the whole term, so analytics pages read it instead of rescoring
+    every lesson. Written by the generator alongside the lessons it
+    saves, and deleted whenever lessons are edited by hand; the next read
+    scores the timetable again.
+    """
+    key = models.CharField(max_length=50, unique=True)  # "<school id or all>:<term id>"
+    school = models.ForeignKey(
+        School,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    term = models.ForeignKey(
+        AcademicTerm,
+        on_delete=models.CASCADE
+    )
+
+    total = models.IntegerField(default=0)
+    components = models.JSONField(default=dict)     # {"gaps", "spread", "clustering", "imbalance"}
+    teachers = models.JSONField(default=dict)       # {teacher_id: {"periods", "gaps", "imbalance"}}
+    lessons = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.term} score {self.total} ({self.key})"
@@ -0,0 +1,234 @@
+"""
+Bitset occupancy index for the weekly timetable grid.
+
+Every (day, time slot) pair of the week is one bit. A teacher or class is
+represented by a single integer whose set bits are the cells it is busy
+in, so "where are both free" is one AND/NOT instead of a scan over slots.
+
+A teacher's availability is stored the same way (`Teacher.unavailable`),
+with a fixed SLOTS_PER_DAY bits per day so the stored value does not
+depend on how many slots the grid of a given run has;
+`unavailable_cells` turns it into grid cells with one shift per day.
+"""
+
+from timetable_planner_app.models import LessonInstance
+from timetable_planner_app.weekgrid import DAYS, week_grid
+
+SLOTS_PER_DAY = 12  # bits per day in Teacher.unavailable; periods beyond it are always available
+
+
+def iter_bits(mask):
+    """Yields the index of every set bit in `mask`, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def nth_bit(mask, n):
+    """Returns the index of the n-th (0-based) set bit in `mask`."""
+    for _ in range(n):
+        mask &= mask - 1
+    return (mask & -mask).bit_length() - 1
+
+
+def teaching_slot_ids():
+    """Ids of the TimeSlots lessons can go in, in start_time order."""
+    return list(week_grid().teaching_slot_ids)
+
+
+# -----------------------------
+# Teacher availability
+# -----------------------------
+
+def availability_bit(day_index, period):
+    """Bit of `Teacher.unavailable` for a day and a period (index among the teaching slots)."""
+    return day_index * SLOTS_PER_DAY + period
+
+
+def unavailable_cells(mask, n_slots, n_days=len(DAYS)):
+    """
+    Converts a stored `Teacher.unavailable` mask into Occupancy cells of a
+    grid with `n_slots` teaching slots a day.
+    """
+    if not mask:
+        return 0
+    row = (1 << min(n_slots, SLOTS_PER_DAY)) - 1
+    cells = 0
+    for day in range(n_days):
+        cells |= ((mask >> (day * SLOTS_PER_DAY)) & row) << (day * n_slots)
+    return cells
+
+
+class Occupancy:
+    """
+    Tracks which week cells each teacher and class is busy in.
+
+    Cells are numbered day-major: cell = day_index * len(slot_ids) + slot_index.
+    """
+
+    def __init__(self, slot_ids, days=DAYS):
+        self.days = list(days)
+        self.slot_ids = list(slot_ids)
+        self.n_slots = len(self.slot_ids)
+        self.n_cells = len(self.days) * self.n_slots
+
+        self.day_index = {day: i for i, day in enumerate(self.days)}
+        self.slot_index = {slot_id: i for i, slot_id in enumerate(self.slot_ids)}
+
+        self.full_mask = (1 << self.n_cells) - 1
+        row = (1 << self.n_slots) - 1
+        self.day_masks = [row << (i * self.n_slots) for i in range(len(self.days))]
+
+        self.teachers = {}
+        self.classes = {}
+
+    # -----------------------------
+    # Cell mapping
+    # -----------------------------
+
+    def cell(self, day, slot_id):
+        """Returns the cell index for (day, slot_id), or None if it is not on the grid."""
+        slot = self.slot_index.get(slot_id)
+        if slot is None or day not in self.day_index:
+            return None
+        return self.day_index[day] * self.n_slots + slot
+
+    def cell_key(self, cell):
+        """Returns the (day, slot_id) pair for a cell index."""
+        day, slot = divmod(cell, self.n_slots)
+        return self.days[day], self.slot_ids[slot]
+
+    def day_of(self, cell):
+        return cell // self.n_slots
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+
+    def teacher_mask(self, teacher_id):
+        return self.teachers.get(teacher_id, 0)
+
+    def class_mask(self, class_id):
+        return self.classes.get(class_id, 0)
+
+    def free_mask(self, teacher_id=None, class_id=None):
+        """Cells where the given teacher and class are both free."""
+        busy = self.teachers.get(teacher_id, 0) | self.classes.get(class_id, 0)
+        return self.full_mask & ~busy
+
+    def is_free(self, cell, teacher_id=None, class_id=None):
+        bit = 1 << cell
+        return not (
+            (self.teachers.get(teacher_id, 0) | self.classes.get(class_id, 0)) & bit
+        )
+
+    def free_cells(self, teacher_id=None, class_id=None):
+        """Lists the (day, slot_id) pairs where the teacher and class are both free."""
+        return [self.cell_key(cell) for cell in iter_bits(self.free_mask(teacher_id, class_id))]
+
+    # -----------------------------
+    # Updates
+    # -----------------------------
+
+    def occupy(self, cell, teacher_id=None, class_id=None):
+        bit = 1 << cell
+        if teacher_id is not None:
+            self.teachers[teacher_id] = self.teachers.get(teacher_id, 0) | bit
+        if class_id is not None:
+            self.classes[class_id] = self.classes.get(class_id, 0) | bit
+
+    def mark_unavailable(self, teacher_cells):
+        """Marks the cells of {teacher_id: cell mask} busy: periods those teachers cannot teach."""
+        for teacher_id, cells in teacher_cells.items():
+            self.teachers[teacher_id] = self.teachers.get(teacher_id, 0) | cells
+
+    def release(self, cell, teacher_id=None, class_id=None):
+        bit = ~(1 << cell)
+        if teacher_id is not None:
+            self.teachers[teacher_id] = self.teachers.get(teacher_id, 0) & bit
+        if class_id is not None:
+            self.classes[class_id] = self.classes.get(class_id, 0) & bit
+
+
+def occupancy_for_term(term, slot_ids=None, exclude_lesson_ids=()):
+    """
+    Builds an Occupancy from the lessons stored for `term`, leaving out
+    `exclude_lesson_ids`.
+
+    By default every TimeSlot (breaks included) is on the grid so manually
+    entered lessons can be checked wherever they were put. The rows of an
+    elective block lesson mark every class of the level busy, since each
+    class has its own.
+    """
+    if slot_ids is None:
+        slot_ids = week_grid().slot_ids
+
+    occupancy = Occupancy(slot_ids)
+
+    lessons = LessonInstance.objects.filter(term=term)
+    if exclude_lesson_ids:
+        lessons = lessons.exclude(id__in=exclude_lesson_ids)
+
+    for class_id, teacher_id, day, slot_id in lessons.values_list(
+        "school_class_id", "teacher_id", "day", "time_slot_id"
+    ):
+        cell = occupancy.cell(day, slot_id)
+        if cell is not None:
+            occupancy.occupy(cell, teacher_id=teacher_id, class_id=class_id)
+
+    return occupancy
+
+
+def block_lessons(lesson):
+    """
+    The stored rows of the elective block `lesson` is part of, in its
+    cell: every class of the level, every subject of the block.
+    """
+    return LessonInstance.objects.filter(
+        term_id=lesson.term_id,
+        day=lesson.day,
+        time_slot_id=lesson.time_slot_id,
+        elective_group=lesson.elective_group,
+        school_class__school_id=lesson.school_class.school_id,
+        school_class__level_id=lesson.school_class.level_id,
+    )
+
+
+def lesson_clash(lesson):
+    """
+    Returns a message if `lesson` would double-book its teacher, class or
+    room, or falls in a period its teacher is marked unavailable, otherwise
+    None.
+
+    Lessons of an elective block share their cell with the other rows of
+    the block (see `electives`), so those rows are not clashes; any other
+    lesson in a class's block cell is.
+    """
+    exclude = [lesson.pk] if lesson.pk else []
+    if lesson.elective_group:
+        exclude += block_lessons(lesson).values_list("id", flat=True)
+    occupancy = occupancy_for_term(lesson.term_id, exclude_lesson_ids=exclude)
+    cell = occupancy.cell(lesson.day, lesson.time_slot_id)
+    if cell is None:
+        return None
+
+    if not occupancy.is_free(cell, teacher_id=lesson.teacher_id):
+        return f"{lesson.teacher} already teaches on {lesson.day} at {lesson.time_slot}."
+    if not occupancy.is_free(cell, class_id=lesson.school_class_id):
+        return f"{lesson.school_class} already has a lesson on {lesson.day} at {lesson.time_slot}."
+    if lesson.room_id and LessonInstance.objects.filter(
+        term_id=lesson.term_id,
+        day=lesson.day,
+        time_slot_id=lesson.time_slot_id,
+        room_id=lesson.room_id,
+    ).exclude(pk__in=exclude).exists():
+        return f"{lesson.room} is already in use on {lesson.day} at {lesson.time_slot}."
+
+    slot_ids = teaching_slot_ids()
+    if lesson.teacher.unavailable and lesson.time_slot_id in slot_ids:
+        teaching = Occupancy(slot_ids)
+        cells = unavailable_cells(lesson.teacher.unavailable, teaching.n_slots)
+        if (cells >> teaching.cell(lesson.day, lesson.time_slot_id)) & 1:
+            return f"{lesson.teacher} is unavailable on {lesson.day} at {lesson.time_slot}."
+    return None
@@ -0,0 +1,140 @@
+"""
+On-disk cache of generated timetable PDFs.
+
+Building a PDF with ReportLab takes a web worker for most of a second
+per school, and the same file is downloaded many times between two
+timetable changes. Each PDF is written once to PDF_CACHE_DIR, under the
+school, the term and the timetable version (see `versions`), so a
+changed timetable gets a new file and the old one is never served
+again.
+
+With USE_X_ACCEL_REDIRECT the response is only an X-Accel-Redirect
+header naming the file under PDF_CACHE_URL, an `internal` nginx location
+over the same directory (see nginx.conf), and nginx streams the file
+while the worker moves on; otherwise Django streams it itself.
+
+Files of old versions are not deleted when a timetable changes; the
+cache is kept under PDF_CACHE_MAX_BYTES by dropping the least recently
+used files (hits refresh a file's mtime) after every new file.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+
+from timetable_planner_app.versions import timetable_version
+
+PDF_FILE_MODE = 0o644  # nginx reads the files as another user
+
+
+def pdf_cache_path(school_id, term_id, name, version):
+    """Path of the cached PDF `name` of a school's timetable in a term at `version`."""
+    return Path(settings.PDF_CACHE_DIR, str(school_id), str(term_id), f"{name}-{version}.pdf")
+
+
+def cached_pdf_response(school_id, term, name, filename, build):
+    """
+    Serves the PDF `name` of `school_id`'s timetable in `term`, building
+    it first if the current version is not cached yet.
+
+    Args:
+        school_id (int): the school
+        term (AcademicTerm): the term shown, or None
+        name (str): which PDF of the timetable, e.g. "all" or "class-<id>"
+        filename (str): download name sent to the browser
+        build: callable writing the PDF to the binary file it is given
+
+    Returns:
+        HttpResponse: an X-Accel-Redirect to the file, or the file itself
+    """
+    term_id = term.id if term else None
+    path = pdf_cache_path(school_id, term_id, name, timetable_version(term_id, school_id))
+    try:
+        os.utime(path)  # a hit: mark it recently used
+        pdf = open_pdf(path)
+    except OSError:  # a miss, or evicted by another worker since the utime
+        store_pdf(path, build)
+        evict_pdfs(keep=path)
+        pdf = open_pdf(path)
+
+    if pdf is None:
+        response = HttpResponse(content_type="application/pdf")
+        relative = path.relative_to(settings.PDF_CACHE_DIR).as_posix()
+        response["X-Accel-Redirect"] = settings.PDF_CACHE_URL + quote(relative)
+    else:
+        response = FileResponse(pdf, content_type="application/pdf")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def open_pdf(path):
+    """
+    The cached PDF at `path` opened for Django to stream, or None when
+    nginx serves it. An open file survives being evicted meanwhile.
+    """
+    if settings.USE_X_ACCEL_REDIRECT:
+        return None
+    return open(path, "rb")
+
+
+def store_pdf(path, build):
+    """
+    Writes a PDF to `path` through a temporary file in the same
+    directory, so readers (and nginx) never see a partly written file.
+
+    Temporary files are created readable by their owner only; the PDF is
+    made world-readable before it is renamed into place, since nginx
+    runs as another user.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as out:
+        try:
+            build(out)
+        except BaseException:
+            out.close()
+            os.unlink(out.name)
+            raise
+    os.chmod(out.name, PDF_FILE_MODE)
+    os.replace(out.name, path)
+
+
+def evict_pdfs(max_bytes=None, keep=None):
+    """
+    Deletes the least recently used cached PDFs until the cache holds at
+    most `max_bytes` (PDF_CACHE_MAX_BYTES by default), never `keep`.
+
+    Returns:
+        int: the number of files deleted
+    """
+    if max_bytes is None:
+        max_bytes = settings.PDF_CACHE_MAX_BYTES
+    files = []
+    total = 0
+    for path in Path(settings.PDF_CACHE_DIR).rglob("*.pdf"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:  # evicted by another worker meanwhile
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+    if total <= max_bytes:
+        return 0
+
+    files.sort()
+    deleted = 0
+    for _, size, path in files:
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            path.unlink()
+            deleted += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+    return deleted
@@ -0,0 +1,106 @@
+"""
+Room allocation, run after time placement.
+
+Only lessons of subjects with a `room_type` (labs, halls, workshops...)
+need a room; everything else is taught in the class's own room. Once
+every lesson has its (day, slot), each cell is an independent bipartite
+matching between the lessons held in it and the rooms free in it: a
+room fits a lesson when it is of the subject's type and seats the class.
+Matchings are found with augmenting paths, like the teacher assignment.
+
+A cell's matching depends only on what its lessons ask for (room type
+and class size) and on which rooms are already taken, so every cell with
+the same demand signature shares one matching. A school week has a few
+hundred cells but only a handful of distinct signatures, so allocating
+a whole term solves a handful of small matchings.
+"""
+
+from collections import defaultdict
+
+
+def match_rooms(demands, rooms):
+    """
+    Maximum matching of `demands` to `rooms`.
+
+    Args:
+        demands (list): [(room_type, class size or None)]
+        rooms (list): [(room_id, room_type, capacity)], smallest first
+
+    Returns:
+        list: the room_id given to each demand, None where none was left
+    """
+    fits = [
+        [
+            index for index, (_, room_type, capacity) in enumerate(rooms)
+            if room_type == wanted and (size is None or capacity >= size)
+        ]
+        for wanted, size in demands
+    ]
+    holder = {}  # room index: demand index
+
+    def augment(demand, seen):
+        for index in fits[demand]:
+            if index in seen:
+                continue
+            seen.add(index)
+            if index not in holder or augment(holder[index], seen):
+                holder[index] = demand
+                return True
+        return False
+
+    # Most constrained demands first, each trying the smallest rooms first.
+    for demand in sorted(range(len(demands)), key=lambda d: (len(fits[d]), d)):
+        augment(demand, set())
+
+    matched = [None] * len(demands)
+    for index, demand in holder.items():
+        matched[demand] = rooms[index][0]
+    return matched
+
+
+def allocate_rooms(placements, rooms, subject_rooms, class_sizes, taken=()):
+    """
+    Gives a room to every placement that needs one, cell by cell.
+
+    Args:
+        placements: (class_id, subject_id, teacher_id, day, slot_id) lessons
+        rooms (list): [(room_id, room_type, capacity)] that can be used
+        subject_rooms (dict): {subject_id: room_type} for subjects needing a room
+        class_sizes (dict): {class_id: students} for classes with a size
+        taken: ((day, slot_id), room_id) pairs of rooms already in use
+
+    Returns:
+        tuple: ({(teacher_id, day, slot_id): room_id}, [placements left
+        without a room]); a teacher teaches one lesson a cell, so the
+        room is theirs for the cell, which also covers every class of an
+        elective block
+    """
+    rooms = sorted(rooms, key=lambda room: (room[2], room[0]))
+    by_cell = defaultdict(list)
+    for placement in placements:
+        room_type = subject_rooms.get(placement[1])
+        if room_type:
+            by_cell[placement[3:5]].append(
+                ((room_type, class_sizes.get(placement[0])), placement)
+            )
+    busy = defaultdict(set)
+    for cell, room_id in taken:
+        busy[cell].add(room_id)
+
+    allocated = {}
+    missing = []
+    matchings = {}
+    for cell, lessons in by_cell.items():
+        lessons.sort(key=lambda lesson: (lesson[0][0], lesson[0][1] or 0, lesson[1]))
+        demands = tuple(demand for demand, _ in lessons)
+        signature = (demands, frozenset(busy.get(cell, ())))
+        matched = matchings.get(signature)
+        if matched is None:
+            free = [room for room in rooms if room[0] not in signature[1]]
+            matched = matchings[signature] = match_rooms(demands, free)
+        for (_, placement), room_id in zip(lessons, matched):
+            if room_id is None:
+                missing.append(placement)
+            else:
+                allocated[placement[2:5]] = room_id
+    return allocated, missing
@@ -0,0 +1,212 @@
+"""
+Soft-constraint quality score of a timetable.
+
+A timetable's score is a weighted sum of penalties; lower is better:
+
+- gaps: idle periods between a teacher's first and last lesson of a day;
+- spread: for each class and subject, days short of spreading its
+  periods over min(periods, days) different days;
+- clustering: periods of a subject a class has on one day beyond
+  MAX_PER_DAY;
+- imbalance: for each teacher, periods on their busiest day beyond an
+  even split of their week.
+
+`Scorer` keeps the per-teacher, per-offering and per-day tallies behind
+those terms, so adding or removing one lesson updates the score in
+O(days), and `delta` prices a move without rescoring the timetable. The
+generator uses it to pick between candidate timetables and to guide the
+local search; the workload analytics page shows the stored result.
+"""
+
+from timetable_planner_app.occupancy import DAYS, Occupancy
+
+WEIGHTS = {"gaps": 1, "spread": 2, "clustering": 5, "imbalance": 1}
+
+
+def day_gaps(bits):
+    """Idle periods between the first and last set bit of one day's bits."""
+    if not bits:
+        return 0
+    first = (bits & -bits).bit_length()
+    return bits.bit_length() - first + 1 - bits.bit_count()
+
+
+class Scorer:
+    """
+    Running score of a timetable that lessons are added to and removed from.
+
+    Lessons are given by week cell (see `Occupancy`); lessons off the
+    grid are left out of every term.
+    """
+
+    def __init__(self, slot_ids, max_per_day, days=DAYS, weights=WEIGHTS):
+        self.grid = Occupancy(slot_ids, days)
+        self.n_days = len(self.grid.days)
+        self.n_slots = self.grid.n_slots
+        self.row = (1 << self.n_slots) - 1
+        self.max_per_day = max_per_day
+        self.weights = weights
+        self.w_gaps = weights["gaps"]
+        self.w_spread = weights["spread"]
+        self.w_clustering = weights["clustering"]
+        self.w_imbalance = weights["imbalance"]
+
+        self.teacher_cells = {}  # (teacher_id, cell): lessons, above 1 on a clash
+        self.teacher_mask = {}   # teacher_id: week bitmask
+        self.teacher_days = {}   # teacher_id: [periods on each day..., periods in the week]
+        self.pair_days = {}      # (class_id, subject_id): [periods on each day..., week, days used]
+
+        self.gaps = self.spread = self.clustering = self.imbalance = 0
+
+    # -----------------------------
+    # Updates
+    # -----------------------------
+
+    def _change(self, class_id, subject_id, teacher_id, cell, step):
+        """Adds (step 1) or removes (step -1) one lesson; returns the weighted score change."""
+        # Called for every move the local search prices, so the helpers
+        # (day_gaps, _imbalance) are inlined and attributes read once.
+        n_days, n_slots = self.n_days, self.n_slots
+        day = cell // n_slots
+        shift = day * n_slots
+        row = self.row
+
+        # Teacher gaps on that day.
+        teacher_mask = self.teacher_mask
+        mask = teacher_mask.get(teacher_id, 0)
+        bits = (mask >> shift) & row
+        before = bits.bit_length() - (bits & -bits).bit_length() + 1 - bits.bit_count() if bits else 0
+        key = (teacher_id, cell)
+        count = self.teacher_cells.get(key, 0) + step
+        self.teacher_cells[key] = count
+        if count == (1 if step > 0 else 0):
+            mask ^= 1 << cell
+            teacher_mask[teacher_id] = mask
+            bits = (mask >> shift) & row
+            after = bits.bit_length() - (bits & -bits).bit_length() + 1 - bits.bit_count() if bits else 0
+            gaps = after - before
+        else:
+            gaps = 0
+
+        # Spread and clustering of the class's subject.
+        pair = self.pair_days.get((class_id, subject_id))
+        if pair is None:
+            pair = self.pair_days[(class_id, subject_id)] = [0] * (n_days + 2)
+        periods, used, today = pair[n_days], pair[n_days + 1], pair[day]
+        spread_before = min(periods, n_days) - used
+        max_per_day = self.max_per_day
+        clustering = max(0, today + step - max_per_day) - max(0, today - max_per_day)
+        if step > 0 and not today:
+            used += 1
+        elif step < 0 and today == 1:
+            used -= 1
+        pair[day] = today + step
+        pair[n_days] = periods + step
+        pair[n_days + 1] = used
+        spread = min(periods + step, n_days) - used - spread_before
+
+        # The teacher's busiest day against an even split.
+        loads = self.teacher_days.get(teacher_id)
+        if loads is None:
+            loads = self.teacher_days[teacher_id] = [0] * (n_days + 1)
+        week = loads[n_days]
+        busiest = max(loads[:n_days])
+        imbalance_before = busiest + (-week // n_days) if week else 0
+        loads[day] += step
+        week += step
+        loads[n_days] = week
+        if step > 0:
+            busiest = max(busiest, loads[day])
+        elif loads[day] + 1 == busiest:
+            busiest = max(loads[:n_days])
+        imbalance = busiest + (-week // n_days) - imbalance_before if week else -imbalance_before
+
+        self.gaps += gaps
+        self.spread += spread
+        self.clustering += clustering
+        self.imbalance += imbalance
+        return (
+            self.w_gaps * gaps + self.w_spread * spread
+            + self.w_clustering * clustering + self.w_imbalance * imbalance
+        )
+
+    def _imbalance(self, loads):
+        periods = loads[self.n_days]
+        if not periods:
+            return 0
+        return max(loads[:self.n_days]) - -(-periods // self.n_days)
+
+    def add(self, class_id, subject_id, teacher_id, cell):
+        return self._change(class_id, subject_id, teacher_id, cell, 1)
+
+    def remove(self, class_id, subject_id, teacher_id, cell):
+        return self._change(class_id, subject_id, teacher_id, cell, -1)
+
+    def add_lessons(self, lessons):
+        """Adds (class_id, subject_id, teacher_id, day, slot_id) tuples."""
+        for class_id, subject_id, teacher_id, day, slot_id in lessons:
+            cell = self.grid.cell(day, slot_id)
+            if cell is not None:
+                self.add(class_id, subject_id, teacher_id, cell)
+        return self
+
+    def delta(self, removes=(), adds=()):
+        """
+        Score change of removing and adding the given (class_id, subject_id,
+        teacher_id, cell) lessons, leaving the score as it was.
+        """
+        change = 0
+        for lesson in removes:
+            change += self._change(*lesson, -1)
+        for lesson in adds:
+            change += self._change(*lesson, 1)
+        for lesson in reversed(adds):
+            self._change(*lesson, -1)
+        for lesson in reversed(removes):
+            self._change(*lesson, 1)
+        return change
+
+    # -----------------------------
+    # Results
+    # -----------------------------
+
+    @property
+    def components(self):
+        return {
+            "gaps": self.gaps,
+            "spread": self.spread,
+            "clustering": self.clustering,
+            "imbalance": self.imbalance,
+        }
+
+    @property
+    def total(self):
+        return (
+            self.w_gaps * self.gaps + self.w_spread * self.spread
+            + self.w_clustering * self.clustering + self.w_imbalance * self.imbalance
+        )
+
+    def as_dict(self):
+        return dict(self.components, total=self.total)
+
+    def teacher_scores(self):
+        """{teacher_id: {"periods", "gaps", "imbalance"}} for every teacher with lessons."""
+        scores = {}
+        for teacher_id, loads in self.teacher_days.items():
+            if not loads[self.n_days]:
+                continue
+            mask = self.teacher_mask.get(teacher_id, 0)
+            scores[teacher_id] = {
+                "periods": loads[self.n_days],
+                "gaps": sum(
+                    day_gaps((mask >> (day * self.n_slots)) & self.row)
+                    for day in range(self.n_days)
+                ),
+                "imbalance": self._imbalance(loads),
+            }
+        return scores
+
+
+def score_timetable(slot_ids, lessons, max_per_day):
+    """Scores a list of (class_id, subject_id, teacher_id, day, slot_id) tuples."""
+    return Scorer(slot_ids, max_per_day).add_lessons(lessons)
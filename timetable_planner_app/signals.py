@@ -1,10 +1,50 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile, School
+from .models import UserProfile, School, TimeSlot, Subject, Teacher, SchoolClass, LessonInstance, ClassLevel, Stream, Room
+from .weekgrid import invalidate_week_grid
+from .versions import bump_global_version, bump_school_version
+from .utils import in_bulk_lesson_writes, lessons_changed
 
 # @receiver(post_save, sender=User)
 # def create_profile(sender, instance, created, **kwargs):
 #     if created:
 #         school = School.objects.first()
 #         UserProfile.objects.create(user=instance, school=school)
+
+
+@receiver([post_save, post_delete], sender=TimeSlot)
+def time_slots_changed(sender, **kwargs):
+    invalidate_week_grid()
+
+
+# Levels and streams are shared by every school and name its classes.
+@receiver([post_save, post_delete], sender=Subject)
+@receiver([post_save, post_delete], sender=ClassLevel)
+@receiver([post_save, post_delete], sender=Stream)
+def shared_data_changed(sender, **kwargs):
+    bump_global_version()
+
+
+@receiver([post_save, post_delete], sender=Teacher)
+@receiver([post_save, post_delete], sender=SchoolClass)
+@receiver([post_save, post_delete], sender=Room)
+def school_changed(sender, instance, **kwargs):
+    bump_school_version(instance.school_id)
+
+
+# Covers edits in the admin, the shell, queryset deletes and cascades
+# from classes, teachers and subjects: the lesson's scores are dropped
+# and its timetable version bumped. Generation and cloning write in
+# bulk and call lessons_changed once for their scope, so their rows are
+# skipped here.
+@receiver([post_save, post_delete], sender=LessonInstance)
+def lesson_changed(sender, instance, **kwargs):
+    if in_bulk_lesson_writes():
+        return
+    school_id = (
+        SchoolClass.objects.filter(pk=instance.school_class_id)
+        .values_list("school_id", flat=True).first()
+    )
+    # None (the class is gone already) bumps every school of the term.
+    lessons_changed(instance.term_id, school_id)
@@ -0,0 +1,290 @@
+"""
+Dense NumPy view of a term's timetable, for validation and analytics.
+
+The lessons are loaded with one query into flat arrays, which are then
+scattered into (class x day x slot) and (teacher x day x slot) grids.
+Every check is a handful of array operations over the whole term, so a
+100k-lesson term is validated in a fraction of a second instead of row
+by row through the ORM.
+"""
+
+from itertools import chain
+
+import numpy as np
+
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+
+from timetable_planner_app.models import ELECTIVE_GROUPS, LessonInstance, SchoolClass
+from timetable_planner_app.occupancy import DAYS, SLOTS_PER_DAY
+from timetable_planner_app.weekgrid import week_grid
+
+EMPTY = 0  # grid value of a free cell; database ids start at 1
+
+
+class OccupancyTensor:
+    """
+    A timetable as arrays.
+
+    Rows are indexed densely: `class_ids[i]` is the class of row i of the
+    class grids, `teacher_ids[j]` the teacher of row j of `teacher_class`.
+    Every TimeSlot is a slot column (breaks included, so lessons entered
+    by hand are checked wherever they were put); `teaching` marks the
+    columns that count for gaps.
+
+    Grids:
+        class_subject (classes x days x slots): subject id, EMPTY if free
+        class_teacher (classes x days x slots): teacher id, EMPTY if free
+        teacher_class (teachers x days x slots): class id, EMPTY if free
+        class_count, teacher_count: lessons per cell, above 1 on a clash
+
+    A clashing cell keeps one of its lessons in the id grids; the counts
+    are exact. The rows of an elective block lesson (see `electives`)
+    are one lesson in the counts: a class has a row per subject of the
+    block in its cell, and a teacher a row per class of the level.
+    """
+
+    def __init__(self, columns, slot_ids, teaching_slot_ids=None, days=DAYS, blocks=None):
+        """
+        Args:
+            columns: int array shaped (lessons x 5), one row per lesson:
+                class_id, subject_id, teacher_id, day index, slot_id
+            slot_ids (list): Slot columns, in start_time order
+            teaching_slot_ids: Slots that count for gaps (default: all)
+            days (list): Day names, in order
+            blocks: Optional int array, one value per lesson: 0 for an
+                ordinary lesson, otherwise a key shared by the lessons
+                of one elective block of one class level
+
+        Lessons on a day or slot outside the grid (day index -1 for an
+        unknown day) are counted in `off_grid` and otherwise left out.
+        Use `from_lessons` to build one from (class, subject, teacher,
+        day name, slot) tuples.
+        """
+        self.days = list(days)
+        self.slot_ids = np.asarray(slot_ids, dtype=np.int64)
+        teaching = set(slot_ids if teaching_slot_ids is None else teaching_slot_ids)
+        self.teaching = np.array([slot_id in teaching for slot_id in slot_ids], dtype=bool)
+
+        n_days, n_slots = len(self.days), len(self.slot_ids)
+        slot_index = np.full(int(self.slot_ids.max(initial=0)) + 1, -1, dtype=np.int64)
+        slot_index[self.slot_ids] = np.arange(n_slots)
+
+        columns = np.asarray(columns, dtype=np.int64).reshape(-1, 5)
+        class_col, subject_col, teacher_col, day, slot_col = columns.T
+        if blocks is None:
+            blocks = np.zeros(len(columns), dtype=np.int64)
+
+        in_range = (slot_col >= 0) & (slot_col < len(slot_index))
+        slot = np.full(len(slot_col), -1, dtype=np.int64)
+        slot[in_range] = slot_index[slot_col[in_range]]
+        on_grid = (day >= 0) & (day < n_days) & (slot >= 0)
+        self.off_grid = int(np.count_nonzero(~on_grid))
+
+        self.class_ids, class_row = np.unique(class_col[on_grid], return_inverse=True)
+        self.teacher_ids, teacher_row = np.unique(teacher_col[on_grid], return_inverse=True)
+        self.subject_ids, subject_row = np.unique(subject_col[on_grid], return_inverse=True)
+        self.day = day[on_grid]
+        self.slot = slot[on_grid]
+        self.class_row = class_row.reshape(-1)
+        self.teacher_row = teacher_row.reshape(-1)
+        self.subject_row = subject_row.reshape(-1)
+        self.subject = subject_col[on_grid]
+        self.block = np.asarray(blocks, dtype=np.int64)[on_grid]
+
+        shape = (n_days, n_slots)
+        self.class_cell = np.ravel_multi_index(
+            (self.class_row, self.day, self.slot), (len(self.class_ids),) + shape
+        )
+        self.teacher_cell = np.ravel_multi_index(
+            (self.teacher_row, self.day, self.slot), (len(self.teacher_ids),) + shape
+        )
+
+        self.class_count = self._counts(self._once(self.class_cell), len(self.class_ids), shape)
+        self.teacher_count = self._counts(
+            self._once(self.teacher_cell), len(self.teacher_ids), shape
+        )
+        self.class_subject = self._grid(self.class_cell, self.subject, len(self.class_ids), shape)
+        self.class_teacher = self._grid(
+            self.class_cell, self.teacher_ids[self.teacher_row], len(self.class_ids), shape
+        )
+        self.teacher_class = self._grid(
+            self.teacher_cell, self.class_ids[self.class_row], len(self.teacher_ids), shape
+        )
+
+    @classmethod
+    def from_lessons(cls, lessons, slot_ids, teaching_slot_ids=None, days=DAYS):
+        """Builds a tensor from (class_id, subject_id, teacher_id, day, slot_id) tuples."""
+        day_index = {day: i for i, day in enumerate(days)}
+        rows = [
+            (class_id, subject_id, teacher_id, day_index.get(day, -1), slot_id)
+            for class_id, subject_id, teacher_id, day, slot_id in lessons
+        ]
+        return cls(rows, slot_ids, teaching_slot_ids, days)
+
+    def _once(self, cells):
+        """`cells` of every lesson, with the rows of one block lesson in a cell kept once."""
+        in_block = np.flatnonzero(self.block)
+        if not len(in_block):
+            return cells
+        _, first = np.unique(
+            np.stack([cells[in_block], self.block[in_block]]), axis=1, return_index=True
+        )
+        keep = np.ones(len(cells), dtype=bool)
+        keep[in_block] = False
+        keep[in_block[first]] = True
+        return cells[keep]
+
+    @staticmethod
+    def _counts(cells, rows, shape):
+        size = rows * shape[0] * shape[1]
+        return np.bincount(cells, minlength=size).reshape((rows,) + shape)
+
+    @staticmethod
+    def _grid(cells, values, rows, shape):
+        grid = np.full(rows * shape[0] * shape[1], EMPTY, dtype=np.int64)
+        grid[cells] = values
+        return grid.reshape((rows,) + shape)
+
+    @property
+    def lessons(self):
+        return len(self.class_cell)
+
+    # -----------------------------
+    # Checks
+    # -----------------------------
+
+    def _cells(self, counts, ids):
+        rows, days, slots = np.nonzero(counts > 1)
+        return [
+            (int(ids[r]), self.days[d], int(self.slot_ids[s]), int(counts[r, d, s]))
+            for r, d, s in zip(rows, days, slots)
+        ]
+
+    def class_clashes(self):
+        """[(class_id, day, slot_id, lessons)] for every double-booked class cell."""
+        return self._cells(self.class_count, self.class_ids)
+
+    def teacher_clashes(self):
+        """[(teacher_id, day, slot_id, lessons)] for every cell a teacher is booked twice in."""
+        return self._cells(self.teacher_count, self.teacher_ids)
+
+    def subject_day_counts(self):
+        """Periods of each subject per class and day, shaped (classes x subjects x days)."""
+        n_days = len(self.days)
+        shape = (len(self.class_ids), len(self.subject_ids), n_days)
+        index = np.ravel_multi_index((self.class_row, self.subject_row, self.day), shape)
+        return np.bincount(index, minlength=int(np.prod(shape))).reshape(shape)
+
+    def subject_day_overflows(self, max_per_day):
+        """[(class_id, subject_id, day, periods)] where a class has a subject more than `max_per_day` times a day."""
+        counts = self.subject_day_counts()
+        rows, subjects, days = np.nonzero(counts > max_per_day)
+        return [
+            (int(self.class_ids[r]), int(self.subject_ids[s]), self.days[d], int(counts[r, s, d]))
+            for r, s, d in zip(rows, subjects, days)
+        ]
+
+    def unavailable_lessons(self, unavailable):
+        """
+        [(teacher_id, day, slot_id)] for every lesson in a period its
+        teacher is marked unavailable; `unavailable` is {teacher_id:
+        Teacher.unavailable}, whose periods count teaching slots only.
+        """
+        if not unavailable:
+            return []
+        period = np.where(self.teaching, np.cumsum(self.teaching) - 1, -1)[self.slot]
+        masks = np.array(
+            [unavailable.get(int(teacher_id), 0) for teacher_id in self.teacher_ids], dtype=np.int64
+        )[self.teacher_row]
+        marked = (period >= 0) & (period < SLOTS_PER_DAY)
+        bit = self.day * SLOTS_PER_DAY + np.where(marked, period, 0)
+        hits = np.nonzero(marked & ((masks >> bit) & 1).astype(bool))[0]
+        hits = np.sort(hits[np.unique(self.teacher_cell[hits], return_index=True)[1]])
+        return [
+            (int(self.teacher_ids[self.teacher_row[i]]), self.days[self.day[i]], int(self.slot_ids[self.slot[i]]))
+            for i in hits
+        ]
+
+    def load_per_day(self, teachers=True):
+        """Lessons per row and day, shaped (teachers or classes x days)."""
+        counts = self.teacher_count if teachers else self.class_count
+        return counts.sum(axis=2)
+
+    def gaps_per_day(self, teachers=True):
+        """
+        Idle teaching slots between a row's first and last lesson of each
+        day, shaped (teachers or classes x days). Break columns are left
+        out, so a break between two lessons is not a gap.
+        """
+        counts = self.teacher_count if teachers else self.class_count
+        busy = counts[:, :, self.teaching] > 0
+        if not busy.shape[2]:
+            return np.zeros(busy.shape[:2], dtype=np.int64)
+
+        n_slots = busy.shape[2]
+        first = busy.argmax(axis=2)
+        last = n_slots - 1 - busy[:, :, ::-1].argmax(axis=2)
+        span = last - first + 1
+        return np.where(busy.any(axis=2), span - busy.sum(axis=2), 0)
+
+    def summary(self, max_per_day, unavailable=None):
+        """Counts of every check, JSON-ready."""
+        teacher_load = self.load_per_day()
+        return {
+            "lessons": self.lessons,
+            "off_grid": self.off_grid,
+            "class_clashes": len(self.class_clashes()),
+            "teacher_clashes": len(self.teacher_clashes()),
+            "subject_day_overflows": len(self.subject_day_overflows(max_per_day)),
+            "unavailable_lessons": len(self.unavailable_lessons(unavailable)),
+            "teacher_gaps": int(self.gaps_per_day().sum()),
+            "class_gaps": int(self.gaps_per_day(teachers=False).sum()),
+            "max_teacher_load_per_day": int(teacher_load.max(initial=0)),
+        }
+
+
+def load_tensor(term, school=None):
+    """
+    Loads the lessons of `term` (only `school`'s, if given) into an
+    OccupancyTensor with one query over the lesson table.
+
+    The day is turned into its index, and the elective group of a block
+    lesson into a block key (see `OccupancyTensor`), by the database, and
+    the rows are read with a plain cursor straight into one integer
+    array: building model instances, or even converting values_list
+    tuples column by column, is what made a whole-term check slow.
+    """
+    grid = week_grid()
+    slot_ids = grid.slot_ids
+    teaching = grid.teaching_slot_ids
+
+    lessons = LessonInstance.objects.filter(term=term)
+    if school is not None:
+        lessons = lessons.filter(
+            school_class_id__in=SchoolClass.objects.filter(school=school).values("id")
+        )
+    day_index = Case(
+        *(When(day=day, then=Value(i)) for i, day in enumerate(DAYS)),
+        default=Value(-1),
+        output_field=IntegerField(),
+    )
+    block = Case(
+        *(
+            When(elective_group=group, then=F("school_class__level_id") * len(ELECTIVE_GROUPS) + i + 1)
+            for i, (group, _) in enumerate(ELECTIVE_GROUPS)
+        ),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    sql, params = lessons.annotate(day_index=day_index, block=block).values_list(
+        "school_class_id", "subject_id", "teacher_id", "day_index", "time_slot_id", "block"
+    ).query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    columns = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * 6)
+    columns = columns.reshape(-1, 6)
+    return OccupancyTensor(columns[:, :5], slot_ids, teaching, blocks=columns[:, 5])
@@ -0,0 +1,75 @@
+"""
+Shared fixtures for the tests: a small school built in the database.
+"""
+
+from datetime import date
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from timetable_planner_app.models import (
+    AcademicTerm, ClassLevel, School, SchoolClass, Stream, Subject, SubjectOffering, Teacher
+)
+from timetable_planner_app.weekgrid import invalidate_week_grid
+
+TEST_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# (name, periods a week, teachers, elective group)
+SUBJECTS = [
+    ("Mathematics", 5, ["Alice"], None),
+    ("English", 4, ["Bob"], None),
+    ("Physics", 3, ["Carol"], None),
+    ("History", 3, ["Dan"], None),
+]
+
+
+def make_term(year=2026, term=1):
+    return AcademicTerm.objects.create(
+        year=year, term=term, start_date=date(year, 1, 1), end_date=date(year, 4, 1)
+    )
+
+
+def make_school(subjects=SUBJECTS, levels=("S1",), streams=("A", "B"), code="T1"):
+    """
+    Builds a school with one class per level and stream, the default time
+    slots and `subjects` offered to every level.
+
+    Returns:
+        School: with `classes`, `teachers` ({name: Teacher}) and
+        `subjects` ({name: Subject}) attached
+    """
+    school = School.objects.create(name=f"School {code}", code=code, location="Kampala")
+    call_command("create_timeslots", stdout=StringIO())
+
+    level_objects = [ClassLevel.objects.get_or_create(name=name)[0] for name in levels]
+    stream_objects = [Stream.objects.get_or_create(name=name)[0] for name in streams]
+    school.classes = [
+        SchoolClass.objects.create(school=school, level=level, stream=stream)
+        for level in level_objects
+        for stream in stream_objects
+    ]
+
+    school.teachers = {}
+    school.subjects = {}
+    for name, periods, teacher_names, group in subjects:
+        subject = Subject.objects.create(name=name, elective_group=group)
+        subject.levels.set(school.classes)
+        for teacher_name in teacher_names:
+            if teacher_name not in school.teachers:
+                school.teachers[teacher_name] = Teacher.objects.create(school=school, name=teacher_name)
+            subject.teachers.add(school.teachers[teacher_name])
+        for level in level_objects:
+            SubjectOffering.objects.create(subject=subject, class_level=level, periods_per_week=periods)
+        school.subjects[name] = subject
+    return school
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TimetableTestCase(TestCase):
+    """TestCase with a private, empty cache and a freshly compiled week grid."""
+
+    def setUp(self):
+        cache.clear()
+        invalidate_week_grid()
@@ -0,0 +1,62 @@
+from collections import Counter
+
+from django.test import SimpleTestCase
+
+from timetable_planner_app.assignment import TeacherAssignment, assign_teachers
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import load_snapshot
+
+
+def loads(demand, assignment):
+    load = Counter()
+    for pair, teacher_id in assignment.items():
+        load[teacher_id] += demand[pair]
+    return load
+
+
+class TeacherAssignmentTests(SimpleTestCase):
+    def test_augmenting_path_moves_an_assigned_offering(self):
+        # "a" and "z" fill A and B first; "b" only fits once "z" moves on
+        # to C, a chain the greedy pass alone does not find.
+        demand = {"a": 4, "z": 4, "b": 3}
+        candidates = {"a": ["A", "B"], "z": ["B", "C"], "b": ["A", "B"]}
+
+        assignment = TeacherAssignment(demand, candidates, {}).assign(4)
+
+        self.assertEqual(assignment, {"a": "A", "b": "B", "z": "C"})
+
+    def test_no_teacher_goes_over_the_cap(self):
+        demand = {pair: 2 for pair in "abcdef"}
+        candidates = {pair: ["A", "B", "C"] for pair in demand}
+
+        assignment = TeacherAssignment(demand, candidates, {}).assign(4)
+
+        self.assertEqual(max(loads(demand, assignment).values()), 4)
+
+    def test_too_small_a_cap_fails(self):
+        demand = {"a": 3, "b": 3}
+        candidates = {"a": ["A"], "b": ["A"]}
+
+        self.assertIsNone(TeacherAssignment(demand, candidates, {}).assign(5))
+
+    def test_fixed_load_and_availability_count_against_the_cap(self):
+        demand = {"a": 3, "b": 3}
+        candidates = {"a": ["A", "B"], "b": ["A", "B"]}
+
+        assignment = TeacherAssignment(demand, candidates, {"A": 2}, {"B": 3}).assign(5)
+
+        self.assertEqual(sorted(assignment.values()), ["A", "B"])
+        self.assertIsNone(TeacherAssignment(demand, candidates, {"A": 3}, {"B": 3}).assign(5))
+
+
+class AssignTeachersTests(TimetableTestCase):
+    def test_shared_subject_is_split_evenly(self):
+        school = make_school(
+            subjects=[("Mathematics", 5, ["Alice", "Ann"], None)], levels=("S1", "S2")
+        )
+        snapshot = load_snapshot(make_term(), school=school)
+
+        assignment = assign_teachers(snapshot)
+
+        self.assertEqual(len(assignment), 4)
+        self.assertEqual(sorted(Counter(assignment.values()).values()), [2, 2])
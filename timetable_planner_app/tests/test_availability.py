@@ -0,0 +1,91 @@
+from django.test import SimpleTestCase
+
+from timetable_planner_app.forms import TeacherForm
+from timetable_planner_app.models import LessonInstance
+from timetable_planner_app.occupancy import (
+    SLOTS_PER_DAY, Occupancy, availability_bit, lesson_clash, unavailable_cells
+)
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import generate_timetable
+from timetable_planner_app.weekgrid import DAYS, week_grid
+
+
+class AvailabilityMaskTests(SimpleTestCase):
+    def test_stored_bits_map_onto_grid_cells(self):
+        mask = (1 << availability_bit(0, 0)) | (1 << availability_bit(2, 3))
+        grid = Occupancy(list(range(8)))
+
+        cells = unavailable_cells(mask, grid.n_slots)
+        self.assertEqual(cells, (1 << grid.cell("Monday", 0)) | (1 << grid.cell("Wednesday", 3)))
+
+    def test_periods_beyond_the_grid_are_dropped(self):
+        mask = 1 << availability_bit(1, 6)
+
+        self.assertEqual(unavailable_cells(mask, 6), 0)
+        self.assertEqual(unavailable_cells(mask, 7), 1 << (1 * 7 + 6))
+
+    def test_days_keep_their_place_on_a_wide_grid(self):
+        # More teaching slots than SLOTS_PER_DAY: the extra periods are
+        # always available and every day still starts at its own row.
+        n_slots = SLOTS_PER_DAY + 2
+        mask = 1 << availability_bit(4, SLOTS_PER_DAY - 1)
+
+        self.assertEqual(unavailable_cells(mask, n_slots), 1 << (4 * n_slots + SLOTS_PER_DAY - 1))
+        self.assertEqual(unavailable_cells(0, n_slots), 0)
+
+
+class AvailabilityTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school()
+        self.term = make_term()
+        self.alice = self.school.teachers["Alice"]
+        self.periods = len(week_grid().teaching_slot_ids)
+
+    def test_generation_avoids_unavailable_periods(self):
+        # Alice is off on Monday and in the first period of every day.
+        mask = 0
+        for period in range(self.periods):
+            mask |= 1 << availability_bit(0, period)
+        for day_index in range(len(DAYS)):
+            mask |= 1 << availability_bit(day_index, 0)
+        self.alice.unavailable = mask
+        self.alice.save()
+
+        result = generate_timetable(term=self.term, school=self.school, clear_existing=True, mode="solver")
+        self.assertEqual(result.periods_placed, result.periods_requested)
+
+        first = week_grid().teaching_slot_ids[0]
+        for day, slot_id in LessonInstance.objects.filter(teacher=self.alice).values_list(
+            "day", "time_slot_id"
+        ):
+            self.assertNotEqual(day, "Monday")
+            self.assertNotEqual(slot_id, first)
+
+    def test_manual_lesson_in_an_unavailable_period_is_refused(self):
+        self.alice.unavailable = 1 << availability_bit(DAYS.index("Tuesday"), 2)
+        self.alice.save()
+        slot = week_grid().teaching_slots[2]
+        lesson = LessonInstance(
+            school_class=self.school.classes[0],
+            subject=self.school.subjects["Mathematics"],
+            teacher=self.alice,
+            term=self.term,
+            day="Tuesday",
+            time_slot=slot,
+        )
+
+        self.assertIn("unavailable", lesson_clash(lesson))
+        lesson.day = "Wednesday"
+        self.assertIsNone(lesson_clash(lesson))
+
+    def test_form_keeps_bits_off_the_grid(self):
+        beyond = 1 << availability_bit(0, SLOTS_PER_DAY - 1)
+        self.alice.unavailable = beyond | (1 << availability_bit(0, 0))
+        self.alice.save()
+
+        form = TeacherForm(
+            {"name": "Alice", "unavailable": [availability_bit(1, 1)]}, instance=self.alice
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().unavailable, beyond | (1 << availability_bit(1, 1)))
@@ -0,0 +1,46 @@
+from timetable_planner_app.models import LessonInstance
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import (
+    generate_timetable, load_snapshot, run_generation, snapshot_fingerprint
+)
+
+
+class SeedDeterminismTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school(levels=("S1", "S2"))
+        self.term = make_term()
+
+    def stored(self):
+        return sorted(LessonInstance.objects.filter(term=self.term).values_list(
+            "school_class_id", "subject_id", "teacher_id", "day", "time_slot_id"
+        ))
+
+    def snapshot(self):
+        return load_snapshot(self.term, school=self.school)
+
+    def test_same_seed_gives_the_same_timetable(self):
+        for seed in (0, 3):
+            first = run_generation(self.snapshot(), mode="solver", seed=seed)
+            second = run_generation(self.snapshot(), mode="solver", seed=seed)
+            self.assertEqual(first.placements, second.placements)
+            self.assertEqual(first.stats["score"], second.stats["score"])
+
+    def test_fingerprint_follows_inputs_and_options(self):
+        fingerprint = snapshot_fingerprint(self.snapshot(), mode="solver")
+
+        self.assertEqual(fingerprint, snapshot_fingerprint(self.snapshot(), mode="solver"))
+        self.assertNotEqual(fingerprint, snapshot_fingerprint(self.snapshot(), mode="greedy"))
+        self.school.subjects["History"].teachers.add(self.school.teachers["Alice"])
+        self.assertNotEqual(fingerprint, snapshot_fingerprint(self.snapshot(), mode="solver"))
+
+    def test_repeated_run_is_served_from_the_cache(self):
+        first = generate_timetable(term=self.term, school=self.school, clear_existing=True, mode="solver", seed=3)
+        stored = self.stored()
+        second = generate_timetable(term=self.term, school=self.school, clear_existing=True, mode="solver", seed=3)
+
+        self.assertFalse(first.stats.get("cached"))
+        self.assertTrue(second.stats["cached"])
+        self.assertEqual(second.placements, first.placements)
+        self.assertEqual(self.stored(), stored)
+        self.assertEqual(second.writes, {"inserted": 0, "updated": 0, "deleted": 0})
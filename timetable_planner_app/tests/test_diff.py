@@ -0,0 +1,126 @@
+from django.test import SimpleTestCase
+
+from timetable_planner_app.models import LessonInstance, Room
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import diff_lessons, save_placements
+from timetable_planner_app.weekgrid import week_grid
+
+MON = "Monday"
+
+
+class DiffLessonsTests(SimpleTestCase):
+    # Stored rows: (id, class, subject, teacher, day, slot, room, group);
+    # lessons: (class, subject, teacher, day, slot, group).
+
+    def test_unchanged_lessons_are_not_written(self):
+        stored = [(1, 10, 100, 7, MON, 1, None, None)]
+        lessons = [(10, 100, 7, MON, 1, None)]
+
+        self.assertEqual(diff_lessons(stored, lessons), ([], [], []))
+
+    def test_changed_lesson_is_updated_in_place(self):
+        stored = [(1, 10, 100, 7, MON, 1, None, None)]
+        lessons = [(10, 101, 8, MON, 1, None)]
+
+        self.assertEqual(diff_lessons(stored, lessons), ([], [(1, 101, 8, None)], []))
+
+    def test_moved_lesson_is_deleted_and_inserted(self):
+        stored = [(1, 10, 100, 7, MON, 1, None, None)]
+        lessons = [(10, 100, 7, MON, 2, None)]
+
+        self.assertEqual(diff_lessons(stored, lessons), ([lessons[0]], [], [1]))
+
+    def test_teacher_swap_becomes_delete_and_insert(self):
+        # Updating either row first would give one teacher two lessons in
+        # the cell and break lesson_teacher_unique_per_cell.
+        stored = [(1, 10, 100, 7, MON, 1, None, None), (2, 11, 100, 8, MON, 1, None, None)]
+        lessons = [(10, 100, 8, MON, 1, None), (11, 100, 7, MON, 1, None)]
+
+        inserts, updates, deletes = diff_lessons(stored, lessons)
+        self.assertEqual(updates, [])
+        self.assertEqual(sorted(deletes), [1, 2])
+        self.assertEqual(sorted(inserts), sorted(lessons))
+
+    def test_room_swap_becomes_delete_and_insert(self):
+        stored = [(1, 10, 100, 7, MON, 1, 50, None), (2, 11, 101, 8, MON, 1, 51, None)]
+        lessons = [(10, 100, 7, MON, 1, None), (11, 101, 8, MON, 1, None)]
+        rooms = {(7, MON, 1): 51, (8, MON, 1): 50}
+
+        inserts, updates, deletes = diff_lessons(stored, lessons, rooms)
+        self.assertEqual(updates, [])
+        self.assertEqual(sorted(deletes), [1, 2])
+        self.assertEqual(sorted(inserts), sorted(lessons))
+
+    def test_room_change_to_a_free_room_is_an_update(self):
+        stored = [(1, 10, 100, 7, MON, 1, 50, None)]
+        lessons = [(10, 100, 7, MON, 1, None)]
+
+        rooms = {(7, MON, 1): 52}
+
+        self.assertEqual(diff_lessons(stored, lessons, rooms), ([], [(1, 100, 7, 52)], []))
+
+    def test_block_lessons_are_keyed_per_subject(self):
+        group = "Languages"
+        stored = [(1, 10, 100, 7, MON, 1, None, group), (2, 10, 101, 8, MON, 1, None, group)]
+        lessons = [(10, 101, 9, MON, 1, group), (10, 100, 7, MON, 1, group)]
+
+        self.assertEqual(diff_lessons(stored, lessons), ([], [(2, 101, 9, None)], []))
+
+
+class SavePlacementsTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school()
+        self.term = make_term()
+        self.slot_id = week_grid().teaching_slot_ids[0]
+        self.a, self.b = self.school.classes
+        self.maths = self.school.subjects["Mathematics"]
+        self.alice, self.bob = self.school.teachers["Alice"], self.school.teachers["Bob"]
+
+    def lesson(self, school_class, teacher):
+        return (school_class.id, self.maths.id, teacher.id, MON, self.slot_id, None)
+
+    def stored(self):
+        return sorted(
+            LessonInstance.objects.filter(term=self.term)
+            .values_list("school_class_id", "teacher_id", "room_id")
+        )
+
+    def test_teacher_swap_is_saved(self):
+        save_placements(self.term, [self.lesson(self.a, self.alice), self.lesson(self.b, self.bob)])
+        writes = save_placements(
+            self.term, [self.lesson(self.a, self.bob), self.lesson(self.b, self.alice)],
+            clear_existing=True,
+        )
+
+        self.assertEqual(writes, {"inserted": 2, "updated": 0, "deleted": 2})
+        self.assertEqual(self.stored(), sorted([
+            (self.a.id, self.bob.id, None), (self.b.id, self.alice.id, None),
+        ]))
+
+    def test_room_swap_is_saved(self):
+        lab1, lab2 = (
+            Room.objects.create(school=self.school, name=name, room_type="Laboratory", capacity=40)
+            for name in ("Lab 1", "Lab 2")
+        )
+        lessons = [self.lesson(self.a, self.alice), self.lesson(self.b, self.bob)]
+        save_placements(self.term, lessons, rooms={
+            (self.alice.id, MON, self.slot_id): lab1.id, (self.bob.id, MON, self.slot_id): lab2.id,
+        })
+        writes = save_placements(self.term, lessons, clear_existing=True, rooms={
+            (self.alice.id, MON, self.slot_id): lab2.id, (self.bob.id, MON, self.slot_id): lab1.id,
+        })
+
+        self.assertEqual(writes, {"inserted": 2, "updated": 0, "deleted": 2})
+        self.assertEqual(self.stored(), sorted([
+            (self.a.id, self.alice.id, lab2.id), (self.b.id, self.bob.id, lab1.id),
+        ]))
+
+    def test_unchanged_timetable_writes_nothing(self):
+        lessons = [self.lesson(self.a, self.alice), self.lesson(self.b, self.bob)]
+        save_placements(self.term, lessons)
+        ids = set(LessonInstance.objects.values_list("id", flat=True))
+
+        writes = save_placements(self.term, lessons, clear_existing=True, school=self.school)
+        self.assertEqual(writes, {"inserted": 0, "updated": 0, "deleted": 0})
+        self.assertEqual(set(LessonInstance.objects.values_list("id", flat=True)), ids)
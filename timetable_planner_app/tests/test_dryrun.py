@@ -0,0 +1,76 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+
+from timetable_planner_app.feasibility import InfeasibleTimetable
+from timetable_planner_app.models import LessonInstance, TimetableScore
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import dry_run_generation, generate_timetable
+from timetable_planner_app.versions import timetable_version
+
+
+class DryRunTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school()
+        self.term = make_term()
+        generate_timetable(term=self.term, school=self.school, clear_existing=True, mode="solver")
+        self.stored = sorted(LessonInstance.objects.values_list("id", "day", "time_slot_id"))
+        self.history = self.school.subjects["History"]
+
+    def assertNothingWritten(self, version):
+        self.assertEqual(sorted(LessonInstance.objects.values_list("id", "day", "time_slot_id")),
+                         self.stored)
+        self.assertEqual(TimetableScore.objects.count(), 1)
+        self.assertEqual(timetable_version(self.term, self.school), version)
+
+    def test_unchanged_inputs_propose_the_stored_timetable(self):
+        version = timetable_version(self.term, self.school)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            outcome = dry_run_generation(
+                term=self.term, school=self.school, mode="solver", incremental=True
+            )
+
+        self.assertEqual(callbacks, [])
+        self.assertNothingWritten(version)
+        diff = outcome["diff"]
+        self.assertEqual((diff["added"], diff["changed"], diff["removed"]), ([], [], []))
+        self.assertEqual(diff["unchanged"], len(self.stored))
+        self.assertEqual(outcome["periods_placed"], outcome["periods_requested"])
+
+    def test_period_override_is_tried_in_memory(self):
+        version = timetable_version(self.term, self.school)
+
+        outcome = dry_run_generation(
+            term=self.term, school=self.school, mode="solver", incremental=True,
+            periods={(None, self.history.id): 5},
+        )
+
+        self.assertNothingWritten(version)
+        self.assertEqual(outcome["periods_requested"], len(self.stored) + 2 * 2)
+        self.assertEqual(
+            sum(1 for lesson in outcome["lessons"] if lesson["subject"] == "History"), 2 * 5
+        )
+        self.assertEqual(len(outcome["diff"]["added"]), 2 * 2)
+
+    def test_infeasible_override_raises_when_checked(self):
+        with self.assertRaises(InfeasibleTimetable):
+            dry_run_generation(
+                term=self.term, school=self.school, periods={(None, self.history.id): 60},
+                preflight=True,
+            )
+
+    def test_command_prints_json(self):
+        out = StringIO()
+
+        call_command(
+            "generate_timetable", "--dry-run", "--incremental", "--periods", "History=4",
+            "--format", "json", stdout=out,
+        )
+
+        outcome = json.loads(out.getvalue())
+        self.assertEqual(outcome["periods_requested"], len(self.stored) + 2)
+        self.assertEqual(sorted(LessonInstance.objects.values_list("id", "day", "time_slot_id")),
+                         self.stored)
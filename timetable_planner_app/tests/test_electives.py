@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+from timetable_planner_app.models import LessonInstance
+from timetable_planner_app.occupancy import lesson_clash
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import generate_timetable
+
+SUBJECTS = [
+    ("Mathematics", 4, ["Alice"], None),
+    ("English", 3, ["Bob"], None),
+    ("French", 3, ["Fay"], "Languages"),
+    ("German", 2, ["Gus"], "Languages"),
+]
+
+
+class ElectiveBlockTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school(subjects=SUBJECTS, streams=("A", "B", "C"))
+        self.term = make_term()
+        self.result = generate_timetable(term=self.term, school=self.school, clear_existing=True, mode="solver")
+        self.french = self.school.subjects["French"]
+        self.german = self.school.subjects["German"]
+
+    def block_rows(self):
+        """{class_id: {(subject_id, teacher_id, day, slot_id)}} of the block lessons."""
+        rows = defaultdict(set)
+        for class_id, *row in LessonInstance.objects.filter(
+            term=self.term, elective_group="Languages"
+        ).values_list("school_class_id", "subject_id", "teacher_id", "day", "time_slot_id"):
+            rows[class_id].add(tuple(row))
+        return rows
+
+    def test_whole_block_is_placed(self):
+        # Each block subject is requested once for the level, not per class.
+        self.assertEqual(self.result.periods_requested, 3 * (4 + 3) + 3 + 2)
+        self.assertEqual(self.result.periods_placed, self.result.periods_requested)
+
+    def test_block_is_stored_for_every_class_of_the_level(self):
+        rows = self.block_rows()
+        first = rows[self.school.classes[0].id]
+
+        self.assertEqual(set(rows), {school_class.id for school_class in self.school.classes})
+        self.assertTrue(all(class_rows == first for class_rows in rows.values()))
+        self.assertEqual(sum(1 for subject_id, *_ in first if subject_id == self.french.id), 3)
+        self.assertEqual(sum(1 for subject_id, *_ in first if subject_id == self.german.id), 2)
+
+    def test_block_cells_hold_nothing_else(self):
+        rows = self.block_rows()[self.school.classes[0].id]
+        block_cells = {(day, slot_id) for *_, day, slot_id in rows}
+        # The longest subject sets how many cells the block takes.
+        self.assertEqual(len(block_cells), 3)
+
+        others = LessonInstance.objects.filter(term=self.term, elective_group__isnull=True)
+        for day, slot_id in others.values_list("day", "time_slot_id"):
+            self.assertNotIn((day, slot_id), block_cells)
+
+    def test_manual_lesson_in_a_block_cell_is_a_clash(self):
+        block = LessonInstance.objects.filter(term=self.term, subject=self.french).first()
+        lesson = LessonInstance(
+            school_class=self.school.classes[1],
+            subject=self.school.subjects["English"],
+            teacher=self.school.teachers["Bob"],
+            term=self.term,
+            day=block.day,
+            time_slot=block.time_slot,
+        )
+
+        self.assertIn("already has a lesson", lesson_clash(lesson))
+        self.assertIsNone(lesson_clash(block))
+
+
+class ElectiveBlockLocalSearchTests(TimetableTestCase):
+    def test_block_lessons_survive_the_improvement_pass(self):
+        school = make_school(subjects=SUBJECTS, streams=("A", "B", "C"))
+        term = make_term()
+        result = generate_timetable(term=term, school=school, clear_existing=True, mode="solver", budget=0.2)
+
+        self.assertEqual(result.periods_placed, result.periods_requested)
+        blocks = LessonInstance.objects.filter(term=term, elective_group="Languages")
+        # French and German, three and two cells, for each of three classes.
+        self.assertEqual(blocks.count(), (3 + 2) * 3)
@@ -0,0 +1,87 @@
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+
+from timetable_planner_app.models import UserProfile
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import generate_timetable
+
+
+class ConditionalResponseTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school()
+        self.term = make_term()
+        generate_timetable(term=self.term, school=self.school, clear_existing=True)
+        self.user = User.objects.create_user("teacher")
+        UserProfile.objects.create(user=self.user, school=self.school)
+        self.client.force_login(self.user)
+        pdf_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(pdf_dir.cleanup)
+        pdf_settings = override_settings(PDF_CACHE_DIR=pdf_dir.name)
+        pdf_settings.enable()
+        self.addCleanup(pdf_settings.disable)
+        self.urls = [
+            "/grid/",
+            f"/timetable/class/{self.school.classes[0].id}/",
+            f"/timetable/download/{self.school.classes[0].id}/",
+            "/timetable/download/",
+        ]
+
+    def etag(self, url):
+        # The first page a client gets sets its CSRF cookie, which is part
+        # of the tag, so the tag to revalidate with is the second one.
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def test_unchanged_timetable_is_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=self.etag(url))
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["Cache-Control"], "private")
+
+    def test_full_responses_are_private(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url)["Cache-Control"], "private")
+
+    def test_changed_timetable_is_sent_again(self):
+        etags = {url: self.etag(url) for url in self.urls}
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_timetable(term=self.term, school=self.school, clear_existing=True, seed=4)
+
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+
+    def test_new_login_gets_a_fresh_page(self):
+        # The page embeds a CSRF token, which a new login invalidates.
+        etag = self.etag("/grid/")
+        self.client.logout()
+        self.client.force_login(self.user)
+
+        response = self.client.get("/grid/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_other_user_does_not_share_the_tag(self):
+        etag = self.etag("/grid/")
+        other = User.objects.create_user("other")
+        UserProfile.objects.create(user=other, school=self.school)
+        self.client.force_login(other)
+
+        self.assertEqual(self.client.get("/grid/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_class_is_not_found_without_a_tag(self):
+        other = make_school(levels=("S2",), subjects=[("Art", 2, ["Zoe"], None)], code="T2")
+        for class_id in (other.classes[0].id, 999):
+            for url in (f"/timetable/class/{class_id}/", f"/timetable/download/{class_id}/"):
+                with self.subTest(url=url):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH="*")
+                    self.assertEqual(response.status_code, 404)
+                    self.assertFalse(response.has_header("ETag"))
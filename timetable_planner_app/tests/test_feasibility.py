@@ -0,0 +1,113 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from timetable_planner_app.feasibility import InfeasibleTimetable, hall_sets
+from timetable_planner_app.models import LessonInstance
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import check_feasibility, generate_timetable
+
+
+class HallSetsTests(SimpleTestCase):
+    def checked(self, teacher_sets):
+        return {teachers: sorted(subjects) for teachers, subjects in hall_sets(teacher_sets)}
+
+    def test_each_set_collects_the_subjects_of_its_subsets(self):
+        checked = self.checked({
+            frozenset({1}): ["a"],
+            frozenset({1, 2}): ["b"],
+            frozenset({3}): ["c"],
+        })
+
+        self.assertEqual(checked[frozenset({1})], ["a"])
+        self.assertEqual(checked[frozenset({1, 2})], ["a", "b"])
+        self.assertEqual(checked[frozenset({3})], ["c"])
+
+    def test_sets_linked_by_a_teacher_are_checked_together(self):
+        checked = self.checked({
+            frozenset({1, 2}): ["a"],
+            frozenset({2, 3}): ["b"],
+        })
+
+        self.assertEqual(checked[frozenset({1, 2, 3})], ["a", "b"])
+
+    def test_a_union_that_is_already_a_set_is_checked_once(self):
+        sets = {frozenset({1}): ["a"], frozenset({1, 2}): ["b"]}
+
+        self.assertEqual(len(list(hall_sets(sets))), 2)
+
+
+class FeasibilityTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.term = make_term()
+
+    def test_default_school_is_feasible(self):
+        school = make_school()
+
+        report = check_feasibility(self.term, school=school)
+
+        self.assertTrue(report.feasible)
+        self.assertEqual(report.errors, [])
+        self.assertEqual(report.stats["periods"], 2 * 15)
+
+    def test_one_teacher_over_their_week_is_an_error(self):
+        # Two classes of 3 x 10 periods only Alice teaches: 60 periods
+        # against her 55 teaching slots.
+        school = make_school(subjects=[
+            ("Mathematics", 10, ["Alice"], None),
+            ("Physics", 10, ["Alice"], None),
+            ("Chemistry", 10, ["Alice"], None),
+        ])
+
+        report = check_feasibility(self.term, school=school)
+
+        self.assertFalse(report.feasible)
+        self.assertTrue(any("only Alice teaches" in error for error in report.errors))
+        with self.assertRaises(InfeasibleTimetable):
+            generate_timetable(term=self.term, school=school, clear_existing=True, preflight=True)
+
+    def test_generate_timetable_only_checks_when_asked(self):
+        school = make_school(subjects=[
+            ("Mathematics", 10, ["Alice"], None),
+            ("Physics", 10, ["Alice"], None),
+            ("Chemistry", 10, ["Alice"], None),
+        ])
+
+        result = generate_timetable(term=self.term, school=school, clear_existing=True)
+
+        self.assertLess(result.periods_placed, result.periods_requested)
+
+    def test_untaught_subject_is_a_warning_and_stays_unplaced(self):
+        school = make_school(subjects=[
+            ("Mathematics", 5, ["Alice"], None),
+            ("Music", 2, [], None),
+        ])
+
+        report = check_feasibility(self.term, school=school)
+        self.assertTrue(report.feasible)
+        self.assertTrue(any("No teacher for Music" in warning for warning in report.warnings))
+
+        result = generate_timetable(term=self.term, school=school, clear_existing=True)
+
+        self.assertEqual(result.periods_placed, 2 * 5)
+        self.assertFalse(LessonInstance.objects.filter(subject=school.subjects["Music"]).exists())
+
+
+class CheckCommandTests(TimetableTestCase):
+    def test_check_runs_per_school_with_all_schools(self):
+        make_term()
+        make_school(code="T1")
+        make_school(levels=("S2",), code="T2", subjects=[
+            ("Art", 10, ["Zoe"], None),
+            ("Drama", 10, ["Zoe"], None),
+            ("Dance", 10, ["Zoe"], None),
+        ])
+        out = StringIO()
+
+        with self.assertRaisesMessage(CommandError, "failed for School T2"):
+            call_command("generate_timetable", "--check", "--all-schools", stdout=out)
+
+        self.assertIn("School T1: Pre-flight check passed", out.getvalue())
+        self.assertIn("School T2: Error: ", out.getvalue())
@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from timetable_planner_app.grids import class_timetables
+from timetable_planner_app.models import UserProfile
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import generate_timetable
+from timetable_planner_app.weekgrid import week_grid
+
+
+class ClassTimetablesTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.term = make_term()
+        self.small = make_school(code="T1")
+        self.large = make_school(levels=("S2", "S3", "S4"), code="T2", subjects=[
+            ("Art", 3, ["Zoe"], None),
+            ("Music", 2, ["Yan"], None),
+        ])
+        generate_timetable(term=self.term, clear_existing=True, mode="solver")
+        week_grid()  # compiled once per process, not per page
+
+    def test_whole_school_loads_in_two_queries(self):
+        for school in (self.small, self.large):
+            with self.subTest(school=school.code):
+                with self.assertNumQueries(2):
+                    timetables = class_timetables(school, self.term)
+                    cells = [
+                        (str(timetable), lesson.subject.name, lesson.teacher.name, str(lesson))
+                        for timetable in timetables
+                        for lesson in timetable.lessons
+                    ]
+                self.assertEqual(len(timetables), len(school.classes))
+                self.assertTrue(cells)
+
+    def test_given_classes_load_in_one_query(self):
+        classes = self.large.classes[:2]
+
+        with self.assertNumQueries(1):
+            timetables = class_timetables(self.large.id, self.term, classes=classes)
+
+        self.assertEqual([timetable.school_class for timetable in timetables], classes)
+
+    def test_grid_page_queries_do_not_grow_with_classes(self):
+        counts = []
+        for school in (self.small, self.large):
+            user = User.objects.create_user(f"teacher-{school.code}")
+            UserProfile.objects.create(user=user, school=school)
+            self.client.force_login(user)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get("/grid/")
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
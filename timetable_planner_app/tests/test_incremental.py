@@ -0,0 +1,71 @@
+from timetable_planner_app.models import LessonInstance, SubjectOffering, Teacher
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import generate_timetable
+
+
+class IncrementalGenerationTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school()
+        self.term = make_term()
+        generate_timetable(term=self.term, school=self.school, clear_existing=True, mode="solver")
+
+    def lesson_ids(self, *subjects):
+        return set(LessonInstance.objects.filter(
+            term=self.term, subject__name__in=subjects
+        ).values_list("id", flat=True))
+
+    def regenerate(self):
+        return generate_timetable(term=self.term, school=self.school, incremental=True, mode="solver")
+
+    def test_unchanged_timetable_keeps_every_lesson(self):
+        before = self.lesson_ids("Mathematics", "English", "Physics", "History")
+
+        result = self.regenerate()
+
+        self.assertEqual(result.freed_ids, [])
+        self.assertEqual(self.lesson_ids("Mathematics", "English", "Physics", "History"), before)
+
+    def test_changed_offering_frees_and_places_only_its_lessons(self):
+        untouched = self.lesson_ids("English", "Physics", "History")
+        maths = self.lesson_ids("Mathematics")
+        SubjectOffering.objects.filter(subject=self.school.subjects["Mathematics"]).update(
+            periods_per_week=3
+        )
+
+        result = self.regenerate()
+
+        self.assertEqual(result.periods_placed, result.periods_requested)
+        self.assertEqual(self.lesson_ids("English", "Physics", "History"), untouched)
+        self.assertLessEqual(set(result.freed_ids), maths)
+        for school_class in self.school.classes:
+            self.assertEqual(LessonInstance.objects.filter(
+                term=self.term, school_class=school_class, subject__name="Mathematics"
+            ).count(), 3)
+
+    def test_added_periods_are_placed_around_kept_lessons(self):
+        kept = self.lesson_ids("Mathematics", "English", "Physics", "History")
+        SubjectOffering.objects.filter(subject=self.school.subjects["History"]).update(
+            periods_per_week=5
+        )
+
+        result = self.regenerate()
+
+        self.assertEqual(result.freed_ids, [])
+        self.assertLessEqual(kept, self.lesson_ids("Mathematics", "English", "Physics", "History"))
+        self.assertEqual(LessonInstance.objects.filter(
+            term=self.term, subject__name="History"
+        ).count(), 2 * 5)
+
+    def test_replaced_teacher_frees_their_lessons(self):
+        physics = self.school.subjects["Physics"]
+        eve = Teacher.objects.create(school=self.school, name="Eve")
+        physics.teachers.set([eve])
+        freed = self.lesson_ids("Physics")
+
+        result = self.regenerate()
+
+        self.assertEqual(set(result.freed_ids), freed)
+        self.assertEqual(set(LessonInstance.objects.filter(
+            term=self.term, subject=physics
+        ).values_list("teacher__name", flat=True)), {"Eve"})
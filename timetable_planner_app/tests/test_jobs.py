@@ -0,0 +1,113 @@
+from timetable_planner_app.jobs import claim_job, claim_next_job, enqueue_generation, run_job
+from timetable_planner_app.models import GenerationJob, GenerationLock, LessonInstance
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+
+
+class JobQueueTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school()
+        self.term = make_term()
+
+    def test_claim_job_runs_a_job_once(self):
+        job, created = enqueue_generation(self.term, self.school, clear_existing=True)
+
+        self.assertTrue(created)
+        claimed = claim_job(job.id)
+        self.assertEqual(claimed.status, GenerationJob.RUNNING)
+        self.assertIsNotNone(claimed.started_at)
+        self.assertIsNone(claim_job(job.id))
+
+    def test_claim_next_job_takes_the_oldest_queued_job(self):
+        other_term = make_term(2026, 2)
+        first, _ = enqueue_generation(self.term, self.school)
+        second, _ = enqueue_generation(other_term, self.school)
+
+        self.assertEqual(claim_next_job().id, first.id)
+        self.assertEqual(claim_next_job().id, second.id)
+        self.assertIsNone(claim_next_job())
+
+    def test_run_job_records_the_outcome(self):
+        job, _ = enqueue_generation(self.term, self.school, clear_existing=True)
+        job = run_job(claim_job(job.id))
+
+        self.assertEqual(job.status, GenerationJob.DONE)
+        self.assertEqual(job.periods_placed, job.periods_requested)
+        self.assertEqual(job.classes_done, job.classes_total)
+        self.assertTrue(job.message.startswith(f"Placed {job.periods_placed}/"))
+        self.assertEqual(LessonInstance.objects.filter(term=self.term).count(), job.periods_placed)
+
+    def test_run_job_records_a_failure(self):
+        job, _ = enqueue_generation(self.term, self.school, incremental=True, clear_existing=True)
+        job = run_job(claim_job(job.id))
+
+        self.assertEqual(job.status, GenerationJob.FAILED)
+        self.assertIn("incremental", job.message)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_jobs_default_to_the_solver(self):
+        # Incremental runs need the solver, which jobs use unless told otherwise.
+        job, _ = enqueue_generation(self.term, self.school, incremental=True)
+        job = run_job(claim_job(job.id))
+
+        self.assertEqual(job.status, GenerationJob.DONE)
+
+    def test_unknown_options_are_refused(self):
+        with self.assertRaises(ValueError):
+            enqueue_generation(self.term, self.school, colour="blue")
+
+
+class SingleFlightTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school()
+        self.term = make_term()
+
+    def test_second_request_joins_the_active_job(self):
+        job, _ = enqueue_generation(self.term, self.school, clear_existing=True)
+        joined, created = enqueue_generation(self.term, self.school, seed=5)
+
+        self.assertFalse(created)
+        self.assertEqual(joined.id, job.id)
+        self.assertEqual(joined.options, {"clear_existing": True})
+
+        claim_job(job.id)
+        joined, created = enqueue_generation(self.term, self.school)
+        self.assertFalse(created)
+        self.assertEqual(joined.id, job.id)
+
+    def test_finished_job_is_not_joined(self):
+        job, _ = enqueue_generation(self.term, self.school)
+        GenerationJob.objects.filter(id=job.id).update(status=GenerationJob.DONE)
+
+        _, created = enqueue_generation(self.term, self.school)
+        self.assertTrue(created)
+
+    def test_school_request_joins_an_active_whole_term_job(self):
+        whole, _ = enqueue_generation(self.term, None, all_schools=True)
+        joined, created = enqueue_generation(self.term, self.school)
+
+        self.assertFalse(created)
+        self.assertEqual(joined.id, whole.id)
+
+    def test_whole_term_job_waits_for_a_running_school_job(self):
+        school_job, _ = enqueue_generation(self.term, self.school)
+        claim_job(school_job.id)
+        whole, created = enqueue_generation(self.term, None)
+
+        self.assertTrue(created)
+        self.assertIsNone(claim_job(whole.id))
+        self.assertIsNone(claim_next_job())
+        whole.refresh_from_db()
+        self.assertEqual(whole.status, GenerationJob.QUEUED)
+
+        GenerationJob.objects.filter(id=school_job.id).update(status=GenerationJob.DONE)
+        self.assertEqual(claim_next_job().id, whole.id)
+
+    def test_requests_lock_the_term_and_their_school(self):
+        enqueue_generation(self.term, self.school)
+
+        self.assertEqual(
+            set(GenerationLock.objects.values_list("key", flat=True)),
+            {f"all:{self.term.pk}", f"{self.school.pk}:{self.term.pk}"},
+        )
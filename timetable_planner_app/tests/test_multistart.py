@@ -0,0 +1,50 @@
+from timetable_planner_app.models import LessonInstance
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import (
+    best_result, generate_timetable, load_snapshot, run_generation, run_multi_start
+)
+
+
+class MultiStartTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school(levels=("S1", "S2"))
+        self.term = make_term()
+        self.snapshot = load_snapshot(self.term, school=self.school)
+
+    def test_results_come_back_in_seed_order(self):
+        results = run_multi_start(self.snapshot, [5, 1, 3])
+
+        self.assertEqual([result.stats["seed"] for result in results], [5, 1, 3])
+
+    def test_workers_give_the_same_results_as_one_process(self):
+        serial = run_multi_start(self.snapshot, range(3))
+        parallel = run_multi_start(self.snapshot, range(3), workers=2)
+
+        self.assertEqual(
+            [result.placements for result in parallel],
+            [result.placements for result in serial],
+        )
+
+    def test_best_result_prefers_placement_then_score(self):
+        results = run_multi_start(self.snapshot, range(4))
+        best = best_result(results)
+
+        for result in results:
+            self.assertGreaterEqual(best.placement_rate, result.placement_rate)
+            if result.placement_rate == best.placement_rate:
+                self.assertLessEqual(best.stats["score"], result.stats["score"])
+
+    def test_generation_keeps_the_best_seed(self):
+        scores = {
+            seed: run_generation(self.snapshot, mode="solver", seed=seed).stats["score"]
+            for seed in range(3)
+        }
+
+        result = generate_timetable(
+            term=self.term, school=self.school, clear_existing=True, mode="solver", seeds=3
+        )
+
+        self.assertEqual(result.periods_placed, result.periods_requested)
+        self.assertEqual(result.stats["score"], min(scores.values()))
+        self.assertEqual(LessonInstance.objects.filter(term=self.term).count(), result.periods_placed)
@@ -0,0 +1,81 @@
+from io import StringIO
+
+from timetable_planner_app.models import LessonInstance
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import generate_all_schools, generate_timetable, load_school_snapshots
+
+OTHER_SUBJECTS = [
+    ("Art", 3, ["Zoe"], None),
+    ("Music", 2, ["Yan"], None),
+]
+
+
+class AllSchoolsTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school(code="T1")
+        self.other = make_school(levels=("S2",), subjects=OTHER_SUBJECTS, code="T2")
+        self.term = make_term()
+
+    def stored(self, school):
+        return sorted(LessonInstance.objects.filter(
+            term=self.term, school_class__school=school
+        ).values_list("school_class_id", "subject_id", "teacher_id", "day", "time_slot_id"))
+
+    def test_each_school_gets_its_own_snapshot(self):
+        snapshots = load_school_snapshots(self.term)
+
+        self.assertEqual(set(snapshots), {self.school.id, self.other.id})
+        for school in (self.school, self.other):
+            snapshot = snapshots[school.id]
+            self.assertEqual(
+                {class_id for class_id, _, _ in snapshot.classes},
+                {school_class.id for school_class in school.classes},
+            )
+            teachers = {t for ids in snapshot.subject_teachers.values() for t in ids}
+            self.assertEqual(teachers, {teacher.id for teacher in school.teachers.values()})
+
+    def test_every_school_is_generated_from_its_own_teachers(self):
+        results = generate_all_schools(term=self.term, clear_existing=True, mode="solver")
+
+        self.assertEqual(set(results), {self.school.id, self.other.id})
+        for school in (self.school, self.other):
+            result = results[school.id]
+            self.assertEqual(result.periods_placed, result.periods_requested)
+            self.assertEqual(len(self.stored(school)), result.periods_placed)
+            self.assertFalse(LessonInstance.objects.filter(
+                term=self.term, school_class__school=school
+            ).exclude(teacher__school=school).exists())
+
+    def test_workers_give_the_same_timetables(self):
+        generate_all_schools(term=self.term, clear_existing=True, mode="solver", use_cache=False)
+        serial = self.stored(self.school), self.stored(self.other)
+
+        generate_all_schools(
+            term=self.term, clear_existing=True, mode="solver", workers=2, use_cache=False
+        )
+
+        self.assertEqual((self.stored(self.school), self.stored(self.other)), serial)
+
+    def test_one_school_is_generated_and_cleared_alone(self):
+        generate_all_schools(term=self.term, clear_existing=True, mode="solver")
+        other = self.stored(self.other)
+
+        generate_timetable(
+            term=self.term, school=self.school, clear_existing=True, mode="solver", seed=2
+        )
+
+        self.assertEqual(self.stored(self.other), other)
+
+    def test_infeasible_school_is_skipped(self):
+        art = self.other.subjects["Art"]
+        art.subjectoffering_set.update(periods_per_week=11)
+        out = StringIO()
+
+        results = generate_all_schools(
+            term=self.term, clear_existing=True, mode="solver", preflight=True, stdout=out
+        )
+
+        self.assertEqual(set(results), {self.school.id})
+        self.assertIn("School T2: skipped", out.getvalue())
+        self.assertEqual(self.stored(self.other), [])
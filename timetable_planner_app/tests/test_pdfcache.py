@@ -0,0 +1,140 @@
+import os
+import stat
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from timetable_planner_app.pdfcache import (
+    PDF_FILE_MODE, cached_pdf_response, evict_pdfs, pdf_cache_path
+)
+from timetable_planner_app.tests.helpers import TimetableTestCase
+from timetable_planner_app.versions import bump_timetable_version, timetable_version
+
+TERM = SimpleNamespace(id=3)
+
+
+@override_settings(USE_X_ACCEL_REDIRECT=False)
+class PdfCacheTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        pdf_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(pdf_dir.cleanup)
+        self.dir = pdf_dir.name
+        pdf_settings = override_settings(PDF_CACHE_DIR=self.dir)
+        pdf_settings.enable()
+        self.addCleanup(pdf_settings.disable)
+        self.builds = 0
+
+    def build(self, out):
+        self.builds += 1
+        out.write(b"%PDF-1.4 build " + str(self.builds).encode())
+
+    def get(self, name="all"):
+        response = cached_pdf_response(1, TERM, name, "all_timetables.pdf", self.build)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, body
+
+    def path(self, name="all"):
+        return pdf_cache_path(1, TERM.id, name, timetable_version(TERM.id, 1))
+
+    def test_second_download_is_a_hit(self):
+        response, body = self.get()
+        self.assertEqual(body, b"%PDF-1.4 build 1")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="all_timetables.pdf"')
+
+        os.utime(self.path(), (0, 0))
+        _, body = self.get()
+        self.assertEqual(body, b"%PDF-1.4 build 1")
+        self.assertEqual(self.builds, 1)
+        self.assertGreater(self.path().stat().st_mtime, 0)  # refreshed for the LRU
+
+    def test_entry_evicted_mid_request_is_built_again(self):
+        self.get()
+        utime = os.utime
+
+        def evicted_after_utime(path, *args, **kwargs):
+            utime(path, *args, **kwargs)
+            os.unlink(path)  # another worker's eviction
+
+        with mock.patch("timetable_planner_app.pdfcache.os.utime", side_effect=evicted_after_utime):
+            response, body = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, b"%PDF-1.4 build 2")
+        self.assertTrue(self.path().exists())
+
+    def test_new_version_builds_a_new_file(self):
+        self.get()
+        old = self.path()
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_timetable_version(TERM.id, 1)
+
+        _, body = self.get()
+        self.assertEqual(body, b"%PDF-1.4 build 2")
+        self.assertNotEqual(self.path(), old)
+
+    def test_files_are_world_readable(self):
+        self.get()
+        self.assertEqual(stat.S_IMODE(self.path().stat().st_mode), PDF_FILE_MODE)
+
+    def test_failed_build_leaves_no_file(self):
+        def build(out):
+            out.write(b"partial")
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            cached_pdf_response(1, TERM, "all", "all_timetables.pdf", build)
+        self.assertEqual(list(Path(self.dir).rglob("*.*")), [])
+
+    @override_settings(USE_X_ACCEL_REDIRECT=True, PDF_CACHE_URL="/protected/pdfs/")
+    def test_x_accel_redirect_names_the_file(self):
+        response, body = self.get()
+
+        self.assertEqual(body, b"")
+        relative = self.path().relative_to(self.dir).as_posix()
+        self.assertEqual(response["X-Accel-Redirect"], "/protected/pdfs/" + relative)
+
+
+class EvictionTests(SimpleTestCase):
+    def setUp(self):
+        pdf_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(pdf_dir.cleanup)
+        self.dir = Path(pdf_dir.name)
+        pdf_settings = override_settings(PDF_CACHE_DIR=pdf_dir.name)
+        pdf_settings.enable()
+        self.addCleanup(pdf_settings.disable)
+
+    def write(self, name, size, used_at):
+        path = self.dir / "1" / "3" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+        os.utime(path, (used_at, used_at))
+        return path
+
+    def test_least_recently_used_files_go_first(self):
+        oldest = self.write("a-1.pdf", 100, 1000)
+        older = self.write("b-1.pdf", 100, 2000)
+        newest = self.write("c-1.pdf", 100, 3000)
+
+        self.assertEqual(evict_pdfs(max_bytes=150), 2)
+        self.assertFalse(oldest.exists())
+        self.assertFalse(older.exists())
+        self.assertTrue(newest.exists())
+
+    def test_nothing_goes_under_the_limit(self):
+        paths = [self.write(f"{name}-1.pdf", 100, 1000) for name in "abc"]
+
+        self.assertEqual(evict_pdfs(max_bytes=300), 0)
+        self.assertTrue(all(path.exists() for path in paths))
+
+    def test_kept_file_survives(self):
+        kept = self.write("a-1.pdf", 100, 1000)
+        other = self.write("b-1.pdf", 100, 2000)
+
+        self.assertEqual(evict_pdfs(max_bytes=100, keep=kept), 1)
+        self.assertTrue(kept.exists())
+        self.assertFalse(other.exists())
@@ -0,0 +1,74 @@
+from collections import Counter
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+
+from timetable_planner_app.jobs import run_generation_now
+from timetable_planner_app.models import LessonInstance, Room, UserProfile
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import generate_timetable
+
+
+class RoomAllocationTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school()
+        self.term = make_term()
+        self.physics = self.school.subjects["Physics"]
+        self.physics.room_type = "Laboratory"
+        self.physics.save()
+        for school_class in self.school.classes:
+            school_class.size = 30
+            school_class.save()
+
+    def add_room(self, name, capacity, room_type="Laboratory"):
+        return Room.objects.create(school=self.school, name=name, room_type=room_type, capacity=capacity)
+
+    def test_lessons_needing_a_room_get_a_fitting_one(self):
+        lab = self.add_room("Lab 1", 40)
+        self.add_room("Small lab", 10)
+        self.add_room("Hall", 200, room_type="Hall")
+
+        result = generate_timetable(term=self.term, school=self.school, clear_existing=True, mode="solver")
+
+        self.assertEqual(result.stats["rooms_missing"], 0)
+        physics = LessonInstance.objects.filter(term=self.term, subject=self.physics)
+        self.assertEqual(set(physics.values_list("room_id", flat=True)), {lab.id})
+        self.assertFalse(
+            LessonInstance.objects.filter(term=self.term, room__isnull=False)
+            .exclude(subject=self.physics).exists()
+        )
+        cells = Counter(physics.values_list("day", "time_slot_id"))
+        self.assertEqual(max(cells.values()), 1)
+
+    def test_missing_rooms_are_reported(self):
+        self.add_room("Small lab", 10)
+
+        job = run_generation_now(self.term, self.school, clear_existing=True)
+        self.assertEqual(job.rooms_missing, 2 * 3)
+        self.assertIn("6 lessons got no room", job.message)
+
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("validate_timetable", stdout=out)
+        self.assertIn("No room: Physics", out.getvalue())
+
+    def test_generate_command_warns_about_missing_rooms(self):
+        out = StringIO()
+        call_command("generate_timetable", "--clear", stdout=out)
+
+        self.assertIn("6 lessons need a room but none was free", out.getvalue())
+        self.assertNotIn("Timetable generated ✅", out.getvalue())
+
+    def test_rooms_are_shown(self):
+        self.add_room("Lab 1", 40)
+        generate_timetable(term=self.term, school=self.school, clear_existing=True, mode="solver")
+        user = User.objects.create_user("teacher")
+        UserProfile.objects.create(user=user, school=self.school)
+        self.client.force_login(user)
+
+        self.assertContains(self.client.get("/grid/"), "Lab 1")
+        response = self.client.get(f"/timetable/class/{self.school.classes[0].id}/")
+        self.assertContains(response, "<th>Room</th>", html=False)
+        self.assertContains(response, "Lab 1")
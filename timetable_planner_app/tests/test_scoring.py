@@ -0,0 +1,66 @@
+import random
+
+from django.test import SimpleTestCase
+
+from timetable_planner_app.occupancy import DAYS
+from timetable_planner_app.scoring import Scorer, day_gaps, score_timetable
+
+SLOT_IDS = list(range(1, 9))
+MAX_PER_DAY = 2
+
+
+def random_timetable(rng, lessons=60):
+    return [
+        (rng.randrange(3), rng.randrange(6), rng.randrange(4), rng.choice(DAYS), rng.choice(SLOT_IDS))
+        for _ in range(lessons)
+    ]
+
+
+class ScoreTests(SimpleTestCase):
+    def test_day_gaps(self):
+        self.assertEqual(day_gaps(0), 0)
+        self.assertEqual(day_gaps(0b1), 0)
+        self.assertEqual(day_gaps(0b1011), 1)
+        self.assertEqual(day_gaps(0b100001), 4)
+
+    def test_components(self):
+        lessons = [
+            # Teacher 7 teaches periods 1 and 4 on Monday: two gaps.
+            (1, 10, 7, "Monday", 1),
+            (1, 10, 7, "Monday", 4),
+            # Subject 10 has 3 periods in class 1 on Monday, one over the
+            # limit, and is spread over 1 day instead of 3.
+            (1, 10, 8, "Monday", 2),
+        ]
+        score = score_timetable(SLOT_IDS, lessons, MAX_PER_DAY)
+
+        self.assertEqual(score.gaps, 2)
+        self.assertEqual(score.clustering, 1)
+        self.assertEqual(score.spread, 2)
+        # Teacher 7 has 2 periods on Monday against an even split of 1.
+        self.assertEqual(score.imbalance, 1)
+        self.assertEqual(score.total, 2 * 1 + 2 * 2 + 1 * 5 + 1 * 1)
+
+    def test_delta_matches_a_full_rescore(self):
+        rng = random.Random(0)
+        lessons = random_timetable(rng)
+        scorer = Scorer(SLOT_IDS, MAX_PER_DAY).add_lessons(lessons)
+
+        for _ in range(300):
+            index = rng.randrange(len(lessons))
+            old = lessons[index]
+            new = (old[0], old[1], rng.randrange(4), rng.choice(DAYS), rng.choice(SLOT_IDS))
+            remove = (*old[:3], scorer.grid.cell(*old[3:]))
+            add = (*new[:3], scorer.grid.cell(*new[3:]))
+            before = scorer.total
+
+            delta = scorer.delta(removes=[remove], adds=[add])
+            self.assertEqual(scorer.total, before)
+
+            lessons[index] = new
+            rescored = score_timetable(SLOT_IDS, lessons, MAX_PER_DAY)
+            self.assertEqual(delta, rescored.total - before)
+
+            scorer.remove(*remove)
+            scorer.add(*add)
+            self.assertEqual(scorer.components, rescored.components)
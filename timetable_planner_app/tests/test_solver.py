@@ -0,0 +1,50 @@
+from collections import Counter
+
+from timetable_planner_app.models import LessonInstance
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import MAX_PER_DAY, generate_timetable, load_snapshot, run_generation
+from timetable_planner_app.weekgrid import week_grid
+
+
+class SolverTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school(levels=("S1", "S2"))
+        self.term = make_term()
+
+    def test_places_every_period(self):
+        snapshot = load_snapshot(self.term, school=self.school)
+        result = run_generation(snapshot, mode="solver", seed=0)
+
+        self.assertEqual(result.periods_requested, 2 * 2 * (5 + 4 + 3 + 3))
+        self.assertEqual(result.periods_placed, result.periods_requested)
+
+    def test_stored_timetable_meets_the_hard_constraints(self):
+        generate_timetable(term=self.term, school=self.school, clear_existing=True, mode="solver")
+
+        lessons = list(LessonInstance.objects.filter(term=self.term).values_list(
+            "school_class_id", "subject_id", "teacher_id", "day", "time_slot_id"
+        ))
+        teaching = set(week_grid().teaching_slot_ids)
+        per_subject = Counter((c, s) for c, s, _, _, _ in lessons)
+        per_day = Counter((c, s, day) for c, s, _, day, _ in lessons)
+
+        self.assertTrue(all(slot_id in teaching for *_, slot_id in lessons))
+        self.assertEqual(max(Counter((c, d, s) for c, _, _, d, s in lessons).values()), 1)
+        self.assertEqual(max(Counter((t, d, s) for _, _, t, d, s in lessons).values()), 1)
+        self.assertLessEqual(max(per_day.values()), MAX_PER_DAY)
+        for school_class in self.school.classes:
+            self.assertEqual(per_subject[(school_class.id, self.school.subjects["Mathematics"].id)], 5)
+            self.assertEqual(per_subject[(school_class.id, self.school.subjects["History"].id)], 3)
+
+    def test_reports_what_cannot_be_placed(self):
+        # One teacher for everything: 30 periods of S1 and S2 classes
+        # share her, so at most a week's worth of cells can be taught.
+        teacher = self.school.teachers["Alice"]
+        for subject in self.school.subjects.values():
+            subject.teachers.set([teacher])
+        snapshot = load_snapshot(self.term, school=self.school)
+        result = run_generation(snapshot, mode="solver", seed=0)
+
+        self.assertLess(result.periods_placed, result.periods_requested)
+        self.assertLessEqual(result.periods_placed, len(week_grid().teaching_slot_ids) * 5)
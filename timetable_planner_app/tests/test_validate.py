@@ -0,0 +1,49 @@
+import json
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+
+from timetable_planner_app.models import LessonInstance, Teacher
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import generate_timetable
+
+
+class ValidateTimetableTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school()
+        self.term = make_term()
+        generate_timetable(term=self.term, school=self.school, clear_existing=True)
+
+    def validate(self, *args):
+        out = StringIO()
+        call_command("validate_timetable", *args, stdout=out)
+        return out.getvalue()
+
+    def add_clash(self):
+        # A second lesson for a class in a cell it already has one in.
+        lesson = LessonInstance.objects.filter(term=self.term).first()
+        lesson.pk = None
+        lesson.subject = self.school.subjects["History"]
+        lesson.teacher = Teacher.objects.create(school=self.school, name="Supply")
+        lesson.save()
+
+    def test_valid_timetable(self):
+        self.assertIn("timetable is valid", self.validate())
+        summary = json.loads(self.validate("--json"))
+        self.assertEqual(summary["lessons"], LessonInstance.objects.count())
+        self.assertEqual(summary["class_clashes"], 0)
+
+    def test_clash_fails(self):
+        self.add_clash()
+
+        with self.assertRaises(CommandError):
+            self.validate()
+
+    def test_clash_fails_with_json_too(self):
+        self.add_clash()
+        out = StringIO()
+
+        with self.assertRaises(CommandError):
+            call_command("validate_timetable", "--json", stdout=out)
+        self.assertEqual(json.loads(out.getvalue())["class_clashes"], 1)
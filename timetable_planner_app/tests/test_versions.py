@@ -0,0 +1,108 @@
+from datetime import time
+
+from timetable_planner_app.models import LessonInstance, Subject, TimeSlot, TimetableScore
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import clone_term, generate_timetable, lessons_changed_in, timetable_score
+from timetable_planner_app.versions import timetable_version
+from timetable_planner_app.weekgrid import week_grid
+
+
+class VersionBumpTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school(code="T1")
+        self.other = make_school(levels=("S2",), subjects=[("Art", 2, ["Zoe"], None)], code="T2")
+        self.term = make_term()
+
+    def versions(self, term=None):
+        term = term or self.term
+        return timetable_version(term, self.school), timetable_version(term, self.other)
+
+    def assertBumped(self, write, school=True, other=False, term=None):
+        """Runs `write` and checks which of the two schools' tokens changed once it commits."""
+        before = self.versions(term)
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        after = self.versions(term)
+        self.assertEqual(after[0] != before[0], school)
+        self.assertEqual(after[1] != before[1], other)
+
+    def test_generation_bumps_only_its_school(self):
+        self.assertBumped(lambda: generate_timetable(
+            term=self.term, school=self.school, clear_existing=True
+        ))
+
+    def test_generation_of_every_school_bumps_all(self):
+        self.assertBumped(lambda: generate_timetable(term=self.term, clear_existing=True), other=True)
+
+    def test_bump_waits_for_the_commit(self):
+        before = self.versions()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            generate_timetable(term=self.term, school=self.school, clear_existing=True)
+
+        self.assertEqual(self.versions(), before)
+        self.assertTrue(callbacks)
+
+    def test_clone_bumps_the_target_term(self):
+        generate_timetable(term=self.term, school=self.school, clear_existing=True)
+        target = make_term(2026, 2)
+
+        self.assertBumped(lambda: clone_term(self.term, target, school=self.school), term=target)
+
+    def test_queryset_delete_through_lessons_changed_in(self):
+        generate_timetable(term=self.term, school=self.school, clear_existing=True)
+        lessons = LessonInstance.objects.filter(school_class=self.school.classes[0])
+
+        def delete():
+            lessons_changed_in(lessons)
+            lessons.delete()
+        self.assertBumped(delete)
+
+    def test_single_lesson_save_bumps_and_drops_the_score(self):
+        generate_timetable(term=self.term, school=self.school, clear_existing=True)
+        timetable_score(self.term, self.school)
+        lesson = LessonInstance.objects.filter(school_class__school=self.school).first()
+        lesson.room = None
+
+        self.assertBumped(lesson.save)
+        self.assertFalse(TimetableScore.objects.filter(term=self.term, school=self.school).exists())
+
+    def test_plain_queryset_delete_bumps_and_drops_the_score(self):
+        generate_timetable(term=self.term, school=self.school, clear_existing=True)
+        timetable_score(self.term, self.school)
+        lessons = LessonInstance.objects.filter(school_class=self.school.classes[0])
+
+        self.assertBumped(lessons.delete)
+        self.assertFalse(TimetableScore.objects.filter(term=self.term, school=self.school).exists())
+
+    def test_cascade_delete_from_a_teacher_bumps_its_school(self):
+        generate_timetable(term=self.term, school=self.school, clear_existing=True)
+        teacher = self.school.teachers["Alice"]
+        teacher_id = teacher.pk
+
+        self.assertBumped(teacher.delete)
+        self.assertFalse(LessonInstance.objects.filter(teacher_id=teacher_id).exists())
+
+    def test_generation_keeps_the_score_it_stores(self):
+        generate_timetable(term=self.term, school=self.school, clear_existing=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_timetable(term=self.term, school=self.school, clear_existing=True)
+
+        self.assertTrue(TimetableScore.objects.filter(term=self.term, school=self.school).exists())
+
+    def test_teacher_save_bumps_its_school(self):
+        teacher = self.school.teachers["Alice"]
+        teacher.name = "Alicia"
+        self.assertBumped(teacher.save)
+
+    def test_shared_data_bumps_every_school(self):
+        self.assertBumped(lambda: Subject.objects.create(name="Music"), other=True)
+
+    def test_time_slot_change_recompiles_the_week_grid(self):
+        slots = len(week_grid().slots)
+
+        self.assertBumped(
+            lambda: TimeSlot.objects.create(name="P12", start_time=time(16, 20), end_time=time(17, 0)),
+            other=True,
+        )
+        self.assertEqual(len(week_grid().slots), slots + 1)
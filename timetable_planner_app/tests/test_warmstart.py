@@ -0,0 +1,84 @@
+from timetable_planner_app.models import LessonInstance, SubjectOffering
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import clone_term, generate_timetable
+
+FIELDS = ("school_class_id", "subject_id", "teacher_id", "day", "time_slot_id", "room_id")
+
+
+class CloneAndWarmStartTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school(code="T1")
+        self.other = make_school(levels=("S2",), subjects=[("Art", 2, ["Zoe"], None)], code="T2")
+        self.source = make_term(2026, 1)
+        self.target = make_term(2026, 2)
+        generate_timetable(term=self.source, clear_existing=True, mode="solver")
+
+    def lessons(self, term, school=None, subject=None):
+        lessons = LessonInstance.objects.filter(term=term)
+        if school is not None:
+            lessons = lessons.filter(school_class__school=school)
+        if subject is not None:
+            lessons = lessons.filter(subject__name=subject)
+        return sorted(lessons.values_list(*FIELDS))
+
+    def test_clone_copies_the_timetable(self):
+        copied = clone_term(self.source, self.target)
+
+        self.assertEqual(copied, len(self.lessons(self.source)))
+        self.assertEqual(self.lessons(self.target), self.lessons(self.source))
+
+    def test_clone_of_one_school_leaves_the_others(self):
+        clone_term(self.source, self.target, school=self.school)
+
+        self.assertEqual(self.lessons(self.target, self.school), self.lessons(self.source, self.school))
+        self.assertEqual(self.lessons(self.target, self.other), [])
+
+    def test_clone_refuses_a_term_with_lessons_unless_cleared(self):
+        clone_term(self.source, self.target)
+
+        with self.assertRaises(ValueError):
+            clone_term(self.source, self.target)
+        self.assertEqual(clone_term(self.source, self.target, clear_existing=True),
+                         len(self.lessons(self.source)))
+        with self.assertRaises(ValueError):
+            clone_term(self.source, self.source)
+
+    def test_warm_start_keeps_every_valid_lesson(self):
+        result = generate_timetable(
+            term=self.target, school=self.school, clear_existing=True, mode="solver",
+            warm_start=self.source,
+        )
+
+        self.assertEqual(result.stats["kept"], result.periods_placed)
+        self.assertEqual(self.lessons(self.target, self.school), self.lessons(self.source, self.school))
+        self.assertEqual(len(self.lessons(self.source, self.school)), result.periods_placed)
+
+    def test_warm_start_solves_only_what_changed(self):
+        SubjectOffering.objects.filter(subject=self.school.subjects["History"]).update(
+            periods_per_week=4
+        )
+        unchanged = [
+            self.lessons(self.source, self.school, subject)
+            for subject in ("Mathematics", "English", "Physics")
+        ]
+
+        result = generate_timetable(
+            term=self.target, school=self.school, clear_existing=True, mode="solver",
+            warm_start=self.source,
+        )
+
+        self.assertEqual(result.periods_placed, result.periods_requested)
+        self.assertEqual([
+            self.lessons(self.target, self.school, subject)
+            for subject in ("Mathematics", "English", "Physics")
+        ], unchanged)
+        self.assertEqual(len(self.lessons(self.target, self.school, "History")), 2 * 4)
+        self.assertEqual(len(self.lessons(self.source, self.school, "History")), 2 * 3)
+
+    def test_warm_start_refuses_a_term_with_lessons(self):
+        generate_timetable(term=self.target, school=self.school, clear_existing=True, mode="solver")
+
+        with self.assertRaises(ValueError):
+            generate_timetable(term=self.target, school=self.school, mode="solver",
+                               warm_start=self.source)
@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+
+from timetable_planner_app.models import LessonInstance, TimetableScore, UserProfile
+from timetable_planner_app.tests.helpers import TimetableTestCase, make_school, make_term
+from timetable_planner_app.utils import generate_timetable
+
+
+class TeacherWorkloadPageTests(TimetableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.school = make_school()
+        self.term = make_term()
+        generate_timetable(term=self.term, school=self.school, clear_existing=True)
+        self.user = User.objects.create_user("teacher")
+        UserProfile.objects.create(user=self.user, school=self.school)
+        self.url = f"/analytics/teachers/{self.term.id}/"
+
+    def test_requires_login(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_unknown_term_is_not_found(self):
+        self.client.force_login(self.user)
+
+        self.assertEqual(self.client.get("/analytics/teachers/999/").status_code, 404)
+
+    def test_get_does_not_store_a_score(self):
+        # An edit by hand drops the stored score; the page then scores the
+        # lessons in memory without writing one back.
+        LessonInstance.objects.filter(school_class__school=self.school).first().delete()
+        self.assertFalse(TimetableScore.objects.exists())
+        self.client.force_login(self.user)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context["score"].pk)
+        self.assertFalse(TimetableScore.objects.exists())
+
+    def test_reads_the_stored_score(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(self.url)
+
+        stored = TimetableScore.objects.get(term=self.term, school=self.school)
+        self.assertEqual(response.context["score"].pk, stored.pk)
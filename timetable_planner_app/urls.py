@@ -28,6 +28,7 @@ urlpatterns = [
     name="teacher_workload"
     ),
     path("dashboard/", views.dashboard, name="dashboard"),
+    path("jobs/<int:job_id>/status/", views.generation_job_status, name="generation_job_status"),
 
     # CRUD for core models
     path("teachers/", views.TeacherListView.as_view(), name="teacher_list"),
@@ -50,6 +51,11 @@ urlpatterns = [
     path("subject-offerings/<int:pk>/edit/", views.SubjectOfferingUpdateView.as_view(), name="subjectoffering_edit"),
     path("subject-offerings/<int:pk>/delete/", views.SubjectOfferingDeleteView.as_view(), name="subjectoffering_delete"),
 
+    path("rooms/", views.RoomListView.as_view(), name="room_list"),
+    path("rooms/add/", views.RoomCreateView.as_view(), name="room_add"),
+    path("rooms/<int:pk>/edit/", views.RoomUpdateView.as_view(), name="room_edit"),
+    path("rooms/<int:pk>/delete/", views.RoomDeleteView.as_view(), name="room_delete"),
+
     path("classes/", views.SchoolClassListView.as_view(), name="class_list"),
     path("classes/add/", views.SchoolClassCreateView.as_view(), name="class_add"),
     path("classes/<int:pk>/edit/", views.SchoolClassUpdateView.as_view(), name="class_edit"),
@@ -1,129 +1,2145 @@
 from collections import defaultdict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import copy
+import hashlib
+import json
 import random
 import math
+import threading
+import time
+
+import django
 
 from timetable_planner_app.models import (
-    SchoolClass, SubjectOffering, LessonInstance,
-    TimeSlot, AcademicTerm
+    School, SchoolClass, Subject, SubjectOffering, Teacher, Lesson, LessonInstance,
+    AcademicTerm, TimetableGeneration, TimetableScore, Room
+)
+from timetable_planner_app.occupancy import (
+    DAYS, Occupancy, iter_bits, nth_bit, teaching_slot_ids, unavailable_cells
 )
-from django.db.models import Count
+from timetable_planner_app.local_search import improve_timetable
+from timetable_planner_app.scoring import score_timetable
+from timetable_planner_app.assignment import assign_teachers
+from timetable_planner_app.electives import ElectiveBlock, Offerings, fold_block_lessons
+from timetable_planner_app.rooms import allocate_rooms
+from timetable_planner_app.weekgrid import week_grid
+from timetable_planner_app.versions import bump_timetable_version
+from timetable_planner_app.feasibility import (
+    InfeasibleTimetable, analyse_snapshot, teacher_names_for
+)
+from django.db import connection, connections, transaction
+from django.db.models import CharField, Count, Q, Value
+from django.db.models.functions import Concat
 
-DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
 MAX_PER_DAY = 2
+BULK_BATCH_SIZE = 500
+MAX_BACKTRACKS = 1000
+PROGRESS_EVERY = 256  # solver steps between progress callbacks
+
+GENERATION_MODES = ("solver", "greedy")
 
 
-def generate_timetable(term=None, clear_existing=False, stdout=None):
+class TimetableSnapshot:
     """
-    Generates timetable LessonInstances.
+    Plain in-memory copy of everything the generator reads.
 
-    Args:
-        term (AcademicTerm): Term to generate for
-        clear_existing (bool): Whether to delete existing timetable
-        stdout: Optional command stdout for logging
+    Built once per run by `load_snapshot` so placement never has to go
+    back to the database.
     """
 
-    if not term:
-        term = AcademicTerm.objects.order_by("-year", "-term").first()
-        if not term:
-            raise ValueError("No AcademicTerm found")
+    def __init__(self, term_id, slot_ids, classes, offerings_by_level,
+                 subject_names, subject_teachers, existing, school_id=None,
+                 existing_ids=None, subject_groups=None, class_schools=None,
+                 teacher_unavailable=None, rooms=None, subject_rooms=None,
+                 class_sizes=None, lesson_rooms=None, block_lessons=None):
+        self.term_id = term_id
+        self.school_id = school_id                    # None when not scoped to one school
+        self.slot_ids = slot_ids                      # teaching slots, in start_time order
+        self.classes = classes                        # [(class_id, level_id, label)]
+        self.offerings_by_level = offerings_by_level  # {level_id: [(subject_id, periods)]}
+        self.subject_names = subject_names            # {subject_id: name}
+        self.subject_teachers = subject_teachers      # {subject_id: [teacher_id]}
+        self.existing = existing                      # [(class_id, subject_id, teacher_id, day, slot_id)]
+        self.existing_ids = existing_ids or []        # LessonInstance ids, aligned with `existing`
+        self.subject_groups = subject_groups or {}    # {subject_id: elective group}, electives only
+        self.class_schools = class_schools or {}      # {class_id: school_id}
+        self.teacher_unavailable = teacher_unavailable or {}  # {teacher_id: cell mask}, see Occupancy
+        self.rooms = rooms or {}                      # {school_id: [(room_id, room_type, capacity)]}
+        self.subject_rooms = subject_rooms or {}      # {subject_id: room_type}, subjects needing a room
+        self.class_sizes = class_sizes or {}          # {class_id: students}, classes with a size
+        self.lesson_rooms = lesson_rooms or {}        # {lesson id: room_id}, stored lessons with a room
+        self.block_lessons = block_lessons or {}      # {lesson id: [ids]}, other classes' rows of a block lesson
 
-    if clear_existing:
-        LessonInstance.objects.filter(term=term).delete()
-        if stdout:
-            stdout.write("Cleared existing timetable")
 
-    time_slots = TimeSlot.objects.filter(
-        is_break=False,
-        is_lunch=False,
-        is_assembly=False
-    ).order_by("start_time")
+class GenerationResult:
+    """Placements produced by one in-memory run, plus how well it did."""
 
-    teacher_busy = defaultdict(set)
-    class_busy = defaultdict(set)
+    def __init__(self, placements, periods_requested, stats=None):
+        self.placements = placements
+        self.periods_requested = periods_requested
+        self.stats = stats or {}
+        self.freed_ids = []  # stored lessons an incremental run replaces
+        self.assignment = {}  # {(class_id, subject_id): teacher_id} placement started from
+        self.rooms = {}  # {(teacher_id, day, slot_id): room_id}, see assign_rooms
+        self.writes = {}  # rows inserted, updated and deleted when it was saved
+
+    @property
+    def periods_placed(self):
+        return len(self.placements)
+
+    @property
+    def placement_rate(self):
+        if not self.periods_requested:
+            return 1.0
+        return self.periods_placed / self.periods_requested
+
+
+def load_snapshot(term, clear_existing=False, school=None, warm_start=None):
+    """
+    Loads classes, offerings, subject teachers and teaching slots in a
+    fixed number of queries.
+
+    Lessons already stored for the term are included unless they are
+    about to be cleared, so new placements are made around them. With
+    `warm_start` (another AcademicTerm) that term's lessons are loaded
+    instead, as the starting point of the new timetable.
+
+    When `school` is given only its classes, its teachers and its stored
+    lessons are loaded.
+    """
+    snapshots = _load_snapshots(term, clear_existing, school=school, warm_start=warm_start)
+    school_id = getattr(school, "pk", school)
+    return snapshots.get(school_id) or _empty_snapshot(term, school_id)
+
+
+def load_school_snapshots(term, clear_existing=False, warm_start=None):
+    """
+    Loads one snapshot per School, still in a fixed number of queries.
+
+    Teachers and classes never cross schools, so each snapshot can be
+    generated and written independently of the others.
+
+    Returns:
+        dict: {school_id: TimetableSnapshot}, only for schools with classes
+    """
+    return _load_snapshots(term, clear_existing, partition=True, warm_start=warm_start)
 
-    for school_class in SchoolClass.objects.all():
-        if stdout:
-            stdout.write(f"Generating for {school_class}")
 
-        offerings = SubjectOffering.objects.filter(
-            class_level=school_class.level
+def _load_snapshots(term, clear_existing, school=None, partition=False, warm_start=None):
+    """
+    Shared loader behind `load_snapshot` and `load_school_snapshots`.
+
+    Rows are keyed by school id when partitioning or scoping to one
+    school, and by None otherwise (every class and teacher together).
+    """
+    by_school = partition or school is not None
+
+    slot_ids = teaching_slot_ids()
+
+    class_qs = SchoolClass.objects.select_related("level", "stream").order_by("id")
+    links = Subject.teachers.through.objects.order_by("teacher_id")
+    unavailable = Teacher.objects.exclude(unavailable=0).order_by("id")
+    room_qs = Room.objects.order_by("id")
+    lessons = LessonInstance.objects.filter(term=warm_start or term)
+    if school is not None:
+        class_qs = class_qs.filter(school=school)
+        links = links.filter(teacher__school=school)
+        unavailable = unavailable.filter(school=school)
+        room_qs = room_qs.filter(school=school)
+        lessons = lessons.filter(school_class__school=school)
+
+    classes = defaultdict(list)
+    class_schools = {}
+    class_sizes = {}
+    for school_class in class_qs:
+        key = school_class.school_id if by_school else None
+        classes[key].append((school_class.id, school_class.level_id, str(school_class)))
+        class_schools[school_class.id] = school_class.school_id
+        if school_class.size:
+            class_sizes[school_class.id] = school_class.size
+
+    offerings_by_level = defaultdict(list)
+    subject_names = {}
+    subject_groups = {}
+    subject_rooms = {}
+    for offering in SubjectOffering.objects.select_related("subject").order_by("id"):
+        offerings_by_level[offering.class_level_id].append(
+            (offering.subject_id, offering.periods_per_week)
+        )
+        subject_names[offering.subject_id] = offering.subject.name
+        if offering.subject.elective_group:
+            subject_groups[offering.subject_id] = offering.subject.elective_group
+        if offering.subject.room_type:
+            subject_rooms[offering.subject_id] = offering.subject.room_type
+
+    subject_teachers = defaultdict(lambda: defaultdict(list))
+    for subject_id, teacher_id, school_id in links.values_list(
+        "subject_id", "teacher_id", "teacher__school_id"
+    ):
+        key = school_id if by_school else None
+        subject_teachers[key][subject_id].append(teacher_id)
+
+    # Stored availability turned into cells of this run's grid once, so the
+    # generator only ORs it into the teachers' occupancy masks.
+    teacher_unavailable = defaultdict(dict)
+    for teacher_id, mask, school_id in unavailable.values_list("id", "unavailable", "school_id"):
+        cells = unavailable_cells(mask, len(slot_ids))
+        if cells:
+            teacher_unavailable[school_id if by_school else None][teacher_id] = cells
+
+    rooms = defaultdict(lambda: defaultdict(list))
+    for room_id, room_type, capacity, school_id in room_qs.values_list(
+        "id", "room_type", "capacity", "school_id"
+    ):
+        rooms[school_id if by_school else None][school_id].append((room_id, room_type, capacity))
+
+    # Stored block lessons are folded back into one row per block subject
+    # and cell (see electives); the rows folded away go with it if freed.
+    existing = defaultdict(list)
+    existing_ids = defaultdict(list)
+    lesson_rooms = defaultdict(dict)
+    block_lessons = defaultdict(dict)
+    if warm_start or not clear_existing:
+        stored = defaultdict(list)
+        rooms_of = {}
+        for lesson_id, *row, room_id, school_id in lessons.values_list(
+            "id", "school_class_id", "school_class__level_id", "subject_id", "teacher_id",
+            "day", "time_slot_id", "elective_group", "room_id", "school_class__school_id"
+        ):
+            stored[school_id if by_school else None].append((lesson_id, *row))
+            if room_id is not None and not warm_start:
+                rooms_of[lesson_id] = room_id
+        for key, rows in stored.items():
+            folded, block_lessons[key] = fold_block_lessons(rows)
+            for lesson_id, row in folded:
+                existing[key].append(row)
+                existing_ids[key].append(lesson_id)
+                if lesson_id in rooms_of:
+                    lesson_rooms[key][lesson_id] = rooms_of[lesson_id]
+
+    return {
+        key: TimetableSnapshot(
+            term_id=term.id,
+            slot_ids=slot_ids,
+            classes=key_classes,
+            offerings_by_level=dict(offerings_by_level),
+            subject_names=subject_names,
+            subject_teachers=dict(subject_teachers.get(key, {})),
+            existing=existing.get(key, []),
+            school_id=key,
+            existing_ids=existing_ids.get(key, []),
+            subject_groups=subject_groups,
+            class_schools={
+                class_id: class_schools[class_id] for class_id, _, _ in key_classes
+            },
+            teacher_unavailable=teacher_unavailable.get(key, {}),
+            rooms=dict(rooms.get(key, {})),
+            subject_rooms=subject_rooms,
+            class_sizes={
+                class_id: class_sizes[class_id] for class_id, _, _ in key_classes
+                if class_id in class_sizes
+            },
+            lesson_rooms=lesson_rooms.get(key, {}),
+            block_lessons=block_lessons.get(key, {}),
         )
+        for key, key_classes in classes.items()
+    }
+
+
+def _empty_snapshot(term, school_id):
+    """Snapshot for a scope that has no classes, so there is nothing to place."""
+    return TimetableSnapshot(term.id, teaching_slot_ids(), [], {}, {}, {}, [], school_id=school_id)
+
+
+def incremental_snapshot(snapshot, free_classes=()):
+    """
+    Works out which stored lessons no longer match the current data.
+
+    Stored lessons are compared with the offerings and subject teachers
+    in `snapshot`, per (class, subject), or per block and subject for the
+    subjects of an elective block:
+
+    - lessons for an offering that no longer exists are freed;
+    - lessons taught by a teacher who no longer teaches the subject are
+      freed, so the offering is re-placed with a current teacher;
+    - lessons beyond `periods_per_week` are freed, from the busiest days
+      of that offering first;
+    - lessons outside the teaching grid (a slot turned into a break) are
+      freed;
+    - lessons in a period their teacher is now marked unavailable are
+      freed;
+    - every lesson of a class in `free_classes` (or of a block one of them
+      is in) is freed, to widen a run that could not fit the changes
+      around the kept lessons.
+
+    Offerings with fewer lessons than `periods_per_week` need nothing
+    freed: the solver tops them up around the kept lessons. A freed block
+    lesson frees its rows for the other classes of the block too.
+
+    Returns:
+        tuple: (snapshot holding only the kept lessons, [freed lesson ids])
+    """
+    occupancy = Occupancy(snapshot.slot_ids)
+    offerings = Offerings(snapshot)
+    required = offerings.periods
+    free_classes = set(free_classes)
+    unavailable = snapshot.teacher_unavailable
+    teachers = {
+        subject_id: set(teacher_ids)
+        for subject_id, teacher_ids in snapshot.subject_teachers.items()
+    }
+
+    freed = set()
+    groups = defaultdict(list)
+    for lesson_id, row in zip(snapshot.existing_ids, snapshot.existing):
+        class_id, subject_id, teacher_id, day, slot_id = row
+        pair = offerings.key(class_id, subject_id)
+        cell = occupancy.cell(day, slot_id)
+        if (
+            not free_classes.isdisjoint(offerings.classes_of(class_id, subject_id))
+            or pair not in required
+            or teacher_id not in teachers.get(subject_id, ())
+            or cell is None
+            or (unavailable.get(teacher_id, 0) >> cell) & 1
+        ):
+            freed.add(lesson_id)
+        else:
+            groups[pair].append((lesson_id, cell))
+
+    for pair, lessons in groups.items():
+        excess = len(lessons) - required[pair]
+        if excess <= 0:
+            continue
+        per_day = defaultdict(list)
+        for lesson_id, cell in sorted(lessons, key=lambda lesson: lesson[1]):
+            per_day[occupancy.day_of(cell)].append(lesson_id)
+        for _ in range(excess):
+            day = max(per_day, key=lambda d: (len(per_day[d]), d))
+            freed.add(per_day[day].pop())
+
+    kept = [
+        (lesson_id, row)
+        for lesson_id, row in zip(snapshot.existing_ids, snapshot.existing)
+        if lesson_id not in freed
+    ]
+    incremental = copy.copy(snapshot)
+    incremental.existing = [row for _, row in kept]
+    incremental.existing_ids = [lesson_id for lesson_id, _ in kept]
+    for lesson_id in list(freed):
+        freed.update(snapshot.block_lessons.get(lesson_id, ()))
+    return incremental, sorted(freed)
 
-        for offering in offerings:
-            subject = offering.subject
-            periods_left = offering.periods_per_week
 
-            teachers = list(subject.teachers.all())
+def place_lessons(snapshot, stdout=None, rng=random, progress=None, assignment=None):
+    """
+    Places every offering of every class in memory.
+
+    Returns a list of (class_id, subject_id, teacher_id, day, slot_id)
+    tuples for the new lessons; nothing is written to the database.
+    Pass a seeded `random.Random` as `rng` for a reproducible run, and a
+    `progress(classes_done, classes_total, periods_placed,
+    periods_requested)` callable to be told after every class. Offerings
+    in `assignment` ({(class_id, subject_id): teacher_id}) use that
+    teacher instead of a random one. Elective blocks are placed first,
+    each in cells free for all of its classes and teachers. Periods a
+    teacher is unavailable are never used.
+    """
+    occupancy = Occupancy(snapshot.slot_ids)
+    occupancy.mark_unavailable(snapshot.teacher_unavailable)
+    offerings = Offerings(snapshot)
+    day_count = defaultdict(int)
+
+    for class_id, subject_id, teacher_id, day, slot_id in snapshot.existing:
+        cell = occupancy.cell(day, slot_id)
+        if cell is not None:
+            occupancy.occupy(cell, teacher_id=teacher_id)
+            for member in offerings.classes_of(class_id, subject_id):
+                occupancy.occupy(cell, class_id=member)
+        day_count[offerings.key(class_id, subject_id) + (day,)] += 1
+
+    placements = []
+    requested = periods_requested(snapshot) if progress else 0
+
+    for block in offerings.blocks:
+        placements += _place_block(block, snapshot, occupancy, day_count, rng, stdout, assignment)
+
+    for classes_done, (class_id, level_id, label) in enumerate(snapshot.classes):
+        if progress:
+            progress(classes_done, len(snapshot.classes), len(placements), requested)
+        if stdout:
+            stdout.write(f"Generating for {label}")
+
+        for subject_id, periods_left in snapshot.offerings_by_level.get(level_id, []):
+            if (class_id, subject_id) in offerings.block_of:
+                continue
+            subject_name = snapshot.subject_names[subject_id]
+
+            teachers = snapshot.subject_teachers.get(subject_id)
             if not teachers:
                 if stdout:
-                    stdout.write(f"No teacher for {subject}")
+                    stdout.write(f"No teacher for {subject_name}")
                 continue
 
-            teacher = random.choice(teachers)
+            teacher_id = (assignment or {}).get((class_id, subject_id)) or rng.choice(teachers)
 
             days_needed = math.ceil(periods_left / MAX_PER_DAY)
-            chosen_days = random.sample(DAYS, k=min(days_needed, len(DAYS)))
+            chosen_days = rng.sample(range(len(DAYS)), k=min(days_needed, len(DAYS)))
 
-            for day in chosen_days:
+            for day_index in chosen_days:
                 if periods_left <= 0:
                     break
 
-                periods_today = min(MAX_PER_DAY, periods_left)
-
-                available_slots = [
-                    slot for slot in time_slots
-                    if (day, slot.id) not in teacher_busy[teacher.id]
-                    and (day, slot.id) not in class_busy[school_class.id]
-                ]
-
-                random.shuffle(available_slots)
-
-                for slot in available_slots:
-                    if periods_today <= 0:
-                        break
-
-                    today_count = LessonInstance.objects.filter(
-                        school_class=school_class,
-                        subject=subject,
-                        day=day,
-                        term=term
-                    ).count()
-
-                    if today_count >= MAX_PER_DAY:
-                        break
-
-                    LessonInstance.objects.create(
-                        school_class=school_class,
-                        subject=subject,
-                        teacher=teacher,
-                        term=term,
-                        day=day,
-                        time_slot=slot
-                    )
+                day = DAYS[day_index]
+                key = (class_id, subject_id, day)
+                periods_today = min(MAX_PER_DAY - day_count[key], periods_left)
+
+                # Free cells for this teacher and class on this day, as one mask.
+                available = occupancy.free_mask(teacher_id, class_id) & occupancy.day_masks[day_index]
 
-                    teacher_busy[teacher.id].add((day, slot.id))
-                    class_busy[school_class.id].add((day, slot.id))
+                while periods_today > 0 and available:
+                    cell = nth_bit(available, rng.randrange(available.bit_count()))
+                    available &= ~(1 << cell)
+
+                    occupancy.occupy(cell, teacher_id=teacher_id, class_id=class_id)
+                    day_count[key] += 1
+                    placements.append(
+                        (class_id, subject_id, teacher_id) + occupancy.cell_key(cell)
+                    )
 
                     periods_left -= 1
                     periods_today -= 1
 
             if periods_left > 0 and stdout:
                 stdout.write(
-                    f"Could not place all periods for {subject} ({periods_left} left)"
+                    f"Could not place all periods for {subject_name} ({periods_left} left)"
+                )
+
+    return placements
+
+
+def _place_block(block, snapshot, occupancy, day_count, rng, stdout=None, assignment=None):
+    """Random placement of one elective block for `place_lessons`."""
+    lead = block.class_ids[0]
+    teacher_of = {}
+    for subject_id, _ in block.subjects:
+        teachers = snapshot.subject_teachers.get(subject_id)
+        if teachers:
+            teacher_of[subject_id] = (assignment or {}).get((lead, subject_id)) or rng.choice(teachers)
+        elif stdout:
+            stdout.write(f"No teacher for {snapshot.subject_names[subject_id]}")
+    block = ElectiveBlock(
+        block.class_ids, [subject for subject in block.subjects if subject[0] in teacher_of]
+    )
+    if not block.subjects:
+        return []
+
+    placements = []
+    for part in block.split(teacher_of):
+        needed = dict(part.subjects)
+        teachers = [teacher_of[subject_id] for subject_id in needed]
+        periods_left = part.periods
+
+        days_needed = math.ceil(periods_left / MAX_PER_DAY)
+        chosen_days = rng.sample(range(len(DAYS)), k=min(days_needed, len(DAYS)))
+        cells = []
+        for day_index in chosen_days:
+            day = DAYS[day_index]
+            used = max(day_count[(lead, subject_id, day)] for subject_id in needed)
+            periods_today = min(MAX_PER_DAY - used, periods_left)
+
+            available = occupancy.full_mask & occupancy.day_masks[day_index]
+            for class_id in part.class_ids:
+                available &= ~occupancy.class_mask(class_id)
+            for teacher_id in teachers:
+                available &= ~occupancy.teacher_mask(teacher_id)
+
+            while periods_today > 0 and available:
+                cell = nth_bit(available, rng.randrange(available.bit_count()))
+                available &= ~(1 << cell)
+                for class_id in part.class_ids:
+                    occupancy.occupy(cell, class_id=class_id)
+                for teacher_id in teachers:
+                    occupancy.occupy(cell, teacher_id=teacher_id)
+                for subject_id in needed:
+                    day_count[(lead, subject_id, day)] += 1
+                cells.append(cell)
+                periods_left -= 1
+                periods_today -= 1
+
+        for class_id, subject_id, teacher_id, cell in part.lessons(cells, needed, teacher_of):
+            placements.append((class_id, subject_id, teacher_id) + occupancy.cell_key(cell))
+        if periods_left > 0 and stdout:
+            names = ", ".join(snapshot.subject_names[subject_id] for subject_id in needed)
+            stdout.write(f"Could not place all periods for the {names} block ({periods_left} left)")
+    return placements
+
+
+class ConstraintSolver:
+    """
+    Deterministic most-constrained-first placement with forward checking.
+
+    Every (class, subject) offering is one variable that needs a number of
+    week cells. Teachers are bound up front from the load-balanced
+    `assign_teachers` stage, so a variable's domain is simply the cells
+    where its class and teacher are both free. An elective block is one
+    variable over all its classes and teachers (see `electives`): each of
+    its cells has to be free for every one of them.
+
+    At each step the variable with the least slack (free capacity minus
+    periods still needed) gets its next period. After every placement the
+    domains of the variables sharing that class or teacher are re-checked,
+    and a placement that leaves one of them unable to finish is undone at
+    once. When a variable's domain is empty the solver first tries a
+    Kempe-chain swap (moving an alternating chain of lessons between two
+    cells to free one for it), then backtracks chronologically until
+    `max_backtracks` is spent. Periods that still cannot be placed are
+    skipped and reported.
+
+    With seed 0 (or None) ties between equally constrained variables and
+    between equally good cells are broken by index. Any other seed breaks
+    them in a seeded random order, so different seeds explore different
+    timetables.
+    """
+
+    def __init__(self, snapshot, max_backtracks=MAX_BACKTRACKS, stdout=None, seed=None,
+                 progress=None, assignment=None):
+        self.snapshot = snapshot
+        self.assignment = assignment if assignment is not None else assign_teachers(snapshot)
+        self.max_backtracks = max_backtracks
+        self.stdout = stdout
+        self.progress = progress
+        self.occupancy = Occupancy(snapshot.slot_ids)
+
+        self.cell_rank = list(range(self.occupancy.n_cells))
+        self.rng = random.Random(seed) if seed else None
+        if self.rng:
+            self.rng.shuffle(self.cell_rank)
+
+        # Per variable: the classes and teachers it keeps busy (one of each
+        # for an ordinary offering), its subject, and for an elective block
+        # (block, {subject_id: periods needed}, {subject_id: teacher_id}).
+        self.classes = []
+        self.teachers = []
+        self.subject_ids = []
+        self.blocks = []
+        self.remaining = []
+        self.day_count = []
+        self.capacity = []
+        self.by_class = defaultdict(list)
+        self.by_teacher = defaultdict(list)
+        self.open = set()
+        self.block_skips = defaultdict(int)
+
+        # Periods still owed by each class and by each teacher.
+        self.class_demand = defaultdict(int)
+        self.teacher_demand = defaultdict(int)
+
+        # Lesson held by a class or teacher in a cell: the search frame
+        # that placed it, or FIXED for lessons that were already stored.
+        self.class_cell = {}
+        self.teacher_cell = {}
+
+        self.periods_requested = 0
+        self.unplaced = defaultdict(int)
+        self.stats = {"nodes": 0, "backtracks": 0, "repairs": 0, "skipped": 0}
+
+        self._build()
+
+    FIXED = "fixed"
+
+    # -----------------------------
+    # Setup
+    # -----------------------------
+
+    def _build(self):
+        snapshot = self.snapshot
+        occupancy = self.occupancy
+        offerings = Offerings(snapshot)
+        day_counts = defaultdict(lambda: [0] * len(DAYS))
+        existing_periods = defaultdict(int)
+
+        # A teacher's unavailable periods are busy cells from the start, so
+        # domains, capacities and repairs all leave them alone.
+        occupancy.mark_unavailable(snapshot.teacher_unavailable)
+        self.unavailable = snapshot.teacher_unavailable
+
+        for class_id, subject_id, teacher_id, day, slot_id in snapshot.existing:
+            key = offerings.key(class_id, subject_id)
+            cell = occupancy.cell(day, slot_id)
+            if cell is not None:
+                occupancy.occupy(cell, teacher_id=teacher_id)
+                self.teacher_cell[(teacher_id, cell)] = self.FIXED
+                # A stored block lesson keeps the cell for every class of the block.
+                for member in offerings.classes_of(class_id, subject_id):
+                    occupancy.occupy(cell, class_id=member)
+                    self.class_cell[(member, cell)] = self.FIXED
+            if day in occupancy.day_index:
+                day_counts[key][occupancy.day_index[day]] += 1
+            existing_periods[key] += 1
+
+        needed = {}
+        for key, periods in offerings.periods.items():
+            need = periods - existing_periods[key]
+            if need <= 0:
+                continue
+            self.periods_requested += need
+            if self.assignment.get(key) is None:
+                if self.stdout:
+                    self.stdout.write(f"No teacher for {snapshot.subject_names[key[1]]}")
+                self.unplaced[key] += need
+                continue
+            needed[key] = need
+
+        for block in offerings.blocks:
+            lead = block.class_ids[0]
+            block_needed = {
+                subject_id: needed[(lead, subject_id)]
+                for subject_id, _ in block.subjects if (lead, subject_id) in needed
+            }
+            if not block_needed:
+                continue
+            teacher_of = {subject_id: self.assignment[(lead, subject_id)] for subject_id in block_needed}
+            block = ElectiveBlock(
+                block.class_ids,
+                [subject for subject in block.subjects if subject[0] in block_needed],
+            )
+            for part in block.split(teacher_of):
+                subject_ids = [subject_id for subject_id, _ in part.subjects]
+                self._add_variable(
+                    part.class_ids,
+                    tuple(teacher_of[subject_id] for subject_id in subject_ids),
+                    None,
+                    max(block_needed[subject_id] for subject_id in subject_ids),
+                    [
+                        max(day_counts[(lead, subject_id)][day] for subject_id in subject_ids)
+                        for day in range(len(DAYS))
+                    ],
+                    block=(part, block_needed, teacher_of),
+                )
+
+        # Blocks go first, so they win ties on slack: a block cell has to be
+        # free for every class of the level at once.
+        for key, need in needed.items():
+            if key not in offerings.block_keys:
+                self._add_variable(
+                    (key[0],), (self.assignment[key],), key[1], need, day_counts[key]
+                )
+
+        self.var_rank = list(range(len(self.classes)))
+        if self.rng:
+            self.rng.shuffle(self.var_rank)
+
+        for r in range(len(self.classes)):
+            for class_id in self.classes[r]:
+                self.by_class[class_id].append(r)
+                self.class_demand[class_id] += self.remaining[r]
+            for teacher_id in self.teachers[r]:
+                self.by_teacher[teacher_id].append(r)
+                self.teacher_demand[teacher_id] += self.remaining[r]
+            self.open.add(r)
+
+        for r in self.open:
+            self.capacity[r] = self._capacity(r)
+
+    def _add_variable(self, classes, teachers, subject_id, needed, day_count, block=None):
+        self.classes.append(classes)
+        self.teachers.append(teachers)
+        self.subject_ids.append(subject_id)
+        self.blocks.append(block)
+        self.remaining.append(needed)
+        self.day_count.append(list(day_count))
+        self.capacity.append(0)
+
+    # -----------------------------
+    # Domains
+    # -----------------------------
+
+    def _busy(self, r):
+        """Cells where any class or teacher of `r` is busy."""
+        occupancy = self.occupancy
+        busy = 0
+        for class_id in self.classes[r]:
+            busy |= occupancy.classes.get(class_id, 0)
+        for teacher_id in self.teachers[r]:
+            busy |= occupancy.teachers.get(teacher_id, 0)
+        return busy
+
+    def _allowed(self, r):
+        """Cells on days where `r` is still under MAX_PER_DAY."""
+        counts = self.day_count[r]
+        allowed = 0
+        for day_index, day_mask in enumerate(self.occupancy.day_masks):
+            if counts[day_index] < MAX_PER_DAY:
+                allowed |= day_mask
+        return allowed
+
+    def _capacity(self, r):
+        """Most periods `r` could still get given its classes and teachers."""
+        occupancy = self.occupancy
+        remaining = self.remaining[r]
+        n_cells = occupancy.n_cells
+
+        # Cells a class or teacher still owes to other variables are not really free.
+        busy = 0
+        spare = n_cells
+        for class_id in self.classes[r]:
+            mask = occupancy.classes.get(class_id, 0)
+            busy |= mask
+            owed = self.class_demand[class_id] - remaining
+            spare = min(spare, n_cells - mask.bit_count() - owed)
+        for teacher_id in self.teachers[r]:
+            mask = occupancy.teachers.get(teacher_id, 0)
+            busy |= mask
+            owed = self.teacher_demand[teacher_id] - remaining
+            spare = min(spare, n_cells - mask.bit_count() - owed)
+
+        free = occupancy.full_mask & ~busy
+        capacity = 0
+        for day_mask, count in zip(occupancy.day_masks, self.day_count[r]):
+            if count < MAX_PER_DAY:
+                cells = (free & day_mask).bit_count()
+                room = MAX_PER_DAY - count
+                capacity += room if cells > room else cells
+        return min(capacity, spare)
+
+    def _refresh(self, r):
+        """
+        Re-checks every open variable sharing a class or teacher with `r`.
+
+        Returns False if one of them could finish before and no longer can.
+        """
+        consistent = True
+        capacity, remaining, open_ = self.capacity, self.remaining, self.open
+        neighbourhoods = [self.by_class[class_id] for class_id in self.classes[r]]
+        neighbourhoods += [self.by_teacher[teacher_id] for teacher_id in self.teachers[r]]
+        for neighbours in neighbourhoods:
+            for other in neighbours:
+                if other in open_:
+                    before = capacity[other]
+                    capacity[other] = self._capacity(other)
+                    if capacity[other] < remaining[other] <= before:
+                        consistent = False
+        return consistent
+
+    def _select(self):
+        best = None
+        best_key = None
+        for r in self.open:
+            key = (self.capacity[r] - self.remaining[r], self.var_rank[r])
+            if best_key is None or key < best_key:
+                best, best_key = r, key
+        return best
+
+    def _values(self, r):
+        """Free cells for `r`, days it has the fewest lessons on first."""
+        counts = self.day_count[r]
+        n_slots = self.occupancy.n_slots
+        free = self.occupancy.full_mask & ~self._busy(r) & self._allowed(r)
+        rank = self.cell_rank
+        return sorted(iter_bits(free), key=lambda cell: (counts[cell // n_slots], rank[cell]))
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+
+    def _place(self, frame, cell):
+        r = frame[0]
+        occupancy = self.occupancy
+        for class_id in self.classes[r]:
+            occupancy.occupy(cell, class_id=class_id)
+            self.class_cell[(class_id, cell)] = frame
+        for teacher_id in self.teachers[r]:
+            occupancy.occupy(cell, teacher_id=teacher_id)
+            self.teacher_cell[(teacher_id, cell)] = frame
+        self.day_count[r][occupancy.day_of(cell)] += 1
+        frame[3] = cell
+
+    def _lift(self, frame):
+        r, cell = frame[0], frame[3]
+        occupancy = self.occupancy
+        for class_id in self.classes[r]:
+            occupancy.release(cell, class_id=class_id)
+            del self.class_cell[(class_id, cell)]
+        for teacher_id in self.teachers[r]:
+            occupancy.release(cell, teacher_id=teacher_id)
+            del self.teacher_cell[(teacher_id, cell)]
+        self.day_count[r][occupancy.day_of(cell)] -= 1
+        frame[3] = None
+
+    def _owe(self, r, change):
+        """Adds `change` to the periods owed by every class and teacher of `r`."""
+        for class_id in self.classes[r]:
+            self.class_demand[class_id] += change
+        for teacher_id in self.teachers[r]:
+            self.teacher_demand[teacher_id] += change
+
+    def _assign(self, frame, cell):
+        r = frame[0]
+        self._place(frame, cell)
+        self.remaining[r] -= 1
+        self._owe(r, -1)
+        if not self.remaining[r]:
+            self.open.discard(r)
+        self.stats["nodes"] += 1
+        return self._refresh(r)
+
+    def _unassign(self, frame):
+        r = frame[0]
+        self._lift(frame)
+        self.remaining[r] += 1
+        self._owe(r, 1)
+        self.open.add(r)
+        self._refresh(r)
+
+    def _advance(self, frame, check=True):
+        """
+        Moves `frame` to its next cell that is still free and, when `check`
+        is set, passes forward checking. False when its cells run out.
+        """
+        r, cells = frame[0], frame[1]
+        occupancy = self.occupancy
+        while frame[2] < len(cells):
+            cell = cells[frame[2]]
+            frame[2] += 1
+            if (self._busy(r) >> cell) & 1:
+                continue
+            if self.day_count[r][occupancy.day_of(cell)] >= MAX_PER_DAY:
+                continue
+            if self._assign(frame, cell) or not check:
+                return True
+            self._unassign(frame)
+        return False
+
+    def _kempe_chain(self, teacher_id, a, b):
+        """
+        Frames on the path that starts at the teacher's lesson in cell `a`
+        and alternates between cells `a` and `b` (teacher, class, teacher,
+        ...). None if the path runs into a stored lesson or an elective
+        block, which cannot move one class at a time, or would move a
+        lesson into a period its teacher is unavailable.
+        """
+        path = []
+        holder, by_teacher, cell = teacher_id, True, a
+        while True:
+            frame = (self.teacher_cell if by_teacher else self.class_cell).get((holder, cell))
+            if frame is None:
+                return path
+            if frame is self.FIXED or self.blocks[frame[0]] is not None:
+                return None
+            r = frame[0]
+            other = b if cell == a else a
+            if (self.unavailable.get(self.teachers[r][0], 0) >> other) & 1:
+                return None
+            path.append(frame)
+            holder = self.classes[r][0] if by_teacher else self.teachers[r][0]
+            by_teacher = not by_teacher
+            cell = other
+
+    def _repair(self, frame):
+        """
+        Frees a cell for `frame`'s variable by swapping a Kempe chain.
+
+        The variable's class is free in some cell `a` its teacher is busy
+        in, and the teacher is free in some cell `b`; swapping `a` and `b`
+        along the teacher's alternating chain frees the teacher in `a`
+        without touching the class (the graph is bipartite). Elective
+        blocks are not repaired.
+        """
+        r = frame[0]
+        if self.blocks[r] is not None:
+            return False
+        occupancy = self.occupancy
+        class_id = self.classes[r][0]
+        teacher_id = self.teachers[r][0]
+
+        class_free = occupancy.full_mask & ~occupancy.class_mask(class_id) & self._allowed(r)
+        teacher_free = occupancy.full_mask & ~occupancy.teacher_mask(teacher_id)
+        n_slots = occupancy.n_slots
+
+        # Same-day swaps never change per-day counts, so try them first.
+        pairs = sorted(
+            ((a, b) for a in iter_bits(class_free) for b in iter_bits(teacher_free)),
+            key=lambda pair: (pair[0] // n_slots != pair[1] // n_slots, pair),
+        )
+        for a, b in pairs:
+            path = self._kempe_chain(teacher_id, a, b)
+            if not path or not self._swap(path, a, b):
+                continue
+            self.stats["repairs"] += 1
+            frame[1], frame[2] = [a], 0
+            return self._advance(frame, check=False)
+        return False
+
+    def _swap(self, path, a, b):
+        """Moves every lesson on `path` between cells `a` and `b` if day limits allow."""
+        day_a, day_b = self.occupancy.day_of(a), self.occupancy.day_of(b)
+        if day_a != day_b:
+            delta = defaultdict(int)
+            for frame in path:
+                moved_to_b = frame[3] == a
+                delta[(frame[0], day_b)] += 1 if moved_to_b else -1
+                delta[(frame[0], day_a)] += -1 if moved_to_b else 1
+            for (r, day_index), change in delta.items():
+                if self.day_count[r][day_index] + change > MAX_PER_DAY:
+                    return False
+
+        targets = [b if frame[3] == a else a for frame in path]
+        for frame in path:
+            self._lift(frame)
+        for frame, cell in zip(path, targets):
+            self._place(frame, cell)
+        return True
+
+    def _skip(self, r):
+        self.remaining[r] -= 1
+        self._owe(r, -1)
+        self.stats["skipped"] += 1
+        if not self.remaining[r]:
+            self.open.discard(r)
+
+        if self.blocks[r] is None:
+            self.unplaced[(self.classes[r][0], self.subject_ids[r])] += 1
+            return
+        # A block cell given up costs a period of every subject that needed
+        # more cells than the block can still get.
+        block, needed, _ = self.blocks[r]
+        self.block_skips[r] += 1
+        cells_left = max(needed[subject_id] for subject_id, _ in block.subjects) - self.block_skips[r]
+        for subject_id, _ in block.subjects:
+            if needed[subject_id] > cells_left:
+                self.unplaced[(block.class_ids[0], subject_id)] += 1
+
+    def _report_progress(self, placed):
+        classes = self.snapshot.classes
+        done = sum(1 for class_id, _, _ in classes if not self.class_demand[class_id])
+        self.progress(done, len(classes), placed, self.periods_requested)
+
+    def solve(self):
+        started = time.perf_counter()
+        stack = []
+        steps = 0
+
+        while True:
+            r = self._select()
+            if r is None:
+                break
+
+            steps += 1
+            if self.progress and steps % PROGRESS_EVERY == 0:
+                self._report_progress(len(stack))
+
+            # frame: [variable, candidate cells, next cell index, current cell]
+            frame = [r, self._values(r), 0, None]
+            searching = self.stats["backtracks"] < self.max_backtracks
+            if self._advance(frame, check=searching):
+                stack.append(frame)
+                continue
+
+            if not frame[1] and self._repair(frame):
+                stack.append(frame)
+                continue
+
+            # Dead end: revise earlier choices while the budget lasts, then
+            # settle for any free cell, then give the period up.
+            placed = False
+            while stack and self.stats["backtracks"] < self.max_backtracks:
+                self.stats["backtracks"] += 1
+                top = stack[-1]
+                self._unassign(top)
+                if self._advance(top):
+                    placed = True
+                    break
+                stack.pop()
+
+            if not placed:
+                frame[2] = 0
+                if self._advance(frame, check=False):
+                    stack.append(frame)
+                else:
+                    self._skip(r)
+
+        cell_key = self.occupancy.cell_key
+        placements = []
+        block_cells = defaultdict(list)
+        for r, _, _, cell in stack:
+            if self.blocks[r] is None:
+                placements.append(
+                    (self.classes[r][0], self.subject_ids[r], self.teachers[r][0]) + cell_key(cell)
+                )
+            else:
+                block_cells[r].append(cell)
+        for r, cells in block_cells.items():
+            block, needed, teacher_of = self.blocks[r]
+            for class_id, subject_id, teacher_id, cell in block.lessons(cells, needed, teacher_of):
+                placements.append((class_id, subject_id, teacher_id) + cell_key(cell))
+
+        self.stats["elapsed"] = round(time.perf_counter() - started, 3)
+        return GenerationResult(placements, self.periods_requested, dict(self.stats))
+
+
+def solve_lessons(snapshot, stdout=None, max_backtracks=MAX_BACKTRACKS, seed=None, progress=None,
+                  assignment=None):
+    """
+    Places lessons with `ConstraintSolver`.
+
+    Unlike `place_lessons` the run is deterministic for a given seed, and
+    periods already stored for a (class, subject) pair count towards its
+    weekly total.
+    """
+    solver = ConstraintSolver(
+        snapshot, max_backtracks=max_backtracks, stdout=stdout, seed=seed, progress=progress,
+        assignment=assignment,
+    )
+    result = solver.solve()
+
+    if stdout:
+        labels = {class_id: label for class_id, _, label in snapshot.classes}
+        for (class_id, subject_id), left in solver.unplaced.items():
+            if left:
+                stdout.write(
+                    f"Could not place all periods for {snapshot.subject_names[subject_id]} "
+                    f"in {labels[class_id]} ({left} left)"
+                )
+
+    return result
+
+
+def periods_requested(snapshot):
+    """Total periods the offerings of every class ask for, each block subject once."""
+    return sum(Offerings(snapshot).periods.values())
+
+
+def save_placements(term, lessons, clear_existing=False, school=None, freed_ids=(),
+                    rooms=None):
+    """
+    Writes generated lessons as a diff against the stored rows, in a
+    single transaction.
+
+    `lessons` are the rows to store, (class_id, subject_id, teacher_id,
+    day, slot_id, elective_group) as `Offerings.stored_lessons` gives
+    them. The rows being replaced are the whole scope's lessons when
+    `clear_existing` is set (only `school`'s with `school`), or else the
+    `freed_ids` an incremental run gave up. Both sides are keyed by
+    (class, day, slot), a cell each class has at most one lesson in, or
+    one per subject of the elective block held in it, and only the
+    difference is written (see `diff_lessons`): a stored lesson that
+    stays the same is not touched, one that changes subject, teacher or
+    room is updated in place, and the rest are deleted or inserted.
+    `rooms` ({(teacher_id, day, slot_id): room_id}) gives the lessons
+    their rooms. Readers see the old timetable until the transaction
+    commits.
+
+    Returns:
+        dict: {"inserted": n, "updated": n, "deleted": n}
+    """
+    with transaction.atomic():
+        stored = LessonInstance.objects.filter(term=term)
+        if clear_existing:
+            if school is not None:
+                stored = stored.filter(school_class__school=school)
+        elif freed_ids:
+            stored = stored.filter(id__in=freed_ids)
+        else:
+            stored = stored.none()
+
+        rows = stored.values_list(
+            "id", "school_class_id", "subject_id", "teacher_id", "day", "time_slot_id", "room_id",
+            "elective_group",
+        )
+        rooms = rooms or {}
+        inserts, updates, deletes = diff_lessons(rows, lessons, rooms)
+
+        if deletes:
+            with bulk_lesson_writes():
+                LessonInstance.objects.filter(id__in=deletes).delete()
+        LessonInstance.objects.bulk_update(
+            [
+                LessonInstance(
+                    id=lesson_id, subject_id=subject_id, teacher_id=teacher_id, room_id=room_id
                 )
+                for lesson_id, subject_id, teacher_id, room_id in updates
+            ],
+            ["subject", "teacher", "room"],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        LessonInstance.objects.bulk_create(
+            [
+                LessonInstance(
+                    school_class_id=class_id,
+                    subject_id=subject_id,
+                    teacher_id=teacher_id,
+                    term=term,
+                    day=day,
+                    time_slot_id=slot_id,
+                    room_id=rooms.get((teacher_id, day, slot_id)),
+                    elective_group=group,
+                )
+                for class_id, subject_id, teacher_id, day, slot_id, group in inserts
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+
+    return {"inserted": len(inserts), "updated": len(updates), "deleted": len(deletes)}
+
+
+def _lesson_key(class_id, subject_id, day, slot_id, group):
+    """A class has one lesson per cell, or one per subject of the elective block held in it."""
+    if group:
+        return (class_id, day, slot_id, subject_id)
+    return (class_id, day, slot_id)
+
+
+def diff_lessons(stored, lessons, rooms=None):
+    """
+    Works out the writes that turn the `stored` rows into `lessons`.
+
+    Args:
+        stored: (id, class_id, subject_id, teacher_id, day, slot_id,
+            room_id, elective_group) rows
+        lessons: (class_id, subject_id, teacher_id, day, slot_id,
+            elective_group) tuples
+        rooms (dict): {(teacher_id, day, slot_id): room_id} of the lessons
+
+    Returns:
+        tuple: ([lesson to insert], [(id, subject_id, teacher_id,
+        room_id) to update], [id to delete]), meant to be applied in the
+        order deletes, updates, inserts
+
+    An update whose new (teacher, day, slot) or (room, day, slot) is
+    still held by another surviving stored row would break a unique
+    constraint halfway through (two teachers swapping classes in one
+    slot, say), so it is turned into a delete and an insert instead.
+    Block lessons repeat their teacher and room on purpose and are left
+    out of those constraints, so they never need it.
+    """
+    rooms = rooms or {}
+    wanted = {}
+    for lesson in lessons:
+        class_id, subject_id, _, day, slot_id, group = lesson
+        wanted[_lesson_key(class_id, subject_id, day, slot_id, group)] = lesson
+
+    deletes = []
+    changed = []
+    matched = set()
+    for lesson_id, class_id, subject_id, teacher_id, day, slot_id, room_id, group in stored:
+        key = _lesson_key(class_id, subject_id, day, slot_id, group)
+        lesson = wanted.get(key)
+        if lesson is None or key in matched:
+            deletes.append(lesson_id)
+            continue
+        matched.add(key)
+        if lesson[1:3] != (subject_id, teacher_id) or rooms.get(lesson[2:5]) != room_id:
+            changed.append((lesson_id, teacher_id, room_id, lesson))
+
+    ordinary = [change for change in changed if not change[3][5]]
+    held = {(teacher_id, lesson[3], lesson[4]) for _, teacher_id, _, lesson in ordinary}
+    held_rooms = {
+        (room_id, lesson[3], lesson[4])
+        for _, _, room_id, lesson in ordinary if room_id is not None
+    }
+    updates = []
+    inserts = [lesson for key, lesson in wanted.items() if key not in matched]
+    for lesson_id, old_teacher_id, old_room_id, lesson in changed:
+        _, subject_id, teacher_id, day, slot_id, group = lesson
+        room_id = rooms.get((teacher_id, day, slot_id))
+        if not group and (
+            (teacher_id != old_teacher_id and (teacher_id, day, slot_id) in held)
+            or (room_id != old_room_id and (room_id, day, slot_id) in held_rooms)
+        ):
+            deletes.append(lesson_id)
+            inserts.append(lesson)
+        else:
+            updates.append((lesson_id, subject_id, teacher_id, room_id))
+
+    return inserts, updates, deletes
+
+
+def save_assignment(snapshot, result):
+    """
+    Stores the teacher of every (class, subject) of the snapshot's classes
+    as a Lesson, replacing those classes' previous assignment.
+
+    Results reused from the cache only keep their placements, so for them
+    the assignment is read back from the lessons.
+    """
+    assignment = dict(result.assignment)
+    if not assignment:
+        for class_id, subject_id, teacher_id, _, _ in snapshot.existing + list(result.placements):
+            assignment[(class_id, subject_id)] = teacher_id
+
+    class_ids = [class_id for class_id, _, _ in snapshot.classes]
+    Lesson.objects.filter(school_class_id__in=class_ids).delete()
+    Lesson.objects.bulk_create(
+        [
+            Lesson(school_class_id=class_id, subject_id=subject_id, teacher_id=teacher_id)
+            for (class_id, subject_id), teacher_id in sorted(assignment.items())
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+
+def clone_term(source, target, school=None, clear_existing=False):
+    """
+    Copies the timetable of `source` into `target` as it is.
+
+    The copy is one set-based INSERT ... SELECT, so no lesson passes
+    through Python however large the timetable is. With `school` only
+    that school's lessons are copied (and cleared).
+
+    Args:
+        source (AcademicTerm): Term to copy from
+        target (AcademicTerm): Term to copy into
+        school (School): Optional school to limit the copy to
+        clear_existing (bool): Delete `target`'s lessons first; otherwise
+            `target` must have none
+
+    Returns:
+        int: number of lessons copied
+    """
+    if source.pk == target.pk:
+        raise ValueError("A term cannot be cloned into itself")
+
+    meta = LessonInstance._meta
+    quote = connection.ops.quote_name
+    columns = ", ".join(
+        quote(meta.get_field(name).column)
+        for name in ("school_class", "subject", "teacher", "day", "time_slot", "room", "elective_group")
+    )
+    table = quote(meta.db_table)
+    term_column = quote(meta.get_field("term").column)
+
+    sql = (
+        f"INSERT INTO {table} ({columns}, {term_column}) "
+        f"SELECT {columns}, %s FROM {table} WHERE {term_column} = %s"
+    )
+    params = [target.pk, source.pk]
+    if school is not None:
+        sql += (
+            f" AND {quote(meta.get_field('school_class').column)} IN "
+            f"(SELECT {quote('id')} FROM {quote(SchoolClass._meta.db_table)} "
+            f"WHERE {quote(SchoolClass._meta.get_field('school').column)} = %s)"
+        )
+        params.append(getattr(school, "pk", school))
+
+    with transaction.atomic():
+        stale = LessonInstance.objects.filter(term=target)
+        if school is not None:
+            stale = stale.filter(school_class__school=school)
+        if clear_existing:
+            with bulk_lesson_writes():
+                stale.delete()
+        elif stale.exists():
+            raise ValueError(f"{target} already has lessons; clear them to clone {source}")
+        lessons_changed(target, school)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+
+def run_generation(snapshot, mode="solver", budget=None, seed=None, stdout=None, progress=None):
+    """
+    Runs one complete in-memory generation on `snapshot`: the teacher
+    assignment stage, then slot placement, then the optional local search.
+
+    Never touches the database, so it can run in a worker process.
+    """
+    started = time.perf_counter()
+    assignment = assign_teachers(snapshot)
+    assignment_elapsed = round(time.perf_counter() - started, 3)
+
+    if mode == "solver":
+        result = solve_lessons(
+            snapshot, stdout=stdout, seed=seed, progress=progress, assignment=assignment
+        )
+    else:
+        started = time.perf_counter()
+        placements = place_lessons(
+            snapshot, stdout=stdout, rng=random.Random(seed), progress=progress,
+            assignment=assignment,
+        )
+        result = GenerationResult(
+            placements,
+            periods_requested(snapshot),
+            {"elapsed": round(time.perf_counter() - started, 3)},
+        )
+    result.assignment = assignment
+
+    if budget:
+        placements, stats = improve_timetable(snapshot, result, budget, MAX_PER_DAY, seed=seed)
+        result = GenerationResult(placements, result.periods_requested, stats)
+        result.assignment = assignment
+
+    result.stats["assignment_elapsed"] = assignment_elapsed
+
+    result.stats["seed"] = seed
+    score = score_timetable(
+        snapshot.slot_ids, snapshot.existing + list(result.placements), MAX_PER_DAY
+    )
+    result.stats["gaps"] = score.components["gaps"]
+    result.stats["score"] = score.total
+    return result
+
+
+def best_result(results):
+    """Highest placement rate first, then the lowest quality score (see `scoring`)."""
+    return max(results, key=lambda result: (result.placement_rate, -result.stats["score"]))
+
+
+def run_multi_start(snapshot, seeds, workers=1, mode="solver", budget=None, stdout=None):
+    """
+    Runs one generation per seed, across `workers` processes, and returns
+    every result in seed order.
+
+    Workers only receive the snapshot, so they never open a database
+    connection; the parent's connections are closed before the pool starts
+    so none is shared with a forked child.
+    """
+    if workers <= 1:
+        results = [run_generation(snapshot, mode, budget, seed) for seed in seeds]
+    else:
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            futures = [pool.submit(run_generation, snapshot, mode, budget, seed) for seed in seeds]
+            results = [future.result() for future in futures]
+
+    if stdout:
+        for result in results:
+            stdout.write(
+                f"Seed {result.stats['seed']}: {result.periods_placed}/{result.periods_requested} "
+                f"periods, score {result.stats['score']} ({result.stats['gaps']} teacher gaps)"
+            )
+    return results
+
+
+def run_best(snapshot, mode="solver", budget=None, seeds=1, workers=1, stdout=None, seed=0,
+             progress=None):
+    """
+    Runs `seeds` generations on `snapshot`, seeded `seed`, `seed + 1`, ...,
+    and returns the best.
+
+    A single seed runs in-process; it is also what each worker runs when
+    schools are generated in parallel. Only a single-seed run reports
+    `progress`.
+    """
+    if seeds > 1:
+        results = run_multi_start(
+            snapshot, range(seed, seed + seeds), workers=workers, mode=mode, budget=budget,
+            stdout=stdout,
+        )
+        return best_result(results)
+    return run_generation(snapshot, mode, budget, seed=seed, stdout=stdout, progress=progress)
+
+
+def run_incremental(snapshot, mode="solver", budget=None, seeds=1, workers=1, stdout=None, seed=0,
+                    progress=None):
+    """
+    Re-places only what changed since the stored timetable was generated.
+
+    The first round frees just the lessons `incremental_snapshot` finds
+    stale. If the missing periods do not fit around the kept lessons, the
+    run is widened to every lesson of the classes left short, and then to
+    the whole snapshot; the first round that places everything (or the
+    one that leaves the fewest periods out) is returned, with the ids of
+    the stored lessons it replaces in `freed_ids`.
+    """
+    best = None
+    all_classes = {class_id for class_id, _, _ in snapshot.classes}
+    free_classes = set()
+    while True:
+        round_snapshot, freed_ids = incremental_snapshot(snapshot, free_classes)
+        result = run_best(round_snapshot, mode, budget, seeds, workers, stdout, seed, progress)
+        result.freed_ids = freed_ids
+        result.stats["freed"] = len(freed_ids)
+
+        shortfall = result.periods_requested - result.periods_placed
+        if best is None or shortfall < best.periods_requested - best.periods_placed:
+            best = result
+        if not shortfall or free_classes == all_classes:
+            return best
+
+        short = _short_classes(round_snapshot, result)
+        free_classes = free_classes | short if short - free_classes else all_classes
+        if stdout:
+            stdout.write(f"{shortfall} periods did not fit; freeing {len(free_classes)} classes")
+
+
+def _short_classes(snapshot, result):
+    """Classes that still have fewer lessons than their offerings (or blocks) ask for."""
+    offerings = Offerings(snapshot)
+    have = defaultdict(int)
+    for class_id, subject_id, *_ in snapshot.existing:
+        have[offerings.key(class_id, subject_id)] += 1
+    for class_id, subject_id, *_ in result.placements:
+        have[offerings.key(class_id, subject_id)] += 1
+    return {
+        class_id
+        for key, periods in offerings.periods.items()
+        if have[key] < periods
+        for class_id in offerings.classes[key]
+    }
+
+
+def carry_over(snapshot, result):
+    """
+    Turns the result of a warm-started run into the full timetable of the
+    new term.
+
+    The snapshot's stored lessons belong to the source term, so the ones
+    the run kept are copied in as placements and nothing is freed.
+    """
+    freed = set(result.freed_ids)
+    kept = [
+        row for lesson_id, row in zip(snapshot.existing_ids, snapshot.existing)
+        if lesson_id not in freed
+    ]
+    carried = GenerationResult(
+        kept + list(result.placements),
+        result.periods_requested + len(kept),
+        dict(result.stats, kept=len(kept)),
+    )
+    carried.assignment = result.assignment
+    return carried
+
+
+def final_timetable(snapshot, result):
+    """
+    The whole timetable of the snapshot's scope once `result` is saved:
+    the stored lessons it keeps plus its placements.
+    """
+    freed = set(result.freed_ids)
+    kept = [
+        row for lesson_id, row in zip(snapshot.existing_ids, snapshot.existing)
+        if lesson_id not in freed
+    ]
+    return kept + list(result.placements)
+
+
+def assign_rooms(snapshot, result):
+    """
+    Allocates rooms to `result`'s placements, school by school, around
+    the rooms held by the stored lessons it keeps (see
+    `rooms.allocate_rooms`), into `result.rooms`.
+
+    Runs after time placement on every result about to be saved, cached
+    ones included: it is a few small matchings, so it is cheaper to
+    redo than to store. Stored lessons keep whatever room they have.
+    """
+    if not snapshot.subject_rooms:
+        return result
+    started = time.perf_counter()
+    schools = snapshot.class_schools
+    freed = set(result.freed_ids)
+    taken = defaultdict(list)
+    for lesson_id, row in zip(snapshot.existing_ids, snapshot.existing):
+        if lesson_id not in freed and lesson_id in snapshot.lesson_rooms:
+            taken[schools.get(row[0])].append((row[3:5], snapshot.lesson_rooms[lesson_id]))
+    placements = defaultdict(list)
+    for placement in result.placements:
+        placements[schools.get(placement[0])].append(placement)
+
+    result.rooms = {}
+    missing = 0
+    for school_id, school_placements in placements.items():
+        allocated, unmatched = allocate_rooms(
+            school_placements, snapshot.rooms.get(school_id, []), snapshot.subject_rooms,
+            snapshot.class_sizes, taken[school_id],
+        )
+        result.rooms.update(allocated)
+        missing += len(unmatched)
+    result.stats["rooms"] = len(result.rooms)
+    result.stats["rooms_missing"] = missing
+    result.stats["rooms_elapsed"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _without_existing(snapshot):
+    """Copy of `snapshot` with no stored lessons, for writing a warm-started result."""
+    fresh = copy.copy(snapshot)
+    fresh.existing = []
+    fresh.existing_ids = []
+    fresh.lesson_rooms = {}
+    return fresh
+
+
+def _has_lessons(term, school=None):
+    lessons = LessonInstance.objects.filter(term=term)
+    if school is not None:
+        lessons = lessons.filter(school_class__school=school)
+    return lessons.exists()
+
+
+def latest_term():
+    term = AcademicTerm.objects.order_by("-year", "-term").first()
+    if not term:
+        raise ValueError("No AcademicTerm found")
+    return term
+
+
+def _check_options(mode, clear_existing, incremental, warm_start=None, term=None):
+    if mode not in GENERATION_MODES:
+        raise ValueError(f"Unknown generation mode: {mode}")
+    if incremental and clear_existing:
+        raise ValueError("An incremental run cannot also clear the existing timetable")
+    if incremental and mode != "solver":
+        raise ValueError("Incremental generation needs the solver mode")
+    if warm_start and incremental:
+        raise ValueError("A warm-started run cannot also be incremental")
+    if warm_start and mode != "solver":
+        raise ValueError("Warm-started generation needs the solver mode")
+    if warm_start and term and warm_start.pk == term.pk:
+        raise ValueError("A term cannot be warm-started from itself")
+
+
+def _report(result, stdout, label=None):
+    prefix = f"{label}: " if label else ""
+    stdout.write(
+        f"{prefix}Placed {result.periods_placed}/{result.periods_requested} periods "
+        f"({result.placement_rate:.1%})"
+    )
+    if result.stats:
+        stdout.write(
+            prefix + "Search: " + ", ".join(f"{key}={value}" for key, value in result.stats.items())
+        )
+    if result.writes:
+        stdout.write(
+            prefix + "Saved: " + ", ".join(f"{key}={value}" for key, value in result.writes.items())
+        )
+
+
+def generate_timetable(term=None, clear_existing=False, stdout=None, mode="greedy",
+                       budget=None, seeds=1, workers=1, school=None, incremental=False,
+                       seed=0, use_cache=True, progress=None, preflight=False, warm_start=None):
+    """
+    Generates timetable LessonInstances.
+
+    All inputs are loaded up front, placement runs in memory and the
+    result is written with one bulk insert, so the number of queries does
+    not grow with the number of lessons placed.
+
+    Args:
+        term (AcademicTerm): Term to generate for
+        clear_existing (bool): Whether to delete existing timetable
+        stdout: Optional command stdout for logging
+        mode (str): "solver" for the deterministic constraint solver,
+            "greedy" (the default, as before the solver existed) for the
+            original random placement; the command and generation jobs
+            default to "solver"
+        budget (float): Optional seconds of local search after placement,
+            to repair unplaced periods and reduce teacher gaps
+        seeds (int): Number of independently seeded generations to run;
+            the best one is kept
+        workers (int): Processes to spread the seeded generations over
+        school (School): Only generate (and clear) this school's timetable;
+            every school is generated together when omitted
+        incremental (bool): Keep stored lessons that still match the
+            current offerings and teachers, free the rest and only place
+            what is missing (see `run_incremental`)
+        seed (int): Seed of the run (the first of the multi-start seeds);
+            the same inputs and seed always give the same timetable, as
+            long as no `budget` is set
+        use_cache (bool): Reuse the stored result of an earlier run with
+            the same input fingerprint and seed instead of searching again
+        progress: Optional callable, called as progress(classes_done,
+            classes_total, periods_placed, periods_requested) while the
+            search runs and once more when the result is saved
+        preflight (bool): Run the feasibility check first and raise
+            InfeasibleTimetable instead of generating when it fails; off
+            by default, on in generation jobs
+        warm_start (AcademicTerm): Start from this term's timetable: its
+            lessons that are still valid under the current offerings and
+            teachers are copied over and only the rest is solved. The
+            term being generated must be empty or `clear_existing` set
+
+    Returns:
+        GenerationResult: the placements written and run statistics
+    """
+
+    if not term:
+        term = latest_term()
+
+    _check_options(mode, clear_existing, incremental, warm_start, term)
+    if warm_start and not clear_existing and _has_lessons(term, school):
+        raise ValueError(f"{term} already has lessons; clear them to warm-start from {warm_start}")
+
+    snapshot = load_snapshot(term, clear_existing=clear_existing, school=school,
+                             warm_start=warm_start)
+    if preflight:
+        report = analyse_snapshot(snapshot, MAX_PER_DAY, teacher_names_for(snapshot))
+        if not report.feasible:
+            raise InfeasibleTimetable(report)
+
+    fingerprint = snapshot_fingerprint(
+        snapshot, mode=mode, budget=budget, seeds=seeds, clear=clear_existing,
+        incremental=incremental, warm_start=getattr(warm_start, "pk", None),
+    )
+    result = cached_generation(fingerprint, seed) if use_cache else None
+    if result is None:
+        run = run_incremental if incremental or warm_start else run_best
+        result = run(snapshot, mode, budget, seeds, workers, stdout, seed, progress)
+        if warm_start:
+            result = carry_over(snapshot, result)
+    if warm_start:
+        snapshot = _without_existing(snapshot)
+    assign_rooms(snapshot, result)
+
+    with transaction.atomic():
+        writes = save_placements(
+            term, Offerings(snapshot).stored_lessons(result.placements),
+            clear_existing=clear_existing, school=school, freed_ids=result.freed_ids,
+            rooms=result.rooms,
+        )
+        save_assignment(snapshot, result)
+        lessons_changed(term, snapshot.school_id)
+        store_score(term, snapshot.school_id, snapshot.slot_ids, final_timetable(snapshot, result))
+        if not result.stats.get("cached"):
+            store_generation(term, snapshot.school_id, fingerprint, seed, mode, result)
+    result.writes = writes
+
+    if progress:
+        classes = len(snapshot.classes)
+        progress(classes, classes, result.periods_placed, result.periods_requested)
+
+    if stdout:
+        _report(result, stdout, label=str(school) if school else None)
+
+    return result
+
+
+def generate_all_schools(term=None, clear_existing=False, stdout=None, mode="greedy",
+                         budget=None, seeds=1, workers=1, incremental=False, seed=0,
+                         use_cache=True, preflight=False, warm_start=None):
+    """
+    Generates every school's timetable as an independent partition.
+
+    Snapshots for all schools are loaded together, each school is solved
+    in its own worker process, and each result is written in its own
+    transaction as soon as it is ready, so one school failing to save does
+    not roll back the others.
+
+    Args:
+        term (AcademicTerm): Term to generate for
+        clear_existing (bool): Whether to delete each school's existing timetable
+        stdout: Optional command stdout for logging
+        mode (str): Generation mode, see `generate_timetable`
+        budget (float): Optional seconds of local search per school
+        seeds (int): Seeded generations per school; run sequentially
+            inside that school's worker
+        workers (int): Processes to spread the schools over
+        incremental (bool): Only re-place what changed, per school
+        seed (int): Seed of every school's run
+        use_cache (bool): Reuse stored results for schools whose inputs
+            have not changed
+        preflight (bool): Skip (and report) schools that fail the
+            feasibility check
+        warm_start (AcademicTerm): Start every school from its timetable
+            in this term, see `generate_timetable`
+
+    Returns:
+        dict: {school_id: GenerationResult}
+    """
+
+    if not term:
+        term = latest_term()
+
+    _check_options(mode, clear_existing, incremental, warm_start, term)
+    if warm_start and not clear_existing and _has_lessons(term):
+        raise ValueError(f"{term} already has lessons; clear them to warm-start from {warm_start}")
+
+    snapshots = load_school_snapshots(term, clear_existing=clear_existing, warm_start=warm_start)
+    names = dict(School.objects.filter(id__in=snapshots).values_list("id", "name"))
+
+    if preflight:
+        for school_id, snapshot in list(snapshots.items()):
+            report = analyse_snapshot(snapshot, MAX_PER_DAY, teacher_names_for(snapshot))
+            if not report.feasible:
+                del snapshots[school_id]
+                if stdout:
+                    stdout.write(f"{names[school_id]}: skipped, {InfeasibleTimetable(report)}")
+
+    run = run_incremental if incremental or warm_start else run_best
+    fingerprints = {
+        school_id: snapshot_fingerprint(
+            snapshot, mode=mode, budget=budget, seeds=seeds, clear=clear_existing,
+            incremental=incremental, warm_start=getattr(warm_start, "pk", None),
+        )
+        for school_id, snapshot in snapshots.items()
+    }
+
+    def finish(school_id, result):
+        if warm_start:
+            if not result.stats.get("cached"):
+                result = carry_over(snapshots[school_id], result)
+            snapshots[school_id] = _without_existing(snapshots[school_id])
+        assign_rooms(snapshots[school_id], result)
+        with transaction.atomic():
+            writes = save_placements(
+                term, Offerings(snapshots[school_id]).stored_lessons(result.placements),
+                clear_existing=clear_existing, school=school_id, freed_ids=result.freed_ids,
+                rooms=result.rooms,
+            )
+            save_assignment(snapshots[school_id], result)
+            lessons_changed(term, school_id)
+            store_score(
+                term, school_id, snapshots[school_id].slot_ids,
+                final_timetable(snapshots[school_id], result),
+            )
+            if not result.stats.get("cached"):
+                store_generation(term, school_id, fingerprints[school_id], seed, mode, result)
+        result.writes = writes
+        if stdout:
+            _report(result, stdout, label=names[school_id])
+        return result
+
+    results = {}
+    pending = {}
+    for school_id, snapshot in snapshots.items():
+        cached = cached_generation(fingerprints[school_id], seed) if use_cache else None
+        if cached is not None:
+            results[school_id] = finish(school_id, cached)
+        else:
+            pending[school_id] = snapshot
+
+    if workers <= 1 or len(pending) <= 1:
+        for school_id, snapshot in pending.items():
+            results[school_id] = finish(
+                school_id, run(snapshot, mode, budget, seeds, 1, None, seed)
+            )
+        return results
+
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        futures = {
+            pool.submit(run, snapshot, mode, budget, seeds, 1, None, seed): school_id
+            for school_id, snapshot in pending.items()
+        }
+        for future in as_completed(futures):
+            school_id = futures[future]
+            results[school_id] = finish(school_id, future.result())
+
+    return results
+
+
+# -----------------------------
+# Dry runs
+# -----------------------------
+
+def override_periods(snapshot, periods):
+    """
+    Copy of `snapshot` with some weekly period counts changed.
+
+    Args:
+        periods (dict): {(level_id, subject_id): periods_per_week}; a
+            level_id of None changes the subject in every level that
+            offers it, and 0 drops the offering
+
+    Offerings a named level does not have yet are added to it.
+    """
+    offerings = {
+        level_id: list(level_offerings)
+        for level_id, level_offerings in snapshot.offerings_by_level.items()
+    }
+    for (level_id, subject_id), count in periods.items():
+        if level_id is None:
+            levels = [
+                level for level, level_offerings in offerings.items()
+                if any(subject == subject_id for subject, _ in level_offerings)
+            ]
+        else:
+            levels = [level_id]
+
+        for level in levels:
+            level_offerings = [
+                (subject, n) for subject, n in offerings.get(level, []) if subject != subject_id
+            ]
+            if count:
+                level_offerings.append((subject_id, count))
+            offerings[level] = level_offerings
+
+    overridden = copy.copy(snapshot)
+    overridden.offerings_by_level = offerings
+    return overridden
+
+
+def compare_timetables(current, proposed):
+    """
+    Compares two timetables cell by cell, keyed by (class, day, slot) and
+    by subject too for the lessons of an elective block.
+
+    Args:
+        current, proposed: (class_id, subject_id, teacher_id, day, slot_id,
+            elective_group) rows
+
+    Returns:
+        dict: {"added": [row], "removed": [row], "changed": [(before, after)],
+        "unchanged": count}
+    """
+    wanted = {_lesson_key(*row[:2], *row[3:]): tuple(row) for row in proposed}
+    diff = {"added": [], "removed": [], "changed": [], "unchanged": 0}
+    seen = set()
+    for row in current:
+        row = tuple(row)
+        key = _lesson_key(*row[:2], *row[3:])
+        after = wanted.get(key)
+        if after is None or key in seen:
+            diff["removed"].append(row)
+        elif after == row:
+            diff["unchanged"] += 1
+        else:
+            diff["changed"].append((row, after))
+        seen.add(key)
+    diff["added"] = [row for key, row in wanted.items() if key not in seen]
+    return diff
+
+
+def dry_run_generation(term=None, school=None, periods=None, clear_existing=False,
+                       mode="greedy", budget=None, seeds=1, workers=1, incremental=False,
+                       seed=0, warm_start=None, preflight=False):
+    """
+    Generates in memory only and reports what would change.
+
+    Takes the same options and defaults as `generate_timetable`, plus
+    `periods` to try other weekly period counts (see `override_periods`).
+    Nothing is written and no job, lock or cache entry is involved, so any number
+    of dry runs can go at once, next to real generations.
+
+    Returns:
+        dict: JSON-ready summary with the placement figures of the whole
+        proposed timetable (not only what this run placed), the run's
+        stats, the pre-flight report, every proposed lesson and the diff
+        against the stored timetable, with names instead of ids
+    """
+    if not term:
+        term = latest_term()
+    _check_options(mode, clear_existing, incremental, warm_start, term)
+    if warm_start and not clear_existing and _has_lessons(term, school):
+        raise ValueError(f"{term} already has lessons; clear them to warm-start from {warm_start}")
+
+    snapshot = load_snapshot(term, clear_existing=clear_existing, school=school,
+                             warm_start=warm_start)
+    if periods:
+        snapshot = override_periods(snapshot, periods)
+        missing = {subject_id for _, subject_id in periods} - set(snapshot.subject_names)
+        snapshot.subject_names = dict(snapshot.subject_names)
+        snapshot.subject_groups = dict(snapshot.subject_groups)
+        for subject_id, name, group in Subject.objects.filter(id__in=missing).values_list(
+            "id", "name", "elective_group"
+        ):
+            snapshot.subject_names[subject_id] = name
+            if group:
+                snapshot.subject_groups[subject_id] = group
+
+    names = teacher_names_for(snapshot)
+    report = analyse_snapshot(snapshot, MAX_PER_DAY, names)
+    if preflight and not report.feasible:
+        raise InfeasibleTimetable(report)
+
+    run = run_incremental if incremental or warm_start else run_best
+    result = run(snapshot, mode, budget, seeds, workers, None, seed)
+    if warm_start:
+        result = carry_over(snapshot, result)
+        snapshot = _without_existing(snapshot)
+    assign_rooms(snapshot, result)
+    timetable = final_timetable(snapshot, result)
+    score = score_timetable(snapshot.slot_ids, timetable, MAX_PER_DAY)
+    offerings = Offerings(snapshot)
+    proposed = offerings.stored_lessons(timetable)
+
+    stored = LessonInstance.objects.filter(term=term)
+    if school is not None:
+        stored = stored.filter(school_class__school=school)
+    current = list(stored.values_list(
+        "school_class_id", "subject_id", "teacher_id", "day", "time_slot_id", "elective_group"
+    ))
+    diff = compare_timetables(current, proposed)
+
+    have = defaultdict(int)
+    for class_id, subject_id, *_ in timetable:
+        have[offerings.key(class_id, subject_id)] += 1
+    wanted = [(periods, have[key]) for key, periods in offerings.periods.items()]
+    requested = sum(periods for periods, _ in wanted)
+    placed = sum(min(periods, count) for periods, count in wanted)
+
+    rows = current + proposed
+    subject_names = dict(snapshot.subject_names)
+    missing = {row[1] for row in rows} - set(subject_names)
+    subject_names.update(Subject.objects.filter(id__in=missing).values_list("id", "name"))
+    missing = {row[2] for row in rows} - set(names)
+    names.update(Teacher.objects.filter(id__in=missing).values_list("id", "name"))
+    slot_names = {slot.id: slot.name for slot in week_grid().slots}
+    labels = {class_id: label for class_id, _, label in snapshot.classes}
+    cell_order = {(day, slot_id): cell for cell, (day, slot_id) in enumerate(
+        (day, slot_id) for day in DAYS for slot_id in slot_names
+    )}
+
+    def describe(row):
+        class_id, subject_id, teacher_id, day, slot_id, _ = row
+        return {
+            "class": labels.get(class_id, f"Class #{class_id}"),
+            "subject": subject_names.get(subject_id, f"Subject #{subject_id}"),
+            "teacher": names.get(teacher_id, f"Teacher #{teacher_id}"),
+            "day": day,
+            "slot": slot_names.get(slot_id, f"Slot #{slot_id}"),
+        }
+
+    return {
+        "term": str(term),
+        "school": str(school) if school is not None else None,
+        "periods_placed": placed,
+        "periods_requested": requested,
+        "placement_rate": round(placed / requested, 4) if requested else 1.0,
+        "stats": result.stats,
+        "score": score.as_dict(),
+        "feasibility": report.as_dict(),
+        "lessons": [
+            describe(row)
+            for row in sorted(proposed, key=lambda row: (row[0], cell_order.get(row[3:5], -1)))
+        ],
+        "diff": {
+            "added": [describe(row) for row in diff["added"]],
+            "removed": [describe(row) for row in diff["removed"]],
+            "changed": [
+                {"before": describe(before), "after": describe(after)}
+                for before, after in diff["changed"]
+            ],
+            "unchanged": diff["unchanged"],
+        },
+    }
+
+
+# -----------------------------
+# Result cache
+# -----------------------------
+
+def snapshot_fingerprint(snapshot, **options):
+    """
+    SHA-256 over everything a run depends on: the term, teaching slots,
+    classes, offerings, subject-teacher links, elective groups, teacher
+    availability, the stored lessons it has to work around, MAX_PER_DAY
+    and the generation `options`.
+
+    Labels and names are left out, so renaming a class or subject does
+    not invalidate cached results.
+    """
+    payload = {
+        "term": snapshot.term_id,
+        "school": snapshot.school_id,
+        "slots": snapshot.slot_ids,
+        "classes": [(class_id, level_id) for class_id, level_id, _ in snapshot.classes],
+        "offerings": sorted(
+            (level_id, subject_id, periods)
+            for level_id, offerings in snapshot.offerings_by_level.items()
+            for subject_id, periods in offerings
+        ),
+        "teachers": sorted(
+            (subject_id, sorted(teacher_ids))
+            for subject_id, teacher_ids in snapshot.subject_teachers.items()
+        ),
+        "electives": sorted(snapshot.subject_groups.items()),
+        "unavailable": sorted(snapshot.teacher_unavailable.items()),
+        "existing": sorted(zip(snapshot.existing_ids, snapshot.existing)),
+        "max_per_day": MAX_PER_DAY,
+        "options": options,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def cached_generation(fingerprint, seed):
+    """Returns the stored GenerationResult for (fingerprint, seed), or None."""
+    record = (
+        TimetableGeneration.objects
+        .filter(fingerprint=fingerprint, seed=seed)
+        .order_by("-created_at")
+        .first()
+    )
+    if record is None:
+        return None
+
+    result = GenerationResult(
+        [tuple(placement) for placement in record.placements],
+        record.periods_requested,
+        dict(record.stats, cached=True),
+    )
+    result.freed_ids = list(record.freed_ids)
+    return result
+
+
+def store_generation(term, school_id, fingerprint, seed, mode, result):
+    return TimetableGeneration.objects.create(
+        school_id=school_id,
+        term=term,
+        fingerprint=fingerprint,
+        seed=seed,
+        mode=mode,
+        placements=[list(placement) for placement in result.placements],
+        freed_ids=list(result.freed_ids),
+        periods_requested=result.periods_requested,
+        stats=result.stats,
+    )
+
+
+# -----------------------------
+# Stored scores
+# -----------------------------
+
+def _score_key(term, school=None):
+    school_id = getattr(school, "pk", school)
+    return f"{school_id if school_id is not None else 'all'}:{getattr(term, 'pk', term)}"
+
+
+def store_score(term, school, slot_ids, lessons):
+    """
+    Scores `lessons`, the whole timetable of `school` (of the term when
+    None), and stores the result as its TimetableScore.
+
+    The generator calls it inside the transaction that saves the
+    lessons, after `lessons_changed`, so a stored score never describes
+    another timetable.
+    """
+    school_id = getattr(school, "pk", school)
+    stored, _ = TimetableScore.objects.update_or_create(
+        key=_score_key(term, school_id),
+        defaults=_score_fields(term, school_id, slot_ids, lessons),
+    )
+    return stored
+
+
+def _score_fields(term, school_id, slot_ids, lessons):
+    score = score_timetable(slot_ids, lessons, MAX_PER_DAY)
+    return {
+        "term_id": getattr(term, "pk", term),
+        "school_id": school_id,
+        "total": score.total,
+        "components": score.components,
+        "teachers": {
+            str(teacher_id): row for teacher_id, row in score.teacher_scores().items()
+        },
+        "lessons": len(lessons),
+    }
+
+
+def invalidate_scores(term, school=None):
+    """
+    Deletes the stored scores that lessons of `school` in `term` are part
+    of: that school's and the whole term's, or every score of the term
+    when `school` is None. The next `timetable_score` rescores from the
+    stored rows.
+    """
+    scores = TimetableScore.objects.filter(term_id=getattr(term, "pk", term))
+    if school is not None:
+        scores = scores.filter(key__in=[_score_key(term, school), _score_key(term)])
+    scores.delete()
+
+
+def lessons_changed(term, school=None):
+    """
+    Everything that depends on the lessons of `school` in `term` (of every
+    school when None): drops their stored scores and bumps the timetable
+    version (see `versions`), so nothing rendered from the old lessons is
+    served.
+
+    Saves and deletes of single lessons call it through a signal (see
+    `signals`); bulk writes call it themselves, in the transaction of the
+    write, inside `bulk_lesson_writes`.
+    """
+    invalidate_scores(term, school)
+    bump_timetable_version(term, school)
+
+
+_bulk_writes = threading.local()
+
+
+@contextmanager
+def bulk_lesson_writes():
+    """
+    Marks lesson writes whose caller calls `lessons_changed` for the whole
+    scope itself, so the per-row signal receivers skip them.
+    """
+    depth = getattr(_bulk_writes, "depth", 0)
+    _bulk_writes.depth = depth + 1
+    try:
+        yield
+    finally:
+        _bulk_writes.depth = depth
+
+
+def in_bulk_lesson_writes():
+    return getattr(_bulk_writes, "depth", 0) > 0
+
+
+def lessons_changed_in(lessons):
+    """`lessons_changed` for every (term, school) a LessonInstance queryset has lessons in."""
+    scopes = lessons.order_by().values_list("term_id", "school_class__school_id").distinct()
+    for term_id, school_id in list(scopes):
+        lessons_changed(term_id, school_id)
 
-    return True
 
+def timetable_score(term, school=None, store=True):
+    """
+    The stored TimetableScore of `school`'s timetable in `term` (of every
+    school when None), scoring the stored lessons first if there is none.
+
+    With `store=False` a missing score is computed but not saved: the
+    returned TimetableScore is unsaved, so read-only requests never write.
+    """
+    score = TimetableScore.objects.filter(key=_score_key(term, school)).first()
+    if score is not None:
+        return score
 
+    lessons = LessonInstance.objects.filter(term=term)
+    if school is not None:
+        lessons = lessons.filter(school_class__school=school)
+    folded, _ = fold_block_lessons(lessons.values_list(
+        "id", "school_class_id", "school_class__level_id", "subject_id", "teacher_id", "day",
+        "time_slot_id", "elective_group",
+    ))
+    rows = [row for _, row in folded]
+    if not store:
+        school_id = getattr(school, "pk", school)
+        return TimetableScore(
+            key=_score_key(term, school_id),
+            **_score_fields(term, school_id, teaching_slot_ids(), rows),
+        )
+    with transaction.atomic():
+        return store_score(term, school, teaching_slot_ids(), rows)
+
+
+def check_feasibility(term=None, school=None):
+    """
+    Runs the pre-flight feasibility check for `term` (default: latest)
+    and `school` without generating anything.
 
-def teacher_workload(term_id):
+    Returns:
+        FeasibilityReport
+    """
+    if not term:
+        term = latest_term()
+    snapshot = load_snapshot(term, clear_existing=True, school=school)
+    return analyse_snapshot(snapshot, MAX_PER_DAY, teacher_names_for(snapshot))
+
+
+def teacher_workload(term_id, school=None):
     term = AcademicTerm.objects.get(id=term_id)
 
+    lessons = LessonInstance.objects.filter(term=term)
+    if school is not None:
+        lessons = lessons.filter(school_class__school=school)
+
+    # A block lesson is stored once per class of the level but taught
+    # once, so block rows count one period per distinct cell.
     workload = (
-        LessonInstance.objects
-        .filter(term=term)
+        lessons
         .values("teacher__id", "teacher__name")
-        .annotate(periods=Count("id"))
+        .annotate(
+            periods=Count("id", filter=Q(elective_group__isnull=True))
+            + Count(
+                Concat("day", Value(":"), "time_slot_id", output_field=CharField()),
+                filter=Q(elective_group__isnull=False),
+                distinct=True,
+            )
+        )
         .order_by("-periods")
     )
 
@@ -0,0 +1,114 @@
+"""
+Timetable versions, for caching what is rendered from a timetable.
+
+Timetables change a few times a term but are read all day, so rendered
+output is cached under a version token and never invalidated by key:
+anything that changes a timetable bumps a counter instead, the token
+changes, and entries cached under the old token are never read again
+(they age out of the cache). A token is made of four counters, each
+bumped by a different kind of change:
+
+- global: time slots, subjects, class levels and streams, which every
+  school shares (the compiled week grid follows it too, see `weekgrid`);
+- term: lessons of every school of a term, written at once;
+- school: the school's teachers and classes;
+- school and term: the school's lessons of the term.
+
+Saves and deletes of those models bump their counter through signals
+(see `signals`), lessons included. Lessons written in bulk (generation,
+cloning) send no signals or skip them, so those paths bump the school
+and term once through `utils.lessons_changed`. Bumps wait for the
+surrounding transaction to commit, so nothing rendered from the old rows
+is cached under the new token.
+
+Counters live in the default cache, which must be shared by every
+process that writes or renders timetables (see CACHES in settings).
+A counter missing from the cache starts from the current time in
+milliseconds rather than from 1, so a counter that was evicted never
+repeats a token that was already used.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_PREFIX = "timetable-version"
+FRAGMENT_PREFIX = "timetable-fragment"
+FRAGMENT_TIMEOUT = 7 * 24 * 60 * 60  # seconds; stale fragments are never read, only left to expire
+
+
+def _pk(obj):
+    return getattr(obj, "pk", obj)
+
+
+def _version_keys(term, school):
+    term_id, school_id = _pk(term), _pk(school)
+    return [
+        f"{VERSION_PREFIX}:global",
+        f"{VERSION_PREFIX}:term:{term_id}",
+        f"{VERSION_PREFIX}:school:{school_id}",
+        f"{VERSION_PREFIX}:school:{school_id}:term:{term_id}",
+    ]
+
+
+def _start():
+    return int(time.time() * 1000)
+
+
+def global_version():
+    """Returns the global counter alone, which time slot changes bump."""
+    key = f"{VERSION_PREFIX}:global"
+    value = cache.get(key)
+    if value is None:
+        value = _start()
+        cache.set(key, value, timeout=None)
+    return value
+
+
+def timetable_version(term, school):
+    """
+    Returns the version token of `school`'s timetable in `term`: a string
+    that changes whenever anything shown in that timetable does.
+    """
+    keys = _version_keys(term, school)
+    found = cache.get_many(keys)
+    missing = {key: _start() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return ".".join(str(found[key]) for key in keys)
+
+
+def _bump(key):
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Not cached (never read, or evicted): any fresh start is newer.
+            cache.set(key, _start(), timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def bump_global_version():
+    """Changes the token of every timetable, e.g. after time slots change."""
+    _bump(f"{VERSION_PREFIX}:global")
+
+
+def bump_school_version(school):
+    """Changes the token of every timetable of `school`, in every term."""
+    _bump(f"{VERSION_PREFIX}:school:{_pk(school)}")
+
+
+def bump_timetable_version(term, school=None):
+    """Changes the token of `school`'s timetable in `term`, or of every school's when None."""
+    if school is None:
+        _bump(f"{VERSION_PREFIX}:term:{_pk(term)}")
+    else:
+        _bump(f"{VERSION_PREFIX}:school:{_pk(school)}:term:{_pk(term)}")
+
+
+def fragment_key(name, version, *parts):
+    """Cache key of a rendered fragment `name` for `parts`, under `version`."""
+    return ":".join([FRAGMENT_PREFIX, name, *(str(part) for part in parts), version])
@@ -1,15 +1,28 @@
 
+import hashlib
+from functools import wraps
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
-from datetime import time
+from django.views.decorators.http import condition, require_POST
 from .models import (
     Lesson, LessonInstance, SchoolClass, TimeSlot,
-    AcademicTerm, Teacher, Subject, SubjectOffering
+    AcademicTerm, Teacher, Subject, SubjectOffering, GenerationJob, Room
 )
-from .forms import SignUpForm
-from .utils import generate_timetable, teacher_workload
-from django.http import HttpResponse, JsonResponse
+from .forms import SignUpForm, TeacherForm
+from .utils import teacher_workload, check_feasibility, lessons_changed, timetable_score
+from .occupancy import lesson_clash
+from .grids import class_timetables
+from .weekgrid import week_grid
+from .versions import FRAGMENT_TIMEOUT, fragment_key, timetable_version
+from .pdfcache import cached_pdf_response
+from .jobs import enqueue_generation, job_status
+from django.http import JsonResponse
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.utils.safestring import mark_safe
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.pdfgen import canvas
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Spacer, Paragraph, PageBreak
@@ -60,8 +73,22 @@ def dashboard(request):
                 term_id = request.POST.get('term')
                 term = AcademicTerm.objects.filter(id=term_id).first() if term_id else AcademicTerm.objects.order_by("-year","-term").first()
                 clear = request.POST.get('clear') in ('1','on','true')
-                generate_timetable(term=term, clear_existing=clear)
-                messages.success(request, 'Timetable generated successfully.')
+                incremental = request.POST.get('incremental') in ('1','on','true') and not clear
+                if not term:
+                    raise ValueError('No academic term found')
+                school = request.user.userprofile.school
+                preflight = check_feasibility(term, school=school)
+                if not preflight.feasible:
+                    messages.error(request, 'Not generated: ' + '; '.join(preflight.errors))
+                    return redirect('dashboard')
+                job, created = enqueue_generation(
+                    term, school=school, user=request.user,
+                    clear_existing=clear, incremental=incremental,
+                )
+                if created:
+                    messages.success(request, 'Timetable generation queued.')
+                else:
+                    messages.info(request, f'A generation for {term} is already in progress; showing its progress.')
             elif action == 'create_timeslots':
                 call_command('create_timeslots')
                 messages.success(request, 'Default time slots created.')
@@ -72,23 +99,134 @@ def dashboard(request):
         return redirect('dashboard')
 
     terms = AcademicTerm.objects.order_by('-year','-term')
-    return render(request, 'timetable_planner_app/dashboard.html', {'terms': terms})
+    school = request.user.userprofile.school
+    jobs = GenerationJob.objects.filter(school=school).select_related('term')[:5]
+    preflight = check_feasibility(terms.first(), school=school) if terms else None
+    return render(request, 'timetable_planner_app/dashboard.html', {
+        'terms': terms,
+        'jobs': jobs,
+        'preflight': preflight,
+    })
 
+
+@login_required
+def generation_job_status(request, job_id):
+    """Progress of a queued generation, polled by the dashboard."""
+    job = get_object_or_404(
+        GenerationJob.objects.select_related('term'),
+        id=job_id,
+        school=request.user.userprofile.school,
+    )
+    return JsonResponse(job_status(job))
+
+@login_required
+@require_POST
 def generate(request, term_id):
-    term = AcademicTerm.objects.order_by("-year", "-term").first()
+    """Queues a full regeneration of `term_id` for the user's school, or joins the one in progress."""
+    term = get_object_or_404(AcademicTerm, id=term_id)
+    school = request.user.userprofile.school
 
-    try:
-        generate_timetable(term=term, clear_existing=True)
-    except Exception as e:
-        return render(request, "timetable_planner_app/home.html")
+    job, created = enqueue_generation(term, school=school, user=request.user, clear_existing=True)
+    if created:
+        messages.success(request, f'Timetable generation for {term} queued.')
+    else:
+        messages.info(request, f'A generation for {term} is already in progress; showing its progress.')
 
-    return redirect("view_timetable")
+    return redirect("dashboard")
 
 def view_timetable(request):
     # Redirect legacy timetable view to the more user-friendly grid view
     return redirect('view_grid_timetable')
 
 
+def timetable_term(request):
+    """The term a timetable page shows: `?term=<id>`, or the latest term."""
+    if not hasattr(request, "timetable_term"):
+        term_id = request.GET.get("term")
+        if term_id and term_id.isdigit():
+            request.timetable_term = get_object_or_404(AcademicTerm, id=term_id)
+        else:
+            request.timetable_term = AcademicTerm.objects.order_by("-year", "-term").first()
+    return request.timetable_term
+
+
+# -----------------------------
+# Conditional responses
+# -----------------------------
+# Timetable pages and downloads are polled all day. Their ETag is the
+# timetable version (see `versions`), so an unchanged timetable is
+# answered with 304 Not Modified before anything is loaded or rendered.
+# The user is part of it because pages show who is logged in, and so is
+# a hash of the session key and CSRF secret: pages embed a CSRF token,
+# and both change on login, so a body cached before a re-login is never
+# revalidated with its dead token. Responses are Cache-Control: private
+# so shared caches do not keep one user's copy for another.
+
+def client_tag(request):
+    """Short hash of the session key and CSRF secret of the request."""
+    session_key = request.session.session_key or ""
+    csrf_secret = request.META.get("CSRF_COOKIE", "")
+    return hashlib.sha256(f"{session_key}:{csrf_secret}".encode()).hexdigest()[:16]
+
+
+def timetable_etag(request, name, school_id, *parts):
+    term = timetable_term(request)
+    term_id = term.id if term else None
+    version = timetable_version(term_id, school_id)
+    return "-".join(
+        str(part) for part in (name, request.user.pk or 0, client_tag(request), term_id, *parts, version)
+    )
+
+
+def timetable_condition(etag_func):
+    """`condition(etag_func=...)` whose responses, 304s included, are Cache-Control: private."""
+    def decorator(view):
+        conditional = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            patch_cache_control(response, private=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def grid_etag(request):
+    return timetable_etag(request, "grid", request.user.userprofile.school_id)
+
+
+def visible_class_school_id(request, class_id):
+    """
+    School of class `class_id` if the view would show it (any class when
+    logged out, only the user's school's otherwise), else None: the view
+    answers 404, which must not carry an ETag or become a 304.
+    """
+    classes = SchoolClass.objects.filter(id=class_id)
+    if request.user.is_authenticated:
+        classes = classes.filter(school_id=request.user.userprofile.school_id)
+    return classes.values_list("school_id", flat=True).first()
+
+
+def single_stream_etag(request, class_id):
+    school_id = visible_class_school_id(request, class_id)
+    if school_id is None:
+        return None
+    return timetable_etag(request, "class", school_id, class_id)
+
+
+def class_pdf_etag(request, class_id):
+    school_id = visible_class_school_id(request, class_id)
+    if school_id is None:
+        return None
+    return timetable_etag(request, "class-pdf", school_id, class_id)
+
+
+def all_pdf_etag(request):
+    return timetable_etag(request, "all-pdf", request.user.userprofile.school_id)
+
+
+@timetable_condition(single_stream_etag)
 def view_single_stream_timetable(request, class_id):
     if request.user.is_authenticated:
         school = request.user.userprofile.school
@@ -96,11 +234,8 @@ def view_single_stream_timetable(request, class_id):
     else:
         school_class = get_object_or_404(SchoolClass, id=class_id)
 
-    lessons = LessonInstance.objects.filter(
-        school_class=school_class
-    ).order_by(
-        "day",
-        "time_slot__start_time"
+    timetable, = class_timetables(
+        school_class.school_id, timetable_term(request), classes=[school_class]
     )
 
     return render(
@@ -108,7 +243,7 @@ def view_single_stream_timetable(request, class_id):
         "timetable_planner_app/single_stream_timetable.html",
         {
             "school_class": school_class,
-            "lessons": lessons
+            "lessons": timetable.lessons
         }
     )
 
@@ -129,7 +264,7 @@ class TeacherListView(LoginRequiredMixin, ListView):
 
 class TeacherCreateView(LoginRequiredMixin, CreateView):
     model = Teacher
-    fields = ['name']
+    form_class = TeacherForm
     template_name = 'timetable_planner_app/teacher_form.html'
     success_url = reverse_lazy('teacher_list')
 
@@ -142,7 +277,7 @@ class TeacherCreateView(LoginRequiredMixin, CreateView):
 
 class TeacherUpdateView(LoginRequiredMixin, UpdateView):
     model = Teacher
-    fields = ['name']
+    form_class = TeacherForm
     template_name = 'timetable_planner_app/teacher_form.html'
     success_url = reverse_lazy('teacher_list')
     def get_queryset(self):
@@ -170,7 +305,7 @@ class SubjectListView(LoginRequiredMixin, ListView):
 
 class SubjectCreateView(LoginRequiredMixin, CreateView):
     model = Subject
-    fields = ['name', 'levels', 'teachers', 'elective_group', 'color']
+    fields = ['name', 'levels', 'teachers', 'elective_group', 'room_type', 'color']
     template_name = 'timetable_planner_app/subject_form.html'
     success_url = reverse_lazy('subject_list')
     def get_form(self, form_class=None):
@@ -184,7 +319,7 @@ class SubjectCreateView(LoginRequiredMixin, CreateView):
 
 class SubjectUpdateView(LoginRequiredMixin, UpdateView):
     model = Subject
-    fields = ['name', 'levels', 'teachers', 'elective_group', 'color']
+    fields = ['name', 'levels', 'teachers', 'elective_group', 'room_type', 'color']
     template_name = 'timetable_planner_app/subject_form.html'
     success_url = reverse_lazy('subject_list')
     def get_queryset(self):
@@ -268,6 +403,47 @@ class SubjectOfferingDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('subjectoffering_list')
 
 
+class RoomListView(LoginRequiredMixin, ListView):
+    model = Room
+    template_name = 'timetable_planner_app/room_list.html'
+    context_object_name = 'rooms'
+    def get_queryset(self):
+        school = self.request.user.userprofile.school
+        return Room.objects.filter(school=school)
+
+
+class RoomCreateView(LoginRequiredMixin, CreateView):
+    model = Room
+    fields = ['name', 'room_type', 'capacity']
+    template_name = 'timetable_planner_app/room_form.html'
+    success_url = reverse_lazy('room_list')
+
+    def form_valid(self, form):
+        obj = form.save(commit=False)
+        obj.school = self.request.user.userprofile.school
+        obj.save()
+        return super().form_valid(form)
+
+
+class RoomUpdateView(LoginRequiredMixin, UpdateView):
+    model = Room
+    fields = ['name', 'room_type', 'capacity']
+    template_name = 'timetable_planner_app/room_form.html'
+    success_url = reverse_lazy('room_list')
+    def get_queryset(self):
+        school = self.request.user.userprofile.school
+        return Room.objects.filter(school=school)
+
+
+class RoomDeleteView(LoginRequiredMixin, DeleteView):
+    model = Room
+    template_name = 'timetable_planner_app/room_confirm_delete.html'
+    success_url = reverse_lazy('room_list')
+    def get_queryset(self):
+        school = self.request.user.userprofile.school
+        return Room.objects.filter(school=school)
+
+
 class SchoolClassListView(LoginRequiredMixin, ListView):
     model = SchoolClass
     template_name = 'timetable_planner_app/schoolclass_list.html'
@@ -279,7 +455,7 @@ class SchoolClassListView(LoginRequiredMixin, ListView):
 
 class SchoolClassCreateView(LoginRequiredMixin, CreateView):
     model = SchoolClass
-    fields = ['level', 'stream']
+    fields = ['level', 'stream', 'size']
     template_name = 'timetable_planner_app/schoolclass_form.html'
     success_url = reverse_lazy('class_list')
     def form_valid(self, form):
@@ -291,7 +467,7 @@ class SchoolClassCreateView(LoginRequiredMixin, CreateView):
 
 class SchoolClassUpdateView(LoginRequiredMixin, UpdateView):
     model = SchoolClass
-    fields = ['level', 'stream']
+    fields = ['level', 'stream', 'size']
     template_name = 'timetable_planner_app/schoolclass_form.html'
     success_url = reverse_lazy('class_list')
     def get_queryset(self):
@@ -343,9 +519,27 @@ class LessonInstanceListView(LoginRequiredMixin, ListView):
         return LessonInstance.objects.filter(school_class__school=school)
 
 
-class LessonInstanceCreateView(LoginRequiredMixin, CreateView):
+class LessonClashMixin:
+    """
+    Rejects manual lessons that double-book a teacher or class, and marks
+    the timetables a saved lesson changes as changed.
+    """
+    def form_valid(self, form):
+        clash = lesson_clash(form.instance)
+        if clash:
+            form.add_error(None, clash)
+            return self.form_invalid(form)
+        response = super().form_valid(form)
+        # The save itself marks the lesson's timetable changed (see
+        # signals); a lesson moved to another term also leaves the old one.
+        if form.initial.get('term') not in (None, form.instance.term_id):
+            lessons_changed(form.initial['term'], form.instance.school_class.school_id)
+        return response
+
+
+class LessonInstanceCreateView(LoginRequiredMixin, LessonClashMixin, CreateView):
     model = LessonInstance
-    fields = ['school_class', 'subject', 'teacher', 'term', 'day', 'time_slot']
+    fields = ['school_class', 'subject', 'teacher', 'term', 'day', 'time_slot', 'room']
     template_name = 'timetable_planner_app/lessoninstance_form.html'
     success_url = reverse_lazy('lessoninstance_list')
     def get_form(self, form_class=None):
@@ -354,6 +548,7 @@ class LessonInstanceCreateView(LoginRequiredMixin, CreateView):
         form.fields['school_class'].queryset = SchoolClass.objects.filter(school=school)
         form.fields['teacher'].queryset = Teacher.objects.filter(school=school)
         form.fields['subject'].queryset = Subject.objects.filter(levels__school=school).distinct()
+        form.fields['room'].queryset = Room.objects.filter(school=school)
         return form
 
     def get_queryset(self):
@@ -361,9 +556,9 @@ class LessonInstanceCreateView(LoginRequiredMixin, CreateView):
         return LessonInstance.objects.filter(school_class__school=school)
 
 
-class LessonInstanceUpdateView(LoginRequiredMixin, UpdateView):
+class LessonInstanceUpdateView(LoginRequiredMixin, LessonClashMixin, UpdateView):
     model = LessonInstance
-    fields = ['school_class', 'subject', 'teacher', 'term', 'day', 'time_slot']
+    fields = ['school_class', 'subject', 'teacher', 'term', 'day', 'time_slot', 'room']
     template_name = 'timetable_planner_app/lessoninstance_form.html'
     success_url = reverse_lazy('lessoninstance_list')
     def get_queryset(self):
@@ -376,6 +571,7 @@ class LessonInstanceUpdateView(LoginRequiredMixin, UpdateView):
         form.fields['school_class'].queryset = SchoolClass.objects.filter(school=school)
         form.fields['teacher'].queryset = Teacher.objects.filter(school=school)
         form.fields['subject'].queryset = Subject.objects.filter(levels__school=school).distinct()
+        form.fields['room'].queryset = Room.objects.filter(school=school)
         return form
 
 
@@ -388,87 +584,84 @@ class LessonInstanceDeleteView(LoginRequiredMixin, DeleteView):
         return LessonInstance.objects.filter(school_class__school=school)
 
 
-TIME_SLOTS = [
-    (time(7,50), time(8,30)),
-    (time(8,30), time(9,10)),
-    (time(9,10), time(9,50)),
-    (time(9,50), time(10,30)),
-    (time(10,30), time(11,0)),
-    (time(11,0), time(11,40)),
-    (time(11,40), time(12,20)),
-    (time(12,20), time(13,0)),
-    (time(13,0), time(13,40)),
-    (time(13,40), time(14,20)),
-    (time(14,20), time(15,0)),
-    (time(15,0), time(15,40)),
-    (time(15,40), time(16,20)),
-]
-
-DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-
-
 @login_required
+@timetable_condition(grid_etag)
 def view_grid_timetable(request):
-    print(request.user.userprofile)
     school = request.user.userprofile.school
-    classes = SchoolClass.objects.filter(school=school)
-    timetable = {}
-
-    for school_class in classes:
-        grid = {}
-
-        # prepare empty grid
-        for start, end in TIME_SLOTS:
-            grid[(start, end)] = {day: None for day in DAYS}
-            
-
-        lessons = LessonInstance.objects.filter(school_class=school_class)
-
-        for lesson in lessons:
-            key = (lesson.time_slot.start_time, lesson.time_slot.end_time)
-            grid[key][lesson.day] = lesson
-
-        flagged_grid = {}
-        for (start, end), day_map in grid.items():
-            flagged_grid[(start, end)] = {
-                "day_map": day_map,
-                "is_break": start == time(10,30),
-                "is_lunch": start == time(13,0),
-                "is_assembly": start == time(7,50),
-            }
+    term = timetable_term(request)
+    term_id = term.id if term else None
+    classes = list(
+        SchoolClass.objects.filter(school=school)
+        .select_related("level", "stream").order_by("level", "stream")
+    )
 
-        timetable[str(school_class)] = flagged_grid
+    # Each class's table is rendered once per timetable version and then
+    # served from the cache: a page view is two cache round trips.
+    version = timetable_version(term_id, school)
+    keys = {
+        school_class.id: fragment_key("grid", version, school.id, term_id, school_class.id)
+        for school_class in classes
+    }
+    fragments = cache.get_many(keys.values())
+    missing = [school_class for school_class in classes if keys[school_class.id] not in fragments]
+    if missing:
+        week = week_grid()
+        rendered = {}
+        for class_timetable in class_timetables(school, term, classes=missing):
+            flagged_grid = {}
+            for slot in week.slots:
+                flagged_grid[slot] = {
+                    "day_map": {day: class_timetable.lessons_at(slot.id, day) for day in week.days},
+                    "is_break": slot.is_break,
+                    "is_lunch": slot.is_lunch,
+                    "is_assembly": slot.is_assembly,
+                }
+            rendered[keys[class_timetable.school_class.id]] = render_to_string(
+                "timetable_planner_app/grid_class.html",
+                {"class_name": str(class_timetable), "grid": flagged_grid, "days": week.days},
+            )
+        cache.set_many(rendered, FRAGMENT_TIMEOUT)
+        fragments.update(rendered)
 
     context = {
-        "timetable": timetable,
-        "days": DAYS,
-        "time_slots": TIME_SLOTS
+        "fragments": [mark_safe(fragments[keys[school_class.id]]) for school_class in classes],
     }
     return render(request, "timetable_planner_app/grid.html", context)
 
 
 @login_required
+@timetable_condition(class_pdf_etag)
 def download_timetable_pdf(request, class_id):
     school = request.user.userprofile.school
     school_class = get_object_or_404(SchoolClass, id=class_id, school=school)
-
-    lessons = LessonInstance.objects.filter(
-        school_class=school_class
+    term = timetable_term(request)
+    return cached_pdf_response(
+        school.id, term, f"class-{school_class.id}", f"{school_class}_timetable.pdf",
+        lambda out: write_class_pdf(out, school, term, school_class),
     )
 
-    time_slots = TimeSlot.objects.order_by("start_time")
-    days = DAYS
 
-    # -------------------------------
-    # Build grid: {(slot, day): lesson}
-    # -------------------------------
-    grid = {}
-    for slot in time_slots:
-        for day in days:
-            grid[(slot, day)] = None
+def pdf_cell_text(lessons):
+    """
+    Text of one timetable cell in the PDFs: subject, teacher and room (if
+    any), or one line per subject of an elective block.
+    """
+    def who(lesson):
+        return f"{lesson.teacher.name}, {lesson.room.name}" if lesson.room else lesson.teacher.name
+
+    if len(lessons) == 1:
+        lesson, = lessons
+        return f"{lesson.subject.name}\n{who(lesson)}"
+    return "\n".join(f"{lesson.subject.name} ({who(lesson)})" for lesson in lessons)
+
 
-    for lesson in lessons:
-        grid[(lesson.time_slot, lesson.day)] = lesson
+def write_class_pdf(out, school, term, school_class):
+    """Writes the timetable of `school_class` in `term` as a PDF to the file `out`."""
+    timetable, = class_timetables(school, term, classes=[school_class])
+
+    week = week_grid()
+    time_slots = week.slots
+    days = week.days
 
     # -------------------------------
     # Build table data
@@ -484,24 +677,15 @@ def download_timetable_pdf(request, class_id):
         row = [f"{slot.start_time} - {slot.end_time}"]
 
         for day in days:
-            lesson = grid[(slot, day)]
-            if lesson:
-                row.append(f"{lesson.subject.name}\n{lesson.teacher.name}")
-            else:
-                row.append("")
+            row.append(pdf_cell_text(timetable.lessons_at(slot.id, day)))
 
         table_data.append(row)
 
     # -------------------------------
     # Create PDF
     # -------------------------------
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = (
-        f'attachment; filename="{school_class}_timetable.pdf"'
-    )
-
     doc = SimpleDocTemplate(
-        response,
+        out,
         pagesize=landscape(A4),
         rightMargin=20,
         leftMargin=20,
@@ -538,8 +722,9 @@ def download_timetable_pdf(request, class_id):
 
     for row_idx, slot in enumerate(time_slots, start=1):
         for col_idx, day in enumerate(days, start=1):
-            lesson = grid[(slot, day)]
-            if lesson:
+            lessons = timetable.lessons_at(slot.id, day)
+            if len(lessons) == 1:
+                lesson, = lessons
                 if lesson.subject.color == "blue":
                     style.add("BACKGROUND", (col_idx, row_idx), (col_idx, row_idx), colors.lightblue)
                 elif lesson.subject.color == "green":
@@ -549,7 +734,6 @@ def download_timetable_pdf(request, class_id):
     table.setStyle(style)
 
     doc.build([table])
-    return response
 
 
 # Map subject color strings to actual ReportLab colors
@@ -570,13 +754,20 @@ BREAK_COLOR = colors.lightyellow
 LUNCH_COLOR = colors.lightpink
 
 @login_required
+@timetable_condition(all_pdf_etag)
 def download_all_timetables_pdf(request):
     school = request.user.userprofile.school
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = 'attachment; filename="all_timetables.pdf"'
+    term = timetable_term(request)
+    return cached_pdf_response(
+        school.id, term, "all", "all_timetables.pdf",
+        lambda out: write_all_timetables_pdf(out, school, term),
+    )
 
+
+def write_all_timetables_pdf(out, school, term):
+    """Writes the timetables of every class of `school` in `term` as one PDF to the file `out`."""
     doc = SimpleDocTemplate(
-        response,
+        out,
         pagesize=landscape(A4),
         rightMargin=20,
         leftMargin=20,
@@ -586,36 +777,24 @@ def download_all_timetables_pdf(request):
 
     elements = []
     styles = getSampleStyleSheet()
-    classes = SchoolClass.objects.filter(school=school).order_by("level", "stream")
-    time_slots = TimeSlot.objects.order_by("start_time")
+    timetables = class_timetables(school, term)
+    week = week_grid()
+    time_slots = week.slots
 
-    for idx, school_class in enumerate(classes):
+    for idx, timetable in enumerate(timetables):
         # Title
-        elements.append(Paragraph(f"Timetable for {school_class}", styles['Heading2']))
+        elements.append(Paragraph(f"Timetable for {timetable}", styles['Heading2']))
         elements.append(Spacer(1, 10))
 
-        # Build grid {(slot, day): lesson}
-        grid = {}
-        lessons = LessonInstance.objects.filter(school_class=school_class)
-        for slot in time_slots:
-            for day in DAYS:
-                grid[(slot, day)] = None
-        for lesson in lessons:
-            grid[(lesson.time_slot, lesson.day)] = lesson
-
         # Build table data
         table_data = []
-        header = ["Time"] + DAYS
+        header = ["Time"] + week.days
         table_data.append(header)
 
         for slot in time_slots:
             row = [f"{slot.start_time.strftime('%H:%M')} - {slot.end_time.strftime('%H:%M')}"]
-            for day in DAYS:
-                lesson = grid[(slot, day)]
-                if lesson:
-                    row.append(f"{lesson.subject.name}\n{lesson.teacher.name}")
-                else:
-                    row.append("")
+            for day in week.days:
+                row.append(pdf_cell_text(timetable.lessons_at(slot.id, day)))
             table_data.append(row)
 
         # Create Table
@@ -644,10 +823,10 @@ def download_all_timetables_pdf(request):
 
         # Color each lesson by subject
         for row_idx, slot in enumerate(time_slots, start=1):
-            for col_idx, day in enumerate(DAYS, start=1):
-                lesson = grid[(slot, day)]
-                if lesson:
-                    subject_color = SUBJECT_COLOR_MAP.get(lesson.subject.color, colors.white)
+            for col_idx, day in enumerate(week.days, start=1):
+                lessons = timetable.lessons_at(slot.id, day)
+                if len(lessons) == 1:
+                    subject_color = SUBJECT_COLOR_MAP.get(lessons[0].subject.color, colors.white)
                     style.add("BACKGROUND", (col_idx, row_idx), (col_idx, row_idx), subject_color)
 
         table.setStyle(style)
@@ -655,20 +834,31 @@ def download_all_timetables_pdf(request):
         elements.append(table)
 
         # Page break after every class except last one
-        if idx < len(classes) - 1:
+        if idx < len(timetables) - 1:
             elements.append(PageBreak())
 
     doc.build(elements)
-    return response
 
 
+@login_required
 def teacher_workload_view(request, term_id):
-    term = AcademicTerm.objects.get(id=term_id)
-    workload = teacher_workload(term_id)
+    term = get_object_or_404(AcademicTerm, id=term_id)
+    school = request.user.userprofile.school
+    workload = list(teacher_workload(term_id, school=school))
+
+    # Gaps and day imbalance come from the stored score of the timetable,
+    # the same figures the generator optimised, instead of a recount. A
+    # GET never writes: without a stored score it is computed in memory.
+    score = timetable_score(term, school=school, store=False)
+    for row in workload:
+        teacher = score.teachers.get(str(row["teacher__id"]), {})
+        row["gaps"] = teacher.get("gaps", 0)
+        row["imbalance"] = teacher.get("imbalance", 0)
 
     context = {
         "term": term,
         "workload": workload,
+        "score": score,
     }
 
     return render(
@@ -0,0 +1,99 @@
+"""
+The week grid every timetable is laid out on.
+
+Time slots change a few times a year, but every timetable page, export
+and generator run needs them: their order, which of them lessons can go
+in, and which are breaks, lunch or assembly. `week_grid` compiles the
+TimeSlot table into a `WeekGrid` once and keeps it in the process, so
+none of those callers query the slots themselves, and the display and
+the generator cannot disagree on what the week looks like.
+
+The compiled grid is kept with the global timetable version (see
+`versions`) it was compiled under, and compiled again as soon as that
+version changes, so no process renders or generates from old slots under
+a new version token. Saving or deleting a TimeSlot calls
+`invalidate_week_grid` (see `signals`), which drops this process's grid
+and bumps the version for the others; queryset `update()` and
+`bulk_create()` send no signals, so call it after using them.
+"""
+
+from timetable_planner_app.models import TimeSlot
+from timetable_planner_app.versions import bump_global_version, global_version
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+_cached = None  # (global version, WeekGrid)
+
+
+class WeekGrid:
+    """
+    The days and time slots of the school week.
+
+    Teaching cells are numbered day-major over the teaching slots, like
+    `occupancy.Occupancy`: cell = day_index * len(teaching_slot_ids) + period.
+
+    Attributes:
+        days (list): day names, Monday first
+        slots (list): every TimeSlot, in start_time order
+        slot_ids (list): their ids
+        teaching_slots (list): the slots lessons can go in (not a break,
+            lunch or assembly), in start_time order
+        teaching_slot_ids (list): their ids
+    """
+
+    def __init__(self, slots, days=DAYS):
+        self.days = list(days)
+        self.slots = list(slots)
+        self.slot_ids = [slot.id for slot in self.slots]
+        self.teaching_slots = [
+            slot for slot in self.slots
+            if not (slot.is_break or slot.is_lunch or slot.is_assembly)
+        ]
+        self.teaching_slot_ids = [slot.id for slot in self.teaching_slots]
+
+        self.day_index = {day: i for i, day in enumerate(self.days)}
+        self.slot_by_id = {slot.id: slot for slot in self.slots}
+        self.period = {slot_id: i for i, slot_id in enumerate(self.teaching_slot_ids)}
+
+    def slot(self, slot_id):
+        """Returns the TimeSlot with `slot_id`, or None if there is none."""
+        return self.slot_by_id.get(slot_id)
+
+    def is_teaching(self, slot_id):
+        return slot_id in self.period
+
+    def cell(self, day, slot_id):
+        """Returns the teaching cell of (day, slot_id), or None if lessons cannot go there."""
+        period = self.period.get(slot_id)
+        if period is None or day not in self.day_index:
+            return None
+        return self.day_index[day] * len(self.teaching_slot_ids) + period
+
+    def cell_key(self, cell):
+        """Returns the (day, slot_id) pair of a teaching cell."""
+        day, period = divmod(cell, len(self.teaching_slot_ids))
+        return self.days[day], self.teaching_slot_ids[period]
+
+
+def week_grid():
+    """Returns the compiled WeekGrid, loading the time slots if the global version has changed."""
+    global _cached
+    # Read before the slots: a change landing in between leaves the grid
+    # under the older version, so it is only compiled once more.
+    version = global_version()
+    cached = _cached
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    grid = WeekGrid(TimeSlot.objects.order_by("start_time"))
+    _cached = (version, grid)
+    return grid
+
+
+def invalidate_week_grid(**kwargs):
+    """
+    Drops the cached grid and bumps the global version, so every process
+    loads the time slots again.
+    """
+    global _cached
+    _cached = None
+    bump_global_version()